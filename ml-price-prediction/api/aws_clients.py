@@ -0,0 +1,53 @@
+import os
+from functools import lru_cache
+
+# Configuration
+AWS_REGION = os.getenv('AWS_REGION', 'us-west-2')
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '50'))
+AWS_CONNECT_TIMEOUT = float(os.getenv('AWS_CONNECT_TIMEOUT', '1'))
+AWS_READ_TIMEOUT = float(os.getenv('AWS_READ_TIMEOUT', '2'))
+AWS_MAX_ATTEMPTS = int(os.getenv('AWS_MAX_ATTEMPTS', '2'))
+SAGEMAKER_RUNTIME_ENDPOINT_URL = os.getenv('SAGEMAKER_RUNTIME_ENDPOINT_URL')  # local fake endpoint
+
+
+def _client_config():
+    """Shared botocore settings: large keep-alive pool, tight timeouts, few retries"""
+    from botocore.config import Config
+
+    return Config(
+        region_name=AWS_REGION,
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=AWS_READ_TIMEOUT,
+        retries={'max_attempts': AWS_MAX_ATTEMPTS, 'mode': 'standard'},
+        tcp_keepalive=True
+    )
+
+
+# boto3 clients are thread-safe, so one instance per service is shared by all requests.
+# boto3 is imported on first use so importing the API stays fast.
+
+@lru_cache(maxsize=None)
+def get_sagemaker_runtime_client():
+    import boto3
+    return boto3.client(
+        'sagemaker-runtime', config=_client_config(), endpoint_url=SAGEMAKER_RUNTIME_ENDPOINT_URL
+    )
+
+
+@lru_cache(maxsize=None)
+def get_sagemaker_client():
+    import boto3
+    return boto3.client('sagemaker', config=_client_config())
+
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    import boto3
+    return boto3.client('s3', config=_client_config())
+
+
+@lru_cache(maxsize=None)
+def get_sns_client():
+    import boto3
+    return boto3.client('sns', config=_client_config())
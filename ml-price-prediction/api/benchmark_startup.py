@@ -0,0 +1,104 @@
+"""Measure API cold start: module import time and time to the first successful /predict.
+
+Run from the api/ directory with the usual environment configured:
+
+    python benchmark_startup.py --funko-id <uuid> --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import prediction_api; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def measure_import(python):
+    """Seconds to import prediction_api in a fresh interpreter"""
+    output = subprocess.run(
+        [python, '-c', IMPORT_SNIPPET], cwd=API_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _post_json(url, payload, timeout):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status
+
+
+def measure_first_prediction(python, port, funko_id, timeout):
+    """Seconds from spawning uvicorn until /health and /predict first succeed"""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [python, '-m', 'uvicorn', 'prediction_api:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=API_DIR
+    )
+    result = {'ready_seconds': None, 'first_prediction_seconds': None}
+
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        while time.perf_counter() - started < timeout:
+            try:
+                if result['ready_seconds'] is None:
+                    with urllib.request.urlopen(f'{base_url}/health', timeout=1):
+                        result['ready_seconds'] = time.perf_counter() - started
+                if _post_json(f'{base_url}/predict', {'funko_pop_id': funko_id}, timeout=10) == 200:
+                    result['first_prediction_seconds'] = time.perf_counter() - started
+                    break
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.05)
+    finally:
+        server.terminate()
+        server.wait()
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--funko-id", type=str, required=True)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--python", type=str, default=sys.executable)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    import_times = [measure_import(args.python) for _ in range(args.runs)]
+    startups = [
+        measure_first_prediction(args.python, args.port, args.funko_id, args.timeout)
+        for _ in range(args.runs)
+    ]
+
+    def median(values):
+        values = [v for v in values if v is not None]
+        return round(statistics.median(values), 3) if values else None
+
+    report = {
+        'runs': args.runs,
+        'import_seconds': median(import_times),
+        'ready_seconds': median([s['ready_seconds'] for s in startups]),
+        'first_prediction_seconds': median([s['first_prediction_seconds'] for s in startups]),
+        'failed_runs': sum(1 for s in startups if s['first_prediction_seconds'] is None)
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
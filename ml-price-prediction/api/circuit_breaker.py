@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+
+from metrics import CIRCUIT_STATE, CIRCUIT_TRANSITIONS
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency while its circuit is open"""
+
+
+class CircuitBreaker:
+    """Fails fast after repeated errors from a dependency.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and calls
+    are rejected for ``recovery_timeout`` seconds. It then goes half-open and lets
+    up to ``half_open_max_calls`` probes through; a successful probe closes it
+    again, a failed one re-opens it.
+    """
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(circuit=name).set(_STATE_VALUES[CLOSED])
+
+    @property
+    def is_open(self):
+        """True while calls would be rejected without probing"""
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.recovery_timeout
+
+    def call(self, fn, *args, **kwargs):
+        self._before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._on_failure()
+            raise
+        self._on_success()
+        return result
+
+    def record_failure(self):
+        """Count a failure observed outside ``call``, e.g. a caller timing out"""
+        self._on_failure()
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    raise CircuitOpenError(f"Circuit '{self.name}' is open")
+                self._transition(HALF_OPEN)
+
+            if self.state == HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    raise CircuitOpenError(f"Circuit '{self.name}' is half-open and probing")
+                self._half_open_calls += 1
+
+    def _on_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def _on_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                if self.state != OPEN:
+                    self._transition(OPEN)
+
+    def _transition(self, state):
+        logger.warning(f"Circuit '{self.name}' {self.state} -> {state}")
+        self.state = state
+        self._half_open_calls = 0
+        CIRCUIT_STATE.labels(circuit=self.name).set(_STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(circuit=self.name, state=state).inc()
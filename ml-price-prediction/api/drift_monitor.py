@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import sys
+import threading
+from datetime import datetime
+
+from metrics import DRIFT_KS, DRIFT_PSI, DRIFT_RETRAIN_RECOMMENDED, DRIFT_WINDOW_ROWS
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'features'))
+from drift_sketches import PREDICTION, DriftSketch
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+DRIFT_MONITOR_ENABLED = os.getenv('DRIFT_MONITOR_ENABLED', 'true').lower() == 'true'
+DRIFT_CHECK_INTERVAL = float(os.getenv('DRIFT_CHECK_INTERVAL', '300'))
+DRIFT_MIN_ROWS = int(os.getenv('DRIFT_MIN_ROWS', '1000'))  # smaller windows are too noisy to score
+DRIFT_PSI_THRESHOLD = float(os.getenv('DRIFT_PSI_THRESHOLD', '0.25'))
+DRIFT_KS_THRESHOLD = float(os.getenv('DRIFT_KS_THRESHOLD', '0.2'))
+DRIFT_RETRAIN_MIN_FEATURES = int(os.getenv('DRIFT_RETRAIN_MIN_FEATURES', '3'))
+DRIFT_ALERT_TOPIC_ARN = os.getenv('DRIFT_ALERT_TOPIC_ARN')
+
+
+class DriftMonitor:
+    """Compares the rows the API scores with the model's training reference.
+
+    Each scored batch is added to a fixed-size DriftSketch under a lock. A
+    background thread closes the window every ``interval`` seconds once it
+    holds ``min_rows`` rows, scores it (PSI per feature and for the
+    prediction, KS for numeric ones), publishes the scores as gauges and
+    starts a new window. Retraining is recommended when the prediction
+    drifts or at least ``retrain_min_features`` inputs do; the recommendation
+    is exported as a gauge and, once per model version, sent to SNS.
+    """
+
+    def __init__(self, interval=DRIFT_CHECK_INTERVAL, min_rows=DRIFT_MIN_ROWS,
+                 psi_threshold=DRIFT_PSI_THRESHOLD, ks_threshold=DRIFT_KS_THRESHOLD,
+                 retrain_min_features=DRIFT_RETRAIN_MIN_FEATURES, alert_topic_arn=DRIFT_ALERT_TOPIC_ARN):
+        self.interval = interval
+        self.min_rows = min_rows
+        self.psi_threshold = psi_threshold
+        self.ks_threshold = ks_threshold
+        self.retrain_min_features = retrain_min_features
+        self.alert_topic_arn = alert_topic_arn
+        self.last_report = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._artifacts = None
+        self._sketch = None
+        self._alerted_versions = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, feature_matrix, prices, artifacts):
+        """Add scored rows (feature_names order) and their prices; no-op without a reference"""
+        if artifacts.drift_reference is None or len(feature_matrix) == 0:
+            return
+
+        with self._lock:
+            if artifacts is not self._artifacts:
+                if self._artifacts is not None and artifacts.loaded_at < self._artifacts.loaded_at:
+                    return  # a request pinned to the previous model; its rows don't belong here
+                # A new model brings a new reference, so the window starts over
+                self._artifacts = artifacts
+                self._sketch = DriftSketch(artifacts.drift_reference, artifacts.feature_names)
+            self._sketch.update(feature_matrix, prices)
+            rows = self._sketch.count
+        DRIFT_WINDOW_ROWS.set(rows)
+
+    def check(self):
+        """Score and reset the window if it is full enough; returns the report or None"""
+        with self._lock:
+            sketch, artifacts = self._sketch, self._artifacts
+            if sketch is None or sketch.count < self.min_rows:
+                return None
+            self._sketch = DriftSketch(artifacts.drift_reference, artifacts.feature_names)
+        DRIFT_WINDOW_ROWS.set(0)
+
+        scores = sketch.scores()
+        drifted = sorted(
+            name for name, score in scores.items()
+            if score['psi'] >= self.psi_threshold or score.get('ks', 0.0) >= self.ks_threshold
+        )
+        drifted_inputs = [name for name in drifted if name != PREDICTION]
+        retrain = PREDICTION in drifted or len(drifted_inputs) >= self.retrain_min_features
+
+        for name, score in scores.items():
+            DRIFT_PSI.labels(feature=name).set(score['psi'])
+            if 'ks' in score:
+                DRIFT_KS.labels(feature=name).set(score['ks'])
+        DRIFT_RETRAIN_RECOMMENDED.set(1 if retrain else 0)
+
+        self.last_report = {
+            'model_version': artifacts.model_version,
+            'checked_at': datetime.now().isoformat(),
+            'rows': sketch.count,
+            'drifted_features': drifted,
+            'retrain_recommended': retrain,
+            'scores': {
+                name: {key: round(value, 4) for key, value in score.items()} for name, score in scores.items()
+            }
+        }
+        if retrain:
+            logger.warning(
+                f"Drift detected for model {artifacts.model_version} over {sketch.count} rows: {drifted}"
+            )
+            self.alert(self.last_report)
+        return self.last_report
+
+    def alert(self, report):
+        """Publish a retraining recommendation to SNS, once per model version"""
+        if not self.alert_topic_arn or report['model_version'] in self._alerted_versions:
+            return
+        from aws_clients import get_sns_client
+
+        get_sns_client().publish(
+            TopicArn=self.alert_topic_arn,
+            Subject=f"Funko price model drift: retraining recommended ({report['model_version']})"[:100],
+            Message=json.dumps(report, indent=2)
+        )
+        self._alerted_versions.add(report['model_version'])
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='drift-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Drift check failed: {e}")
+
+
+def create_drift_monitor(enabled=DRIFT_MONITOR_ENABLED):
+    return DriftMonitor() if enabled else None
@@ -0,0 +1,303 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'features'))
+from funko_features import STATIC_COLUMNS, STATIC_FEATURES
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+FEATURE_STORE_DIR = os.getenv('FEATURE_STORE_DIR')
+FEATURE_STORE_RELOAD_SECONDS = int(os.getenv('FEATURE_STORE_RELOAD_SECONDS', '30'))
+FEATURE_STORE_MAX_AGE_SECONDS = int(os.getenv('FEATURE_STORE_MAX_AGE_SECONDS', '86400'))
+FEATURE_STORE_BUILD_BATCH_SIZE = int(os.getenv('FEATURE_STORE_BUILD_BATCH_SIZE', '1000'))
+
+# Column layout of the materialized matrix. release_ordinal is kept so the
+# date-dependent features can be derived per request.
+STORE_COLUMNS = STATIC_COLUMNS
+INTEGER_FEATURES = {
+    'release_month', 'is_chase', 'is_exclusive', 'is_vaulted',
+    'funko_number', 'series_encoded', 'character_encoded'
+}
+MANIFEST_NAME = 'manifest.json'
+
+
+def _source_hash(funko_data):
+    """Fingerprint of the database row a materialized feature row was built from"""
+    return hashlib.sha1(json.dumps(funko_data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _write_json_atomic(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+class FeatureStore:
+    """Read side of the materialized feature store.
+
+    The matrix is opened with mmap so every uvicorn worker on the host shares the
+    same page cache. The manifest is re-checked at most every ``reload_interval``
+    seconds and a new generation is picked up without restarting.
+    """
+
+    def __init__(self, store_dir, reload_interval=FEATURE_STORE_RELOAD_SECONDS):
+        self.store_dir = store_dir
+        self.reload_interval = reload_interval
+        self.generation = None
+        self.built_at = None
+        self.model_version = None
+        self._matrix = None
+        self._index = {}
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._maybe_reload(force=True)
+
+    def __len__(self):
+        return len(self._index)
+
+    def lookup(self, funko_pop_id):
+        """Return (funko_data, static_features) for a Funko Pop, or None if not materialized"""
+        self._maybe_reload()
+
+        matrix, index = self._matrix, self._index
+        entry = index.get(str(funko_pop_id))
+        if entry is None:
+            return None
+
+        row = matrix[entry['row']]
+        static_features = {
+            name: int(value) if name in INTEGER_FEATURES else value
+            for name, value in zip(STATIC_FEATURES, row[1:].tolist())
+        }
+        funko_data = {
+            'id': funko_pop_id,
+            'name': entry['name'],
+            'series': entry['series'],
+            'release_date': datetime.fromordinal(int(row[0])).date().isoformat()
+        }
+        return funko_data, static_features
+
+    def lookup_many(self, funko_pop_ids):
+        """Vectorized lookup: (static matrix, found mask, index entries) for many IDs.
+
+        The matrix has one row per found ID in STORE_COLUMNS order; missing IDs
+        are flagged False in the mask and have no row.
+        """
+        self._maybe_reload()
+
+        matrix, index = self._matrix, self._index
+        entries = [index.get(str(funko_pop_id)) for funko_pop_id in funko_pop_ids]
+        found = np.array([entry is not None for entry in entries], dtype=bool)
+        rows = np.array([entry['row'] for entry in entries if entry is not None], dtype=np.int64)
+
+        if matrix is None or len(rows) == 0:
+            return np.empty((0, len(STORE_COLUMNS)), dtype=np.float32), found, entries
+        return np.asarray(matrix[rows]), found, entries
+
+    def _maybe_reload(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+
+        with self._lock:
+            if not force and now < self._next_check:
+                return
+            self._next_check = now + self.reload_interval
+
+            manifest_path = os.path.join(self.store_dir, MANIFEST_NAME)
+            try:
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+            except FileNotFoundError:
+                return
+            except Exception as e:
+                logger.error(f"Failed to read feature store manifest: {e}")
+                return
+
+            if manifest['generation'] == self.generation:
+                return
+
+            try:
+                matrix = np.load(os.path.join(self.store_dir, manifest['matrix']), mmap_mode='r')
+                with open(os.path.join(self.store_dir, manifest['index'])) as f:
+                    index = json.load(f)
+            except Exception as e:
+                logger.error(f"Failed to load feature store generation {manifest['generation']}: {e}")
+                return
+
+            # Swap both references together; in-flight lookups keep the old pair
+            self._matrix, self._index = matrix, index
+            self.generation = manifest['generation']
+            self.built_at = manifest['built_at']
+            self.model_version = manifest.get('model_version')
+            logger.info(f"Loaded feature store generation {self.generation} ({len(index)} funkos)")
+
+
+class FeatureStoreBuilder:
+    """Materializes static and rolling features for every Funko Pop.
+
+    ``engineer_static_matrix`` is the serving-side batch feature function, so the
+    materialized rows are identical to what /predict would compute on the fly.
+    Category codes come from the model's feature mappings, so the store records
+    the model version it was built for and is rebuilt when that changes.
+    """
+
+    def __init__(self, store_dir, engineer_static_matrix, model_version,
+                 max_age_seconds=FEATURE_STORE_MAX_AGE_SECONDS, batch_size=FEATURE_STORE_BUILD_BATCH_SIZE):
+        self.store_dir = store_dir
+        self.engineer_static_matrix = engineer_static_matrix
+        self.model_version = model_version
+        self.max_age_seconds = max_age_seconds
+        self.batch_size = batch_size
+        os.makedirs(store_dir, exist_ok=True)
+
+    def refresh(self, funko_rows, changed_ids=None):
+        """Write a new generation, recomputing only new, changed or expired rows"""
+        started = time.time()
+        changed_ids = {str(i) for i in changed_ids} if changed_ids else set()
+        previous_matrix, previous_index, previous_manifest = self._load_previous()
+        same_model = previous_manifest is not None and previous_manifest.get('model_version') == self.model_version
+
+        entries = []
+        pending = []
+        now = time.time()
+
+        for funko_data in funko_rows:
+            funko_id = str(funko_data['id'])
+            source_hash = _source_hash(funko_data)
+            previous = previous_index.get(funko_id)
+
+            reusable = (
+                same_model
+                and previous is not None
+                and funko_id not in changed_ids
+                and previous['source_hash'] == source_hash
+                and now - previous['computed_at'] < self.max_age_seconds
+            )
+
+            if reusable:
+                entries.append([funko_data, source_hash, previous_matrix[previous['row']], previous['computed_at']])
+            else:
+                pending.append(len(entries))
+                entries.append([funko_data, source_hash, None, now])
+
+        # Recompute in batches so featurization is one vectorized call per batch
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            try:
+                matrix = self.engineer_static_matrix([entries[i][0] for i in batch])
+            except Exception as e:
+                logger.error(f"Skipping {len(batch)} funkos in feature store: {e}")
+                continue
+            for i, row in zip(batch, matrix):
+                entries[i][2] = row
+
+        rows = []
+        index = {}
+        for funko_data, source_hash, row, computed_at in entries:
+            funko_id = str(funko_data['id'])
+            if row is None or np.isnan(row).any():
+                logger.error(f"Skipping funko {funko_id} in feature store: incomplete features")
+                continue
+
+            index[funko_id] = {
+                'row': len(rows),
+                'name': funko_data.get('name'),
+                'series': funko_data.get('series'),
+                'source_hash': source_hash,
+                'computed_at': computed_at
+            }
+            rows.append(np.asarray(row, dtype=np.float32))
+
+        matrix = np.vstack(rows).astype(np.float32) if rows else np.empty((0, len(STORE_COLUMNS)), dtype=np.float32)
+        generation = (previous_manifest['generation'] if previous_manifest else 0) + 1
+        self._publish(generation, matrix, index)
+
+        logger.info(
+            f"Feature store generation {generation}: {len(index)} funkos, "
+            f"{len(pending)} recomputed in {time.time() - started:.1f}s"
+        )
+        return generation
+
+    def _load_previous(self):
+        manifest_path = os.path.join(self.store_dir, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            return None, {}, None
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        matrix = np.load(os.path.join(self.store_dir, manifest['matrix']), mmap_mode='r')
+        with open(os.path.join(self.store_dir, manifest['index'])) as f:
+            index = json.load(f)
+        return matrix, index, manifest
+
+    def _publish(self, generation, matrix, index):
+        matrix_name = f'features-{generation:06d}.npy'
+        index_name = f'index-{generation:06d}.json'
+
+        tmp_matrix = os.path.join(self.store_dir, f'{matrix_name}.tmp')
+        with open(tmp_matrix, 'wb') as f:
+            np.save(f, matrix)
+        os.replace(tmp_matrix, os.path.join(self.store_dir, matrix_name))
+        _write_json_atomic(os.path.join(self.store_dir, index_name), index)
+
+        # The manifest swap is what readers observe, so it goes last
+        _write_json_atomic(os.path.join(self.store_dir, MANIFEST_NAME), {
+            'generation': generation,
+            'matrix': matrix_name,
+            'index': index_name,
+            'columns': STORE_COLUMNS,
+            'model_version': self.model_version,
+            'built_at': datetime.now(timezone.utc).isoformat()
+        })
+        self._prune(keep={matrix_name, index_name}, generation=generation)
+
+    def _prune(self, keep, generation):
+        # Keep the previous generation around for workers that have not reloaded yet
+        previous = {f'features-{generation - 1:06d}.npy', f'index-{generation - 1:06d}.json'}
+        for name in os.listdir(self.store_dir):
+            if name.startswith(('features-', 'index-')) and name not in keep | previous:
+                os.remove(os.path.join(self.store_dir, name))
+
+
+def create_feature_store(store_dir=FEATURE_STORE_DIR):
+    """Open the feature store configured by FEATURE_STORE_DIR, if any"""
+    if not store_dir:
+        return None
+    return FeatureStore(store_dir)
+
+
+def main():
+    """Build or incrementally refresh the feature store from Supabase"""
+    import argparse
+    import prediction_api
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--store-dir", type=str, default=FEATURE_STORE_DIR)
+    parser.add_argument("--changed-ids", type=str, nargs='*', default=None)
+    args = parser.parse_args()
+
+    if not args.store_dir:
+        raise ValueError("Set FEATURE_STORE_DIR or pass --store-dir")
+
+    prediction_api.init_services(background=False)
+    predictor_api = prediction_api.predictor_api
+    builder = FeatureStoreBuilder(
+        args.store_dir, predictor_api.engineer_static_matrix, predictor_api.model_version
+    )
+    builder.refresh(predictor_api.iter_funko_data(), changed_ids=args.changed_ids)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
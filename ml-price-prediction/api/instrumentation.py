@@ -0,0 +1,159 @@
+import functools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from metrics import REQUEST_LATENCY, STAGE_LATENCY, SLOW_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))  # fraction of requests to profile
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', '500'))
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+
+_current_request = ContextVar('current_request', default=None)
+_slow_request_hooks = []
+
+
+class RequestTimings:
+    """Per-request span stack; spans record exclusive time so nested stages are not double counted"""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.stages = {}
+        self.child_time = [0.0]
+
+
+def register_slow_request_hook(hook):
+    """Call hook(report) for every profiled request slower than PROFILE_SLOW_MS"""
+    _slow_request_hooks.append(hook)
+
+
+@contextmanager
+def span(stage):
+    """Time one stage (fetch, featurize, invoke, confidence, serialize) of the current request"""
+    timings = _current_request.get()
+    if timings is not None:
+        timings.child_time.append(0.0)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if timings is None:
+            STAGE_LATENCY.labels(endpoint='background', stage=stage).observe(elapsed)
+        else:
+            exclusive = elapsed - timings.child_time.pop()
+            timings.child_time[-1] += elapsed
+            timings.stages[stage] = timings.stages.get(stage, 0.0) + exclusive
+            STAGE_LATENCY.labels(endpoint=timings.endpoint, stage=stage).observe(exclusive)
+
+
+def traced(stage):
+    """Decorator form of span"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def request_timer(endpoint):
+    """Time a whole request, optionally sampling its stack if it turns out slow"""
+    timings = RequestTimings(endpoint)
+    token = _current_request.set(timings)
+    sampler = None
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000.0)
+        sampler.start()
+
+    started = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        elapsed = time.perf_counter() - started
+        _current_request.reset(token)
+        REQUEST_LATENCY.labels(endpoint=endpoint).observe(elapsed)
+
+        if sampler is not None:
+            sampler.stop()
+            if elapsed * 1000 >= PROFILE_SLOW_MS:
+                _report_slow_request(timings, elapsed, sampler)
+
+
+def instrumented(endpoint):
+    """Decorator form of request_timer for the sync request functions"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with request_timer(endpoint):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval while a request runs"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def top_stacks(self, limit=5):
+        return [
+            {'stack': ';'.join(stack), 'samples': count}
+            for stack, count in self.samples.most_common(limit)
+        ]
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+
+def _log_slow_request(report):
+    logger.warning(
+        f"Slow request {report['endpoint']} took {report['duration_ms']:.1f}ms; "
+        f"stages={report['stages_ms']} top_stacks={report['top_stacks'][:3]}"
+    )
+
+
+def _report_slow_request(timings, elapsed, sampler):
+    SLOW_REQUESTS.labels(endpoint=timings.endpoint).inc()
+    report = {
+        'endpoint': timings.endpoint,
+        'duration_ms': elapsed * 1000,
+        'stages_ms': {stage: round(seconds * 1000, 2) for stage, seconds in timings.stages.items()},
+        'top_stacks': sampler.top_stacks()
+    }
+    for hook in _slow_request_hooks or [_log_slow_request]:
+        try:
+            hook(report)
+        except Exception as e:
+            logger.error(f"Slow request hook failed: {e}")
@@ -0,0 +1,100 @@
+import os
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+)
+from prometheus_client import multiprocess
+
+# Prediction cache
+CACHE_REQUESTS = Counter(
+    'prediction_cache_requests_total',
+    'Prediction cache lookups by result (hit, stale, miss)',
+    ['result']
+)
+CACHE_LATENCY_SAVED = Counter(
+    'prediction_cache_latency_saved_seconds_total',
+    'Compute time avoided by serving predictions from the cache'
+)
+CACHE_EVICTIONS = Counter(
+    'prediction_cache_evictions_total',
+    'Entries evicted from the in-process prediction cache'
+)
+
+# Micro-batching of SageMaker invocations
+BATCH_SIZE = Histogram(
+    'prediction_batch_size',
+    'Instances per coalesced SageMaker invocation',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+BATCH_QUEUE_WAIT = Histogram(
+    'prediction_batch_queue_wait_seconds',
+    'Time a prediction waited in the micro-batch queue before dispatch',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+# SageMaker circuit breaker and fallbacks
+CIRCUIT_STATE = Gauge(
+    'prediction_circuit_state',
+    'Circuit breaker state (0=closed, 1=half_open, 2=open)',
+    ['circuit']
+)
+CIRCUIT_TRANSITIONS = Counter(
+    'prediction_circuit_transitions_total',
+    'Circuit breaker state transitions',
+    ['circuit', 'state']
+)
+FALLBACKS = Counter(
+    'prediction_fallbacks_total',
+    'Predictions served without the SageMaker endpoint',
+    ['backend', 'reason']
+)
+
+# Request and per-stage latency
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+REQUEST_LATENCY = Histogram(
+    'prediction_request_seconds',
+    'End-to-end latency of prediction requests',
+    ['endpoint'],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_LATENCY = Histogram(
+    'prediction_stage_seconds',
+    'Exclusive time spent in each stage of a prediction request',
+    ['endpoint', 'stage'],
+    buckets=LATENCY_BUCKETS
+)
+SLOW_REQUESTS = Counter(
+    'prediction_slow_requests_total',
+    'Profiled requests slower than PROFILE_SLOW_MS',
+    ['endpoint']
+)
+
+# Input and prediction drift against the training reference (see drift_monitor.py)
+DRIFT_PSI = Gauge(
+    'prediction_drift_psi',
+    'Population stability index of the last drift window versus training',
+    ['feature']
+)
+DRIFT_KS = Gauge(
+    'prediction_drift_ks',
+    'KS statistic (at the reference quantile edges) of the last drift window versus training',
+    ['feature']
+)
+DRIFT_WINDOW_ROWS = Gauge(
+    'prediction_drift_window_rows',
+    'Scored rows in the drift window being filled'
+)
+DRIFT_RETRAIN_RECOMMENDED = Gauge(
+    'prediction_drift_retrain_recommended',
+    '1 when the last drift check crossed the retraining thresholds'
+)
+
+
+def render_metrics():
+    """Prometheus exposition for this process, or all workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,113 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from metrics import BATCH_SIZE, BATCH_QUEUE_WAIT
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row predictions into multi-instance invocations.
+
+    Callers block in ``submit`` while a dispatcher thread gathers up to
+    ``max_batch_size`` rows, or whatever arrived within ``max_wait_ms`` of the
+    first one, and scores them with a single ``invoke_batch(instances)`` call.
+    A caller gives up after ``timeout`` seconds (None waits forever) and raises
+    ``TimeoutError``, so a stuck or dead dispatcher cannot hang a request.
+    """
+
+    def __init__(self, invoke_batch, max_batch_size=32, max_wait_ms=5.0, timeout=None):
+        self.invoke_batch = invoke_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._closed = False
+        self._dispatcher = threading.Thread(
+            target=self._run, name='prediction-micro-batcher', daemon=True
+        )
+        self._dispatcher.start()
+
+    def submit(self, feature_vector, timeout=None):
+        """Queue one feature vector and wait for its prediction"""
+        if self._closed:
+            raise RuntimeError("Micro-batcher is closed")
+
+        future = Future()
+        self._queue.put((feature_vector, future, time.perf_counter()))
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            # Cancelled rows are dropped from the batch if it has not been dispatched yet
+            future.cancel()
+            raise TimeoutError("Timed out waiting for a batched prediction")
+
+    def close(self):
+        """Stop the dispatcher after draining queued requests"""
+        self._closed = True
+        self._queue.put(None)
+        self._dispatcher.join()
+
+        # Fail anything submitted after the dispatcher's stop marker
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("Micro-batcher is closed"))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait_seconds
+            stop = False
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._dispatch(batch)
+            if stop:
+                return
+
+    def _dispatch(self, batch):
+        # Skip rows whose callers already timed out
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        dispatched_at = time.perf_counter()
+        BATCH_SIZE.observe(len(batch))
+        for _, _, enqueued_at in batch:
+            BATCH_QUEUE_WAIT.observe(dispatched_at - enqueued_at)
+
+        try:
+            predictions = self.invoke_batch([vector for vector, _, _ in batch])
+            if len(predictions) != len(batch):
+                raise ValueError(f"Expected {len(batch)} predictions, got {len(predictions)}")
+        except Exception as e:
+            logger.error(f"Batched invocation of {len(batch)} instances failed: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        # Scatter results back to the waiting callers in submission order
+        for (_, future, _), prediction in zip(batch, predictions):
+            future.set_result(prediction)
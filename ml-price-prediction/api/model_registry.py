@@ -0,0 +1,267 @@
+import io
+import json
+import logging
+import os
+import sys
+import tarfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+from urllib.parse import urlparse
+
+import numpy as np
+
+from aws_clients import get_s3_client
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'features'))
+from drift_sketches import DriftReference
+from funko_features import FEATURE_NAMES
+from similarity_index import SimilarityIndex
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+MODEL_ARTIFACT_URI = os.getenv('MODEL_ARTIFACT_URI')  # s3://bucket/prefix/ or a local directory
+MODEL_RELOAD_INTERVAL = float(os.getenv('MODEL_RELOAD_INTERVAL', '60'))
+MANIFEST_NAME = 'manifest.json'
+DRIFT_REFERENCE_NAME = 'drift_reference.json'
+FAST_MODEL_NAME = 'model_fast.joblib'
+
+DEFAULT_FEATURE_NAMES = FEATURE_NAMES
+
+# Artifacts pinned by the request currently running in this context
+_pinned_artifacts: ContextVar[Optional['ModelArtifacts']] = ContextVar('pinned_artifacts', default=None)
+
+
+class ModelArtifacts:
+    """Everything that must change together when a new model is published.
+
+    Instances are never mutated, so a request holding one sees a consistent set.
+    """
+
+    def __init__(self, model_version, feature_names, feature_mappings, embedded_model=None, manifest=None,
+                 similarity_index=None, drift_reference=None, fast_model=None):
+        self.model_version = model_version
+        self.feature_names = feature_names
+        self.feature_mappings = feature_mappings
+        self.embedded_model = embedded_model
+        self.quantile_alphas = quantile_alphas(embedded_model)
+        # Truncated/shallower booster within train.py's latency budget, served under load
+        self.fast_model = fast_model
+        self.similarity_index = similarity_index
+        self.drift_reference = drift_reference
+        self.manifest = manifest or {}
+        self.loaded_at = datetime.now().isoformat()
+
+
+class LocalArtifactSource:
+    """Artifacts in a local directory (development stand-in for the S3 prefix)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def read(self, name):
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            return f.read()
+
+
+class S3ArtifactSource:
+    """Artifacts under an S3 prefix, as uploaded by the pipeline and deployer"""
+
+    def __init__(self, uri):
+        parsed = urlparse(uri)
+        self.bucket = parsed.netloc
+        self.prefix = parsed.path.lstrip('/')
+
+    def read(self, name):
+        # Manifest entries may be full s3:// URIs (e.g. the training job's model.tar.gz)
+        if name.startswith('s3://'):
+            parsed = urlparse(name)
+            bucket, key = parsed.netloc, parsed.path.lstrip('/')
+        elif self.prefix:
+            bucket, key = self.bucket, f"{self.prefix.rstrip('/')}/{name}"
+        else:
+            bucket, key = self.bucket, name
+        return get_s3_client().get_object(Bucket=bucket, Key=key)['Body'].read()
+
+
+def create_artifact_source(uri=MODEL_ARTIFACT_URI):
+    if not uri:
+        return None
+    if uri.startswith('s3://'):
+        return S3ArtifactSource(uri)
+    return LocalArtifactSource(uri)
+
+
+def _is_archive(name):
+    return name.endswith(('.tar.gz', '.tgz'))
+
+
+def _archive_member(payload, suffix):
+    """Bytes of the first file in a model.tar.gz whose name ends with suffix, or None"""
+    with tarfile.open(fileobj=io.BytesIO(payload), mode='r:gz') as archive:
+        member = next((m for m in archive.getmembers() if m.name.endswith(suffix)), None)
+        return archive.extractfile(member).read() if member is not None else None
+
+
+def _load_model_bytes(name, payload):
+    """Unpickle a model.joblib, or extract it from a SageMaker model.tar.gz"""
+    import joblib
+
+    if _is_archive(name):
+        payload = _archive_member(payload, 'model.joblib')
+    return joblib.load(io.BytesIO(payload))
+
+
+def load_artifacts(source):
+    """Read the manifest and every artifact it references, then warm the model"""
+    manifest = json.loads(source.read(MANIFEST_NAME))
+    feature_names = json.loads(source.read(manifest.get('feature_names', 'feature_names.json')))
+    feature_mappings = json.loads(source.read(manifest.get('feature_mappings', 'feature_mappings.json')))
+
+    if not feature_names:
+        raise ValueError("Manifest references an empty feature list")
+
+    embedded_model = None
+    fast_model = None
+    drift_payload = None
+    if manifest.get('model'):
+        model_payload = source.read(manifest['model'])
+        embedded_model = _load_model_bytes(manifest['model'], model_payload)
+        warm_model(embedded_model, len(feature_names))
+        # train.py writes the drift reference next to the model, so it ships inside model.tar.gz
+        if _is_archive(manifest['model']):
+            drift_payload = _archive_member(model_payload, DRIFT_REFERENCE_NAME)
+            fast_payload = _archive_member(model_payload, FAST_MODEL_NAME)
+            if fast_payload is not None:
+                fast_model = _load_model_bytes(FAST_MODEL_NAME, fast_payload)
+
+    if manifest.get('fast_model'):
+        fast_model = _load_model_bytes(manifest['fast_model'], source.read(manifest['fast_model']))
+    if fast_model is not None:
+        warm_model(fast_model, len(feature_names))
+
+    if manifest.get('drift_reference'):
+        drift_payload = source.read(manifest['drift_reference'])
+    drift_reference = DriftReference.from_json(drift_payload) if drift_payload else None
+
+    # Optional: nearest-neighbour prices for Funko Pops with no sales (see data_pipeline.py)
+    similarity_index = None
+    if manifest.get('similarity_index'):
+        similarity_index = SimilarityIndex.from_bytes(source.read(manifest['similarity_index']))
+
+    return ModelArtifacts(
+        model_version=str(manifest['model_version']),
+        feature_names=feature_names,
+        feature_mappings=feature_mappings,
+        embedded_model=embedded_model,
+        manifest=manifest,
+        similarity_index=similarity_index,
+        drift_reference=drift_reference,
+        fast_model=fast_model
+    )
+
+
+def quantile_alphas(model):
+    """Sorted alphas of a multi-quantile booster (recorded by train.py), or None"""
+    alphas = model.attr('quantile_alphas') if model is not None else None
+    return sorted(json.loads(alphas)) if alphas else None
+
+
+def median_index(alphas):
+    return int(np.argmin(np.abs(np.asarray(alphas) - 0.5)))
+
+
+def price_intervals(predictions, alphas):
+    """(n, 3) matrix of price, lower and upper bound from raw booster output.
+
+    Bounds are NaN for a single-output model. Rows are sorted first, which
+    removes any crossing between separately fitted quantiles.
+    """
+    predictions = np.asarray(predictions, dtype=np.float64)
+    if not alphas or predictions.ndim == 1:
+        predictions = predictions.reshape(len(predictions))
+        return np.column_stack([predictions, np.full(len(predictions), np.nan), np.full(len(predictions), np.nan)])
+    predictions = np.sort(predictions, axis=1)
+    return np.column_stack([predictions[:, median_index(alphas)], predictions[:, 0], predictions[:, -1]])
+
+
+def warm_model(model, feature_count):
+    """Run one prediction so lazy initialization happens before the swap"""
+    import xgboost as xgb
+
+    if hasattr(model, 'num_features') and model.num_features() != feature_count:
+        raise ValueError(f"Model expects {model.num_features()} features, manifest lists {feature_count}")
+    model.predict(xgb.DMatrix(np.zeros((1, feature_count), dtype=np.float32)))
+
+
+class ArtifactHolder:
+    """Double-buffered artifacts: readers see one immutable bundle, reloads swap the reference"""
+
+    def __init__(self, artifacts):
+        self._artifacts = artifacts
+
+    @property
+    def current(self):
+        return _pinned_artifacts.get() or self._artifacts
+
+    def swap(self, artifacts):
+        previous, self._artifacts = self._artifacts, artifacts
+        logger.info(f"Swapped model {previous.model_version} -> {artifacts.model_version}")
+
+    @contextmanager
+    def pinned(self, artifacts=None):
+        """Keep one bundle (the current one by default) for the rest of a request, even if a reload lands"""
+        token = _pinned_artifacts.set(artifacts or self.current)
+        try:
+            yield
+        finally:
+            _pinned_artifacts.reset(token)
+
+
+class ModelReloader:
+    """Polls the artifact source and swaps in new versions off the request path"""
+
+    def __init__(self, source, holder, interval=MODEL_RELOAD_INTERVAL):
+        self.source = source
+        self.holder = holder
+        self.interval = interval
+        self.last_checked = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='model-reloader', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def check(self):
+        """Load and swap if the manifest names a different version; returns True on swap"""
+        self.last_checked = datetime.now().isoformat()
+        manifest = json.loads(self.source.read(MANIFEST_NAME))
+        if str(manifest['model_version']) == self.holder.current.model_version:
+            return False
+
+        started = time.perf_counter()
+        artifacts = load_artifacts(self.source)
+        self.holder.swap(artifacts)
+        logger.info(f"Loaded model {artifacts.model_version} in {time.perf_counter() - started:.2f}s")
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+                self.last_error = None
+            except Exception as e:
+                # Keep serving the current version; try again next interval
+                self.last_error = str(e)
+                logger.error(f"Model reload failed: {e}")
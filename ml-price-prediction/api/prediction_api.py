@@ -1,35 +1,86 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
-import boto3
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import json
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
 import os
-from supabase import create_client, Client
-import pandas as pd
+import sys
 import numpy as np
 
+from prediction_cache import create_prediction_cache, InMemoryCacheBackend, PredictionCache
+from feature_store import create_feature_store, STORE_COLUMNS, STATIC_FEATURES
+from micro_batcher import MicroBatcher
+from aws_clients import (
+    get_sagemaker_runtime_client, get_sagemaker_client,
+    AWS_CONNECT_TIMEOUT, AWS_READ_TIMEOUT, AWS_MAX_ATTEMPTS
+)
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from metrics import FALLBACKS, render_metrics
+from price_history import PriceHistoryService, HISTORY_MAX_POINTS
+from status_monitor import StatusMonitor, StatusSnapshot
+from explanations import create_explainer
+from drift_monitor import create_drift_monitor
+from instrumentation import traced, instrumented, request_timer, span
+from model_registry import (
+    ArtifactHolder, ModelArtifacts, ModelReloader, DEFAULT_FEATURE_NAMES,
+    FAST_MODEL_NAME, create_artifact_source, load_artifacts, price_intervals
+)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'features'))
+import funko_features
+from funko_features import EPOCH_ORDINAL
+from price_store import create_price_store
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(
-    title="Funko Price Prediction API",
-    description="AI-powered price prediction for Funko Pop collectibles",
-    version="1.0.0"
-)
-
 # Configuration
 SAGEMAKER_ENDPOINT = os.getenv('SAGEMAKER_ENDPOINT_NAME', 'funko-price-endpoint')
-AWS_REGION = os.getenv('AWS_REGION', 'us-west-2')
+MICRO_BATCHING = os.getenv('MICRO_BATCHING', 'false').lower() == 'true'
+MICRO_BATCH_MAX_SIZE = int(os.getenv('MICRO_BATCH_MAX_SIZE', '32'))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv('MICRO_BATCH_MAX_WAIT_MS', '5'))
+# Longest a batched caller waits: every boto attempt timing out, plus the batching window
+MICRO_BATCH_TIMEOUT = float(os.getenv(
+    'MICRO_BATCH_TIMEOUT',
+    str((AWS_CONNECT_TIMEOUT + AWS_READ_TIMEOUT) * AWS_MAX_ATTEMPTS + MICRO_BATCH_MAX_WAIT_MS / 1000.0)
+))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RECOVERY_SECONDS = float(os.getenv('CIRCUIT_RECOVERY_SECONDS', '30'))
+EMBEDDED_MODEL_PATH = os.getenv('EMBEDDED_MODEL_PATH')  # local model.joblib used as fallback
+# Serve the latency-budgeted fast model once this many embedded predictions are running (0 = never)
+FAST_MODEL_MIN_IN_FLIGHT = int(os.getenv('FAST_MODEL_MIN_IN_FLIGHT', '4'))
+STREAM_SUB_BATCH_SIZE = int(os.getenv('STREAM_SUB_BATCH_SIZE', '100'))
+COLLECTION_MAX_ITEMS = int(os.getenv('COLLECTION_MAX_ITEMS', '10000'))
+CURVE_MAX_HORIZONS = int(os.getenv('CURVE_MAX_HORIZONS', '400'))
+CURVE_BASE_CACHE_TTL = int(os.getenv('CURVE_BASE_CACHE_TTL', '3600'))
 
-# Initialize clients
-sagemaker_runtime = boto3.client('sagemaker-runtime', region_name=AWS_REGION)
-supabase: Client = create_client(
-    os.getenv('SUPABASE_URL'),
-    os.getenv('SUPABASE_ANON_KEY')
-)
+# Set by fallback_prices, so the prediction cache can tell a degraded response from a model one
+_served_fallback: ContextVar[bool] = ContextVar('served_fallback', default=False)
+# Which model produced the current request's prices: only the manifest booster's can be explained
+_served_backend: ContextVar[str] = ContextVar('served_backend', default='sagemaker')
+EXPLAINABLE_BACKENDS = ('sagemaker', 'embedded')
+
+# Clients and services are created by init_services() when the app starts, so
+# importing this module stays cheap and does not need credentials
+sagemaker_runtime = None
+supabase = None
+predictor_api = None
+prediction_cache = None
+model_reloader = None
+base_feature_cache = None
+feature_store = None
+status_monitor = None
+explainer = None
+drift_monitor = None
 
 # Pydantic models for API
 class PricePredictionRequest(BaseModel):
@@ -61,42 +112,118 @@ class PriceHistoryResponse(BaseModel):
     trend_analysis: Dict[str, Any]
     volatility_score: float
 
+class PriceCurveRequest(BaseModel):
+    funko_pop_id: str = Field(..., description="Funko Pop ID from database")
+    condition: str = Field(default="mint", description="Condition: mint, near_mint, very_fine, fine, poor")
+    marketplace: str = Field(default="ebay", description="Marketplace: ebay, mercari, amazon, funko_shop")
+    horizons: Optional[List[int]] = Field(default=None, description="Explicit horizons in days; overrides the range")
+    start_days: int = Field(default=0, ge=0, description="First horizon of the range")
+    end_days: int = Field(default=365, ge=0, description="Last horizon of the range (inclusive)")
+    step_days: int = Field(default=30, ge=1, description="Spacing between horizons")
+
+class PriceCurveResponse(BaseModel):
+    funko_pop_id: str
+    funko_name: str
+    series: str
+    condition: str
+    marketplace: str
+    curve: List[Dict[str, Any]]
+    model_version: str
+
+class CollectionItem(BaseModel):
+    funko_pop_id: str = Field(..., description="Funko Pop ID from database")
+    condition: str = Field(default="mint", description="Condition: mint, near_mint, very_fine, fine, poor")
+    quantity: int = Field(default=1, ge=1, description="Number of copies owned")
+
+class CollectionValuationRequest(BaseModel):
+    items: List[CollectionItem] = Field(..., description="Items in the collection")
+    marketplace: str = Field(default="ebay", description="Marketplace to value the collection on")
+    future_days: int = Field(default=0, description="Days into future for valuation")
+
+class CollectionValuationResponse(BaseModel):
+    items: List[Dict[str, Any]]
+    total_value: float
+    total_range: Dict[str, float]  # min, max
+    item_count: int
+    total_quantity: int
+    missing_funko_pop_ids: List[str]
+    valuation_date: str
+    model_version: str
+
 class FunkoPricePredictionAPI:
     def __init__(self):
-        self.feature_mappings = self._load_feature_mappings()
-        self.feature_names = self._load_feature_names()
+        self.artifact_source = create_artifact_source()
+        self.artifact_holder = ArtifactHolder(self._load_initial_artifacts())
+        self.price_history = PriceHistoryService(supabase, price_store=create_price_store())
+        self.sagemaker_breaker = CircuitBreaker(
+            'sagemaker', CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RECOVERY_SECONDS
+        )
+        self.batcher = MicroBatcher(
+            self.invoke_endpoint, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS, MICRO_BATCH_TIMEOUT
+        ) if MICRO_BATCHING else None
+        self._embedded_in_flight = 0
+        self._embedded_lock = threading.Lock()
+    
+    # Model artifacts are read through the holder so a reload swaps them all at once
+    @property
+    def feature_names(self):
+        return self.artifact_holder.current.feature_names
+    
+    @property
+    def feature_mappings(self):
+        return self.artifact_holder.current.feature_mappings
+    
+    @property
+    def model_version(self):
+        return self.artifact_holder.current.model_version
+    
+    @property
+    def embedded_model(self):
+        return self.artifact_holder.current.embedded_model
+    
+    @property
+    def similarity_index(self):
+        return self.artifact_holder.current.similarity_index
+    
+    def pinned(self, artifacts=None):
+        """Context manager that keeps one model version for the whole request"""
+        return self.artifact_holder.pinned(artifacts)
+    
+    def _load_initial_artifacts(self):
+        """Load the published artifacts, or fall back to the built-in defaults"""
+        if self.artifact_source is not None:
+            try:
+                artifacts = load_artifacts(self.artifact_source)
+                logger.info(f"Loaded model artifacts version {artifacts.model_version}")
+                return artifacts
+            except Exception as e:
+                logger.error(f"Failed to load model artifacts: {e}")
         
-    def _load_feature_mappings(self):
-        """Load feature mappings from S3 or cache"""
-        try:
-            # In production, cache these mappings
-            s3_client = boto3.client('s3')
-            # You'd implement S3 loading here
-            # For now, return default mappings
-            return {
-                'series_mapping': {},
-                'character_mapping': {}
-            }
-        except Exception as e:
-            logger.error(f"Failed to load feature mappings: {e}")
-            return {'series_mapping': {}, 'character_mapping': {}}
+        # train.py saves the fast model next to model.joblib when the full model misses its latency budget
+        fast_model_path = os.path.join(os.path.dirname(EMBEDDED_MODEL_PATH), FAST_MODEL_NAME) if EMBEDDED_MODEL_PATH else None
+        return ModelArtifacts(
+            model_version="1.0.0",
+            feature_names=DEFAULT_FEATURE_NAMES,
+            feature_mappings={'series_mapping': {}, 'character_mapping': {}},
+            embedded_model=self._load_embedded_model(EMBEDDED_MODEL_PATH),
+            fast_model=self._load_embedded_model(fast_model_path) if fast_model_path and os.path.exists(fast_model_path) else None
+        )
     
-    def _load_feature_names(self):
-        """Load feature names from S3 or cache"""
+    def _load_embedded_model(self, path):
+        """Load a local copy of a trained booster, if configured"""
+        if not path:
+            return None
+        
         try:
-            # In production, load from S3
-            return [
-                'days_since_release', 'release_month', 'sale_month',
-                'sale_day_of_week', 'is_weekend_sale', 'is_chase',
-                'is_exclusive', 'is_vaulted', 'funko_number',
-                'series_encoded', 'character_encoded', 'condition_score',
-                'marketplace_encoded', 'avg_price_7d', 'avg_price_30d',
-                'avg_price_90d', 'price_volatility_30d', 'base_estimated_value'
-            ]
+            import joblib
+            model = joblib.load(path)
+            logger.info(f"Loaded embedded model from {path}")
+            return model
         except Exception as e:
-            logger.error(f"Failed to load feature names: {e}")
-            return []
+            logger.error(f"Failed to load embedded model: {e}")
+            return None
     
+    @traced('fetch')
     def get_funko_data(self, funko_pop_id: str):
         """Get Funko Pop data from Supabase"""
         try:
@@ -114,151 +241,542 @@ class FunkoPricePredictionAPI:
             logger.error(f"Error fetching Funko data: {e}")
             raise
     
-    def get_price_history(self, funko_pop_id: str, days=90):
-        """Get price history for a Funko Pop"""
-        try:
-            # In a real implementation, you'd query your price_history table
-            # For now, return simulated data
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
+    def iter_funko_data(self, page_size=1000):
+        """Iterate over every Funko Pop in Supabase, one page at a time"""
+        offset = 0
+        while True:
+            response = supabase.table('funko_pops').select(
+                'id, name, series, character, funko_number, release_date, '
+                'is_chase, is_exclusive, is_vaulted, estimated_value, rarity'
+            ).order('id').range(offset, offset + page_size - 1).execute()
             
-            # Simulate price history
-            prices = []
-            for i in range(min(days, 30)):  # Generate up to 30 data points
-                price_date = start_date + timedelta(days=i * (days // 30))
-                # Simulate price with some randomness
-                base_price = 20 + np.random.normal(0, 5)
-                prices.append({
-                    'date': price_date.isoformat(),
-                    'price': max(5, base_price),
-                    'marketplace': 'ebay',
-                    'condition': 'mint'
-                })
+            yield from response.data
             
-            return prices
+            if len(response.data) < page_size:
+                break
+            offset += page_size
+    
+    @traced('fetch')
+    def get_price_history(self, funko_pop_id: str, days=90, max_points=None):
+        """Get daily (or weekly, for long ranges) aggregated price history for a Funko Pop"""
+        try:
+            return self.price_history.get_points(funko_pop_id, days, max_points)
             
         except Exception as e:
             logger.error(f"Error fetching price history: {e}")
             return []
     
-    def engineer_prediction_features(self, funko_data, condition, marketplace, future_days):
-        """Engineer features for prediction"""
+    @traced('fetch')
+    def get_recent_prices(self, funko_pop_ids):
+        """Last individual sale prices per Funko Pop, the sequence the training windows use"""
         try:
-            features = {}
-            
-            # Time-based features
-            release_date = pd.to_datetime(funko_data['release_date'])
-            prediction_date = pd.to_datetime(datetime.now()) + pd.Timedelta(days=future_days)
-            
-            features['days_since_release'] = (prediction_date - release_date).days
-            features['release_month'] = release_date.month
-            features['sale_month'] = prediction_date.month
-            features['sale_day_of_week'] = prediction_date.dayofweek
-            features['is_weekend_sale'] = 1 if prediction_date.dayofweek >= 5 else 0
-            
-            # Rarity features
-            features['is_chase'] = 1 if funko_data.get('is_chase') else 0
-            features['is_exclusive'] = 1 if funko_data.get('is_exclusive') else 0
-            features['is_vaulted'] = 1 if funko_data.get('is_vaulted') else 0
-            features['funko_number'] = funko_data.get('funko_number', 0) or 0
-            
-            # Series and character encoding (simplified)
-            series = funko_data.get('series', '')
-            character = funko_data.get('character', '')
-            features['series_encoded'] = hash(series) % 1000 if series else 0
-            features['character_encoded'] = hash(character) % 1000 if character else 0
-            
-            # Condition mapping
-            condition_map = {'mint': 5, 'near_mint': 4, 'very_fine': 3, 'fine': 2, 'poor': 1}
-            features['condition_score'] = condition_map.get(condition, 3)
-            
-            # Marketplace mapping
-            marketplace_map = {'ebay': 1, 'mercari': 2, 'amazon': 3, 'funko_shop': 4}
-            features['marketplace_encoded'] = marketplace_map.get(marketplace, 1)
-            
-            # Get historical price features
-            price_history = self.get_price_history(funko_data['id'])
-            
-            if price_history:
-                prices = [p['price'] for p in price_history]
-                features['avg_price_7d'] = np.mean(prices[-7:]) if len(prices) >= 7 else np.mean(prices)
-                features['avg_price_30d'] = np.mean(prices[-30:]) if len(prices) >= 30 else np.mean(prices)
-                features['avg_price_90d'] = np.mean(prices)
-                features['price_volatility_30d'] = np.std(prices[-30:]) if len(prices) >= 30 else np.std(prices)
-            else:
-                # Use base estimated value if no history
-                base_value = funko_data.get('estimated_value', 15) or 15
-                features['avg_price_7d'] = base_value
-                features['avg_price_30d'] = base_value
-                features['avg_price_90d'] = base_value
-                features['price_volatility_30d'] = 2.0
+            return self.price_history.recent_prices(funko_pop_ids, max(funko_features.PRICE_WINDOWS))
             
-            features['base_estimated_value'] = funko_data.get('estimated_value', 15) or 15
+        except Exception as e:
+            logger.error(f"Error fetching recent prices: {e}")
+            return {}
+    
+    @traced('featurize')
+    def engineer_static_matrix(self, funko_rows):
+        """STORE_COLUMNS matrix for many Funko Pops, each with its recent sales"""
+        recent_prices = self.get_recent_prices([funko_data['id'] for funko_data in funko_rows])
+        price_sequences = [recent_prices.get(str(funko_data['id']), []) for funko_data in funko_rows]
+        return funko_features.engineer_static_matrix(
+            funko_features.rows_to_columns(funko_rows), price_sequences, self.feature_mappings,
+            self.similarity_index
+        )
+    
+    def engineer_static_features(self, funko_data):
+        """Engineer the features that only depend on the Funko Pop itself"""
+        try:
+            row = self.engineer_static_matrix([funko_data])[0]
+            if np.isnan(row).any():
+                raise ValueError(f"Incomplete Funko Pop data for {funko_data.get('id')}")
             
-            return features
+            return dict(zip(STATIC_FEATURES, row[1:].tolist()))
             
         except Exception as e:
-            logger.error(f"Error engineering features: {e}")
+            logger.error(f"Error engineering static features: {e}")
             raise
     
+    @traced('featurize')
+    def apply_request_features(self, static_features, release_date, condition, marketplace, future_days):
+        """Add the date, condition and marketplace features for a request"""
+        features = dict(static_features)
+        release_ordinal = funko_features.to_epoch_days([release_date]) + EPOCH_ORDINAL
+        
+        columns = funko_features.sale_feature_columns(
+            release_ordinal, funko_features.today_epoch_days() + future_days, [condition], [marketplace]
+        )
+        features.update({name: float(values[0]) for name, values in columns.items()})
+        return features
+    
+    @traced('fetch')
+    def get_funko_data_many(self, funko_pop_ids, chunk_size=500):
+        """Get many Funko Pops from Supabase with one query per chunk"""
+        rows = []
+        for start in range(0, len(funko_pop_ids), chunk_size):
+            response = supabase.table('funko_pops').select(
+                'id, name, series, character, funko_number, release_date, '
+                'is_chase, is_exclusive, is_vaulted, estimated_value, rarity'
+            ).in_('id', funko_pop_ids[start:start + chunk_size]).execute()
+            rows.extend(response.data)
+        return rows
+    
+    @traced('featurize')
+    def build_feature_matrix(self, static_matrix, conditions, marketplace, future_days):
+        """Add the request columns to a STORE_COLUMNS matrix and return it in feature_names order.
+        
+        future_days may be a scalar or one horizon per row.
+        """
+        sale_days = funko_features.today_epoch_days() + np.asarray(future_days, dtype=np.int64)
+        return funko_features.engineer_request_matrix(
+            static_matrix, sale_days, conditions, [marketplace], self.feature_names
+        )
+    
+    # Predictions are (n, 3) rows of price, lower and upper bound. A multi-quantile
+    # model fills in the bounds from the same call; otherwise they are NaN and
+    # calculate_confidence_and_ranges falls back to the volatility heuristic.
+    
+    @traced('invoke')
+    def predict_matrix(self, feature_matrix):
+        """Score a feature matrix (rows in feature_names order) with one model call"""
+        if len(feature_matrix) == 0:
+            return np.empty((0, 3))
+        
+        if not self.sagemaker_breaker.is_open:
+            try:
+                return np.asarray(self.invoke_endpoint(feature_matrix.tolist()), dtype=np.float64)
+            except CircuitOpenError:
+                reason = 'circuit_open'
+            except Exception as e:
+                logger.error(f"Error calling SageMaker endpoint for {len(feature_matrix)} instances: {e}")
+                reason = 'error'
+        else:
+            reason = 'circuit_open'
+        
+        features_list = [
+            {'base_estimated_value': value}
+            for value in feature_matrix[:, self.feature_names.index('base_estimated_value')]
+        ]
+        return np.asarray(self.fallback_prices(feature_matrix, features_list, reason), dtype=np.float64)
+    
+    @traced('confidence')
+    def calculate_confidence_and_ranges(self, predictions, volatility):
+        """Vectorized calculate_confidence_and_range over (n, 3) predictions"""
+        prices, lower, upper = predictions[:, 0], predictions[:, 1], predictions[:, 2]
+        confidence = 0.8 * np.maximum(0.3, 1 - (volatility / 10))
+        range_percentage = 0.2 / confidence
+        price_min, price_max = prices * (1 - range_percentage), prices * (1 + range_percentage)
+        
+        # Model intervals replace the heuristic range. Confidence inverts the heuristic's
+        # width formula (width = 0.4 / confidence), so scores stay on the same scale
+        has_interval = ~np.isnan(lower)
+        relative_width = (upper - lower) / np.maximum(np.abs(prices), 0.01)
+        interval_confidence = np.clip(0.4 / np.maximum(relative_width, 1e-6), 0.05, 0.95)
+        return (
+            np.where(has_interval, interval_confidence, confidence),
+            np.where(has_interval, lower, price_min),
+            np.where(has_interval, upper, price_max)
+        )
+    
+    def invoke_endpoint(self, instances):
+        """Score a list of feature vectors with one SageMaker invocation"""
+        return self.sagemaker_breaker.call(self._invoke_endpoint, instances)
+    
+    def _invoke_endpoint(self, instances):
+        # Prepare payload for SageMaker
+        payload = {
+            'instances': instances
+        }
+        
+        # Call SageMaker endpoint
+        response = sagemaker_runtime.invoke_endpoint(
+            EndpointName=SAGEMAKER_ENDPOINT,
+            ContentType='application/json',
+            Body=json.dumps(payload)
+        )
+        
+        # Parse response; multi-quantile models also return interval bounds
+        result = json.loads(response['Body'].read().decode())
+        prices = result['predictions']
+        lower = result.get('lower') or [None] * len(prices)
+        upper = result.get('upper') or [None] * len(prices)
+        return [
+            [price, np.nan if low is None else low, np.nan if high is None else high]
+            for price, low, high in zip(prices, lower, upper)
+        ]
+    
+    @traced('invoke')
     def predict_price(self, features):
-        """Call SageMaker endpoint for prediction"""
+        """Call SageMaker endpoint for prediction; returns one (price, lower, upper) row"""
+        # Prepare features in the correct order
+        feature_vector = [features.get(name, 0) for name in self.feature_names]
+        
+        # Skip the endpoint entirely while the circuit is open
+        if self.sagemaker_breaker.is_open:
+            return self.fallback_price(feature_vector, features, 'circuit_open')
+        
         try:
-            # Prepare features in the correct order
-            feature_vector = [features.get(name, 0) for name in self.feature_names]
-            
-            # Prepare payload for SageMaker
-            payload = {
-                'instances': [feature_vector]
-            }
-            
-            # Call SageMaker endpoint
-            response = sagemaker_runtime.invoke_endpoint(
-                EndpointName=SAGEMAKER_ENDPOINT,
-                ContentType='application/json',
-                Body=json.dumps(payload)
-            )
+            # Concurrent calls are coalesced into one multi-instance invocation
+            if self.batcher is not None:
+                return np.asarray(self.batcher.submit(feature_vector), dtype=np.float64)
             
-            # Parse response
-            result = json.loads(response['Body'].read().decode())
-            predicted_price = result['predictions'][0]
-            
-            return predicted_price
+            return np.asarray(self.invoke_endpoint([feature_vector])[0], dtype=np.float64)
             
+        except CircuitOpenError:
+            return self.fallback_price(feature_vector, features, 'circuit_open')
+        except FutureTimeoutError as e:
+            # The batch never came back, so the breaker has not seen a failure yet
+            logger.error(f"Error calling SageMaker endpoint: {e}")
+            self.sagemaker_breaker.record_failure()
+            return self.fallback_price(feature_vector, features, 'timeout')
         except Exception as e:
             logger.error(f"Error calling SageMaker endpoint: {e}")
-            # Fallback to simple estimation
-            return features.get('base_estimated_value', 15) * 1.2
+            return self.fallback_price(feature_vector, features, 'error')
     
-    def calculate_confidence_and_range(self, predicted_price, features):
-        """Calculate confidence score and price range"""
+    def fallback_price(self, feature_vector, features, reason):
+        """Predict without SageMaker: embedded model if loaded, else a simple estimate"""
+        return self.fallback_prices([feature_vector], [features], reason)[0]
+    
+    def fallback_prices(self, feature_vectors, features_list, reason):
+        """Vectorized fallback for a batch of feature vectors"""
+        _served_fallback.set(True)
+        artifacts = self.artifact_holder.current
+        if artifacts.embedded_model is not None:
+            try:
+                import xgboost as xgb
+                with self.embedded_model_under_load(artifacts) as (model, backend):
+                    predictions = model.predict(xgb.DMatrix(np.array(feature_vectors, dtype=np.float32)))
+                _served_backend.set(backend)
+                FALLBACKS.labels(backend=backend, reason=reason).inc(len(feature_vectors))
+                return price_intervals(predictions, artifacts.quantile_alphas)
+            except Exception as e:
+                logger.error(f"Embedded model prediction failed: {e}")
+        
+        # Fallback to simple estimation
+        _served_backend.set('estimate')
+        FALLBACKS.labels(backend='estimate', reason=reason).inc(len(feature_vectors))
+        return price_intervals(
+            [features.get('base_estimated_value', 15) * 1.2 for features in features_list], None
+        )
+    
+    @contextmanager
+    def embedded_model_under_load(self, artifacts):
+        """Yield (model, backend): the fast model while FAST_MODEL_MIN_IN_FLIGHT predictions are already running"""
+        with self._embedded_lock:
+            busy = 0 < FAST_MODEL_MIN_IN_FLIGHT <= self._embedded_in_flight
+            self._embedded_in_flight += 1
         try:
-            # Simple confidence calculation based on volatility and data availability
-            volatility = features.get('price_volatility_30d', 2.0)
-            base_confidence = 0.8
-            
-            # Reduce confidence for high volatility
-            volatility_factor = max(0.3, 1 - (volatility / 10))
-            confidence = base_confidence * volatility_factor
-            
-            # Calculate price range (±20% for typical confidence)
-            range_percentage = 0.2 / confidence  # Lower confidence = wider range
-            price_min = predicted_price * (1 - range_percentage)
-            price_max = predicted_price * (1 + range_percentage)
-            
-            return confidence, {'min': price_min, 'max': price_max}
+            if busy and artifacts.fast_model is not None:
+                yield artifacts.fast_model, 'embedded_fast'
+            else:
+                yield artifacts.embedded_model, 'embedded'
+        finally:
+            with self._embedded_lock:
+                self._embedded_in_flight -= 1
+    
+    @traced('confidence')
+    def calculate_confidence_and_range(self, prediction, features):
+        """Calculate confidence score and price range for one (price, lower, upper) row.
+        
+        Uses the model's quantile interval when it has one. Otherwise confidence
+        is 0.8 reduced for high volatility, and the range is ±20% widened as
+        confidence drops.
+        """
+        try:
+            volatility = np.array([features.get('price_volatility_30d', 2.0)], dtype=np.float64)
+            confidence, price_min, price_max = self.calculate_confidence_and_ranges(
+                np.asarray(prediction, dtype=np.float64).reshape(1, 3), volatility
+            )
+            return float(confidence[0]), {'min': float(price_min[0]), 'max': float(price_max[0])}
             
         except Exception as e:
             logger.error(f"Error calculating confidence: {e}")
-            return 0.7, {'min': predicted_price * 0.8, 'max': predicted_price * 1.2}
+            return 0.7, {'min': prediction[0] * 0.8, 'max': prediction[0] * 1.2}
+
+def active_feature_store():
+    """The feature store, if it was built with the serving model's category mappings"""
+    if feature_store is None or feature_store.model_version != predictor_api.model_version:
+        return None
+    return feature_store
+
+def collect_model_status():
+    """Query SageMaker and the loaded artifacts; runs on the status monitor thread"""
+    try:
+        endpoint_response = get_sagemaker_client().describe_endpoint(EndpointName=SAGEMAKER_ENDPOINT)
+        endpoint_status = endpoint_response['EndpointStatus']
+    except Exception as e:
+        logger.warning(f"describe_endpoint failed: {e}")
+        endpoint_status = 'NOT_FOUND'
+    
+    artifacts = predictor_api.artifact_holder.current
+    return {
+        'model_version': artifacts.model_version,
+        'endpoint_name': SAGEMAKER_ENDPOINT,
+        'endpoint_status': endpoint_status,
+        'features_count': len(artifacts.feature_names),
+        'model_loaded_at': artifacts.loaded_at,
+        'last_reload_check': model_reloader.last_checked if model_reloader else None,
+        'last_reload_error': model_reloader.last_error if model_reloader else None
+    }
+
+def create_supabase_client():
+    """Supabase client for the API (replaced by a fake in the local load-test harness)"""
+    from supabase import create_client
+    
+    return create_client(
+        os.getenv('SUPABASE_URL'),
+        os.getenv('SUPABASE_ANON_KEY')
+    )
+
+def init_services(background=True):
+    """Create clients, load artifacts and start background refreshers"""
+    global sagemaker_runtime, supabase, predictor_api, prediction_cache, model_reloader
+    global base_feature_cache, feature_store, status_monitor, explainer, drift_monitor
+    
+    started = time.perf_counter()
+    sagemaker_runtime = get_sagemaker_runtime_client()
+    supabase = create_supabase_client()
+    
+    predictor_api = FunkoPricePredictionAPI()
+    prediction_cache = create_prediction_cache()
+    base_feature_cache = InMemoryCacheBackend(max_entries=10000)
+    feature_store = create_feature_store()
+    explainer = create_explainer()
+    drift_monitor = create_drift_monitor()
+    
+    if background:
+        if predictor_api.artifact_source is not None:
+            model_reloader = ModelReloader(predictor_api.artifact_source, predictor_api.artifact_holder)
+            model_reloader.start()
+        status_monitor = StatusMonitor(collect_model_status)
+        status_monitor.start()
+        if drift_monitor is not None:
+            drift_monitor.start()
+    
+    logger.info(f"Services initialized in {time.perf_counter() - started:.2f}s")
+
+def shutdown_services():
+    """Stop background threads and drain the micro-batcher"""
+    for worker in (status_monitor, model_reloader, drift_monitor):
+        if worker is not None:
+            worker.stop()
+    if predictor_api is not None and predictor_api.batcher is not None:
+        predictor_api.batcher.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Blocking client and artifact setup runs off the event loop
+    await run_in_threadpool(init_services)
+    yield
+    await run_in_threadpool(shutdown_services)
+
+app = FastAPI(
+    title="Funko Price Prediction API",
+    description="AI-powered price prediction for Funko Pop collectibles",
+    version="1.0.0",
+    lifespan=lifespan
+)
 
-# Initialize API instance
-predictor_api = FunkoPricePredictionAPI()
+def status_snapshot():
+    """Latest status snapshot; empty (status unknown) when no monitor runs, e.g. init_services(background=False)"""
+    return status_monitor.snapshot if status_monitor is not None else StatusSnapshot({})
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    snapshot = status_snapshot()
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "model_version": snapshot.values.get('model_version'),
+        "endpoint_status": snapshot.values.get('endpoint_status', 'UNKNOWN'),
+        "status_age_seconds": snapshot.age_seconds()
+    }
+
+@traced('featurize')
+def featurize_request(funko_pop_id, condition, marketplace, future_days):
+    """Return (funko_data, features) for a request, from the feature store when possible"""
+    store = active_feature_store()
+    materialized = store.lookup(funko_pop_id) if store is not None else None
+    
+    if materialized is not None:
+        # Static and rolling features come precomputed; only fill in the request columns
+        funko_data, static_features = materialized
+        features = predictor_api.apply_request_features(
+            static_features, funko_data['release_date'], condition, marketplace, future_days
+        )
+        return funko_data, features
+    
+    # Get Funko data and engineer its features on the spot
+    funko_data = predictor_api.get_funko_data(funko_pop_id)
+    static_features = predictor_api.engineer_static_features(funko_data)
+    features = predictor_api.apply_request_features(
+        static_features, funko_data['release_date'], condition, marketplace, future_days
+    )
+    return funko_data, features
+
+@traced('explain')
+def explain_predictions(funko_pop_ids, features_list, condition, marketplace, future_days):
+    """Top drivers for each prediction, explained in one batch and cached (None when unavailable)"""
+    # Contributions of the manifest booster don't add up to a fast-model or estimated price
+    if explainer is None or _served_backend.get() not in EXPLAINABLE_BACKENDS:
+        return [None] * len(funko_pop_ids)
+    
+    artifacts = predictor_api.artifact_holder.current
+    feature_matrix = np.array(
+        [[features.get(name, 0) for name in artifacts.feature_names] for features in features_list],
+        dtype=np.float32
+    )
+    keys = [
+        explainer.make_key(funko_pop_id, artifacts.model_version, condition, marketplace, future_days)
+        for funko_pop_id in funko_pop_ids
+    ]
+    return explainer.explain(keys, feature_matrix, artifacts)
+
+@traced('drift')
+def record_drift(feature_rows, predictions):
+    """Feed scored rows (feature dicts or a feature matrix) and their predictions to the drift monitor"""
+    if drift_monitor is None:
+        return
+    
+    artifacts = predictor_api.artifact_holder.current
+    try:
+        if len(feature_rows) and isinstance(feature_rows[0], dict):
+            feature_rows = [[features.get(name, 0) for name in artifacts.feature_names] for features in feature_rows]
+        drift_monitor.record(feature_rows, np.asarray(predictions)[:, 0], artifacts)
+    except Exception as e:
+        # Monitoring must never fail a prediction
+        logger.error(f"Failed to record drift sample: {e}")
+
+@traced('serialize')
+def build_prediction_response(funko_pop_id, funko_data, features, prediction, condition, marketplace,
+                              explanation=None):
+    """Build a PricePredictionResponse-shaped dict without a Pydantic round trip"""
+    # Calculate confidence and range
+    confidence, price_range = predictor_api.calculate_confidence_and_range(
+        prediction, features
+    )
+    
+    factors = {
+        'is_chase': int(features['is_chase']),
+        'is_exclusive': int(features['is_exclusive']),
+        'is_vaulted': int(features['is_vaulted']),
+        'condition': condition,
+        'marketplace': marketplace,
+        'days_since_release': int(features['days_since_release'])
+    }
+    if explanation is not None:
+        # What actually moved the price: baseline + contributions = model output
+        factors['baseline_price'] = explanation['baseline']
+        factors['top_drivers'] = explanation['drivers']
+    
+    return {
+        'funko_pop_id': funko_pop_id,
+        'funko_name': funko_data['name'],
+        'series': funko_data['series'],
+        'predicted_price': round(float(prediction[0]), 2),
+        'confidence_score': round(float(confidence), 3),
+        'price_range': {
+            'min': round(float(price_range['min']), 2),
+            'max': round(float(price_range['max']), 2)
+        },
+        'factors': factors,
+        'prediction_date': datetime.now().isoformat(),
+        'model_version': predictor_api.model_version
+    }
+
+def compute_prediction(request: PricePredictionRequest, artifacts=None):
+    """Run the full prediction for a request and return the serialized response"""
+    _served_fallback.set(False)
+    _served_backend.set('sagemaker')
+    with predictor_api.pinned(artifacts):
+        return _compute_prediction(request)
+
+def _compute_prediction(request: PricePredictionRequest):
+    funko_data, features = featurize_request(
+        request.funko_pop_id, request.condition, request.marketplace, request.future_days
+    )
+    
+    # Make prediction
+    prediction = predictor_api.predict_price(features)
+    record_drift([features], [prediction])
+    explanation = explain_predictions(
+        [request.funko_pop_id], [features], request.condition, request.marketplace, request.future_days
+    )[0]
+    
+    response = build_prediction_response(
+        request.funko_pop_id, funko_data, features, prediction,
+        request.condition, request.marketplace, explanation
+    )
+    
+    logger.info(f"Prediction completed: ${prediction[0]:.2f} (confidence: {response['confidence_score']:.3f})")
+    return response
+
+def stream_batch_predictions(request: BatchPredictionRequest):
+    """Yield NDJSON lines, scoring each sub-batch with one model call"""
+    funko_ids = request.funko_pop_ids
+    scored = 0
+    # Each chunk may run in a different worker thread, so pin the bundle explicitly
+    artifacts = predictor_api.artifact_holder.current
+    
+    for start in range(0, len(funko_ids), STREAM_SUB_BATCH_SIZE):
+        lines = []
+        rows = []
+        
+        with predictor_api.pinned(artifacts), request_timer('predict_batch_stream'):
+            for funko_id in funko_ids[start:start + STREAM_SUB_BATCH_SIZE]:
+                try:
+                    funko_data, features = featurize_request(
+                        funko_id, request.condition, request.marketplace, request.future_days
+                    )
+                    rows.append((funko_id, funko_data, features))
+                except Exception as e:
+                    logger.error(f"Failed prediction for {funko_id}: {e}")
+                    lines.append(json.dumps({'funko_pop_id': funko_id, 'error': str(e)}))
+            
+            feature_names = predictor_api.feature_names
+            feature_matrix = np.array(
+                [[features.get(name, 0) for name in feature_names] for _, _, features in rows], dtype=np.float32
+            ).reshape(len(rows), len(feature_names))
+            _served_backend.set('sagemaker')
+            predictions = predictor_api.predict_matrix(feature_matrix)
+            record_drift(feature_matrix, predictions)
+            explanations = explain_predictions(
+                [funko_id for funko_id, _, _ in rows], [features for _, _, features in rows],
+                request.condition, request.marketplace, request.future_days
+            )
+            
+            with span('serialize'):
+                for (funko_id, funko_data, features), prediction, explanation in zip(
+                    rows, predictions, explanations
+                ):
+                    lines.append(json.dumps(build_prediction_response(
+                        funko_id, funko_data, features, prediction,
+                        request.condition, request.marketplace, explanation
+                    )))
+        
+        scored += len(rows)
+        yield '\n'.join(lines) + '\n'
+    
+    logger.info(f"Streamed batch prediction completed: {scored}/{len(funko_ids)} successful")
+
+@instrumented('predict')
+def serve_prediction(request: PricePredictionRequest):
+    """Serve a single prediction from the cache, computing it on a miss"""
+    if prediction_cache is None:
+        return compute_prediction(request)
+    
+    # The key and the computation (including a later stale refresh) use the same model bundle
+    artifacts = predictor_api.artifact_holder.current
+    cache_key = prediction_cache.make_key(
+        request.funko_pop_id, request.condition, request.marketplace,
+        request.future_days, artifacts.model_version
+    )
+    return prediction_cache.get_or_compute(
+        cache_key, lambda: compute_prediction(request, artifacts), degraded=_served_fallback.get
+    )
 
 @app.post("/predict", response_model=PricePredictionResponse)
 async def predict_price(request: PricePredictionRequest):
@@ -266,47 +784,8 @@ async def predict_price(request: PricePredictionRequest):
     try:
         logger.info(f"Predicting price for Funko ID: {request.funko_pop_id}")
         
-        # Get Funko data
-        funko_data = predictor_api.get_funko_data(request.funko_pop_id)
-        
-        # Engineer features
-        features = predictor_api.engineer_prediction_features(
-            funko_data, request.condition, request.marketplace, request.future_days
-        )
-        
-        # Make prediction
-        predicted_price = predictor_api.predict_price(features)
-        
-        # Calculate confidence and range
-        confidence, price_range = predictor_api.calculate_confidence_and_range(
-            predicted_price, features
-        )
-        
-        # Prepare response
-        response = PricePredictionResponse(
-            funko_pop_id=request.funko_pop_id,
-            funko_name=funko_data['name'],
-            series=funko_data['series'],
-            predicted_price=round(predicted_price, 2),
-            confidence_score=round(confidence, 3),
-            price_range={
-                'min': round(price_range['min'], 2),
-                'max': round(price_range['max'], 2)
-            },
-            factors={
-                'is_chase': features['is_chase'],
-                'is_exclusive': features['is_exclusive'],
-                'is_vaulted': features['is_vaulted'],
-                'condition': request.condition,
-                'marketplace': request.marketplace,
-                'days_since_release': features['days_since_release']
-            },
-            prediction_date=datetime.now().isoformat(),
-            model_version="1.0.0"
-        )
-        
-        logger.info(f"Prediction completed: ${predicted_price:.2f} (confidence: {confidence:.3f})")
-        return response
+        # Blocking work runs in the threadpool so concurrent requests can be micro-batched
+        return await run_in_threadpool(serve_prediction, request)
         
     except Exception as e:
         logger.error(f"Prediction failed: {e}")
@@ -340,70 +819,280 @@ async def predict_batch(request: BatchPredictionRequest):
         logger.error(f"Batch prediction failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/predict/batch/stream")
+async def predict_batch_stream(request: BatchPredictionRequest):
+    """Stream batch predictions as NDJSON, one line per Funko Pop"""
+    logger.info(f"Streaming batch prediction for {len(request.funko_pop_ids)} Funkos")
+    
+    # Sync generators are iterated in the threadpool, so scoring never blocks the event loop
+    return StreamingResponse(stream_batch_predictions(request), media_type='application/x-ndjson')
+
+def get_base_features(funko_pop_id):
+    """Return (funko_data, STORE_COLUMNS row) for a Funko Pop, cached between requests"""
+    cache_key = f"{funko_pop_id}:{PredictionCache.date_bucket()}"
+    cached = base_feature_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    store = active_feature_store()
+    materialized = store.lookup(funko_pop_id) if store is not None else None
+    if materialized is not None:
+        funko_data, static_features = materialized
+        release_ordinal = funko_features.to_epoch_days([funko_data['release_date']])[0] + EPOCH_ORDINAL
+        static_row = np.array(
+            [release_ordinal] + [static_features[name] for name in STATIC_FEATURES], dtype=np.float32
+        )
+    else:
+        funko_data = predictor_api.get_funko_data(funko_pop_id)
+        static_row = predictor_api.engineer_static_matrix([funko_data])[0]
+        if np.isnan(static_row).any():
+            raise ValueError(f"Incomplete Funko Pop data for {funko_pop_id}")
+    base_feature_cache.set(cache_key, (funko_data, static_row), CURVE_BASE_CACHE_TTL)
+    return funko_data, static_row
+
+@instrumented('predict_curve')
+def predict_curve(request: PriceCurveRequest):
+    """Score every horizon from one featurization, varying only the date columns"""
+    with predictor_api.pinned():
+        return _predict_curve(request)
+
+def _predict_curve(request: PriceCurveRequest):
+    horizons = request.horizons or list(range(request.start_days, request.end_days + 1, request.step_days))
+    funko_data, static_row = get_base_features(request.funko_pop_id)
+    
+    feature_matrix = predictor_api.build_feature_matrix(
+        np.repeat(static_row[np.newaxis, :], len(horizons), axis=0),
+        [request.condition] * len(horizons), request.marketplace, horizons
+    )
+    predictions = predictor_api.predict_matrix(feature_matrix)
+    record_drift(feature_matrix, predictions)
+    volatility = feature_matrix[:, predictor_api.feature_names.index('price_volatility_30d')]
+    confidence, price_min, price_max = predictor_api.calculate_confidence_and_ranges(predictions, volatility)
+    prices = predictions[:, 0]
+    
+    today = datetime.now().date()
+    curve = [
+        {
+            'future_days': int(days),
+            'date': (today + timedelta(days=int(days))).isoformat(),
+            'predicted_price': round(float(price), 2),
+            'confidence_score': round(float(conf), 3),
+            'price_range': {'min': round(float(low), 2), 'max': round(float(high), 2)}
+        }
+        for days, price, conf, low, high in zip(horizons, prices, confidence, price_min, price_max)
+    ]
+    
+    return {
+        'funko_pop_id': request.funko_pop_id,
+        'funko_name': funko_data['name'],
+        'series': funko_data['series'],
+        'condition': request.condition,
+        'marketplace': request.marketplace,
+        'curve': curve,
+        'model_version': predictor_api.model_version
+    }
+
+@app.post("/predict/curve", response_model=PriceCurveResponse)
+async def predict_curve_endpoint(request: PriceCurveRequest):
+    """Predict a multi-horizon price curve with a single batched model call"""
+    horizon_count = len(request.horizons) if request.horizons else \
+        max(0, (request.end_days - request.start_days) // request.step_days + 1)
+    if horizon_count == 0 or horizon_count > CURVE_MAX_HORIZONS:
+        raise HTTPException(status_code=422, detail=f"Request between 1 and {CURVE_MAX_HORIZONS} horizons")
+    
+    try:
+        logger.info(f"Predicting {horizon_count}-point price curve for Funko ID: {request.funko_pop_id}")
+        return await run_in_threadpool(predict_curve, request)
+        
+    except Exception as e:
+        logger.error(f"Curve prediction failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@instrumented('valuate_collection')
+def valuate_collection(request: CollectionValuationRequest):
+    """Featurize every item as one matrix and score the whole collection in one call"""
+    with predictor_api.pinned():
+        return _valuate_collection(request)
+
+def _valuate_collection(request: CollectionValuationRequest):
+    unique_ids = list(dict.fromkeys(item.funko_pop_id for item in request.items))
+    
+    # Static block for each unique Funko Pop, from the feature store when possible
+    store = active_feature_store()
+    if store is not None:
+        static_matrix, found, entries = store.lookup_many(unique_ids)
+    else:
+        static_matrix, found, entries = np.empty((0, len(STORE_COLUMNS))), np.zeros(len(unique_ids), dtype=bool), []
+    
+    row_of = {}
+    metadata = {}
+    for funko_id, is_found, entry in zip(unique_ids, found, entries):
+        if is_found:
+            row_of[funko_id] = len(row_of)
+            metadata[funko_id] = entry
+    
+    missing = [funko_id for funko_id, is_found in zip(unique_ids, found) if not is_found]
+    missing_rows = predictor_api.get_funko_data_many(missing) if missing else []
+    if missing_rows:
+        # One vectorized featurization for everything not in the store
+        extra_matrix = predictor_api.engineer_static_matrix(missing_rows)
+        complete = ~np.isnan(extra_matrix).any(axis=1)
+        for funko_data, is_complete in zip(missing_rows, complete):
+            if not is_complete:
+                logger.error(f"Failed to featurize {funko_data.get('id')}: incomplete Funko Pop data")
+                continue
+            row_of[str(funko_data['id'])] = len(row_of)
+            metadata[str(funko_data['id'])] = funko_data
+        static_matrix = np.vstack([static_matrix, extra_matrix[complete]])
+    
+    # One feature row per collection item
+    items = [item for item in request.items if item.funko_pop_id in row_of]
+    item_rows = np.array([row_of[item.funko_pop_id] for item in items], dtype=np.int64)
+    feature_matrix = predictor_api.build_feature_matrix(
+        static_matrix[item_rows], [item.condition for item in items],
+        request.marketplace, request.future_days
+    )
+    
+    predictions = predictor_api.predict_matrix(feature_matrix)
+    record_drift(feature_matrix, predictions)
+    volatility = feature_matrix[:, predictor_api.feature_names.index('price_volatility_30d')]
+    confidence, price_min, price_max = predictor_api.calculate_confidence_and_ranges(predictions, volatility)
+    prices = predictions[:, 0]
+    quantities = np.array([item.quantity for item in items], dtype=np.float64)
+    
+    item_results = [
+        {
+            'funko_pop_id': item.funko_pop_id,
+            'funko_name': metadata[item.funko_pop_id]['name'],
+            'condition': item.condition,
+            'quantity': item.quantity,
+            'unit_price': round(float(price), 2),
+            'total_price': round(float(price * item.quantity), 2),
+            'confidence_score': round(float(conf), 3),
+            'price_range': {'min': round(float(low), 2), 'max': round(float(high), 2)}
+        }
+        for item, price, conf, low, high in zip(items, prices, confidence, price_min, price_max)
+    ]
+    
+    return {
+        'items': item_results,
+        'total_value': round(float(prices @ quantities), 2),
+        'total_range': {
+            'min': round(float(price_min @ quantities), 2),
+            'max': round(float(price_max @ quantities), 2)
+        },
+        'item_count': len(items),
+        'total_quantity': int(quantities.sum()),
+        'missing_funko_pop_ids': [
+            funko_id for funko_id in unique_ids if funko_id not in row_of
+        ],
+        'valuation_date': datetime.now().isoformat(),
+        'model_version': predictor_api.model_version
+    }
+
+@app.post("/valuate/collection", response_model=CollectionValuationResponse)
+async def valuate_collection_endpoint(request: CollectionValuationRequest):
+    """Value a whole collection with per-item predictions and aggregate totals"""
+    if len(request.items) > COLLECTION_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Collections are limited to {COLLECTION_MAX_ITEMS} items")
+    
+    try:
+        logger.info(f"Valuating collection of {len(request.items)} items")
+        return await run_in_threadpool(valuate_collection, request)
+        
+    except Exception as e:
+        logger.error(f"Collection valuation failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/history/{funko_pop_id}", response_model=PriceHistoryResponse)
 async def get_price_history(funko_pop_id: str, days: int = 90):
     """Get price history and trend analysis"""
     try:
         logger.info(f"Getting price history for Funko ID: {funko_pop_id}")
         
-        # Get historical prices
-        price_history = predictor_api.get_price_history(funko_pop_id, days)
-        
-        if not price_history:
-            raise HTTPException(status_code=404, detail="No price history found")
-        
-        # Calculate trend analysis
-        prices = [p['price'] for p in price_history]
-        trend_slope = np.polyfit(range(len(prices)), prices, 1)[0] if len(prices) > 1 else 0
-        avg_price = np.mean(prices)
-        volatility = np.std(prices) / avg_price if avg_price > 0 else 0
-        
-        trend_analysis = {
-            'trend_direction': 'increasing' if trend_slope > 0.1 else 'decreasing' if trend_slope < -0.1 else 'stable',
-            'trend_strength': abs(trend_slope),
-            'average_price': round(avg_price, 2),
-            'price_change_30d': round(prices[-1] - prices[0], 2) if len(prices) > 1 else 0,
-            'highest_price': max(prices),
-            'lowest_price': min(prices)
-        }
-        
-        response = PriceHistoryResponse(
-            funko_pop_id=funko_pop_id,
-            historical_prices=price_history,
-            trend_analysis=trend_analysis,
-            volatility_score=round(volatility, 3)
-        )
-        
-        return response
+        # The history read and LTTB downsampling block, so they run in the threadpool
+        return await run_in_threadpool(build_price_history_response, funko_pop_id, days)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Price history fetch failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@instrumented('history')
+def build_price_history_response(funko_pop_id, days):
+    """Aggregated history plus trend analysis for one Funko Pop"""
+    # Get aggregated, downsampled prices
+    price_history = predictor_api.get_price_history(funko_pop_id, days, HISTORY_MAX_POINTS)
+    
+    if not price_history:
+        raise HTTPException(status_code=404, detail="No price history found")
+    
+    # Trend and volatility come from the cached running sums, not the points
+    summary = predictor_api.price_history.get_summary(funko_pop_id, days)
+    trend_slope = summary['slope']
+    avg_price = summary['mean']
+    volatility = summary['std'] / avg_price if avg_price > 0 else 0
+    
+    trend_analysis = {
+        'trend_direction': 'increasing' if trend_slope > 0.1 else 'decreasing' if trend_slope < -0.1 else 'stable',
+        'trend_strength': abs(trend_slope),
+        'average_price': round(avg_price, 2),
+        'price_change_30d': round(summary['last'] - summary['first'], 2) if summary['buckets'] > 1 else 0,
+        'highest_price': summary['highest'],
+        'lowest_price': summary['lowest'],
+        'sale_count': summary['sale_count'],
+        'bucket': predictor_api.price_history.bucket_for(days)
+    }
+    
+    response = PriceHistoryResponse(
+        funko_pop_id=funko_pop_id,
+        historical_prices=price_history,
+        trend_analysis=trend_analysis,
+        volatility_score=round(volatility, 3)
+    )
+    
+    return response
+
 @app.get("/model/status")
 async def get_model_status():
-    """Get model and endpoint status"""
-    try:
-        # Check SageMaker endpoint status
-        sagemaker_client = boto3.client('sagemaker', region_name=AWS_REGION)
-        
-        try:
-            endpoint_response = sagemaker_client.describe_endpoint(EndpointName=SAGEMAKER_ENDPOINT)
-            endpoint_status = endpoint_response['EndpointStatus']
-        except:
-            endpoint_status = 'NOT_FOUND'
-        
-        return {
-            'model_version': '1.0.0',
-            'endpoint_name': SAGEMAKER_ENDPOINT,
-            'endpoint_status': endpoint_status,
-            'features_count': len(predictor_api.feature_names),
-            'last_updated': datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        logger.error(f"Status check failed: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    """Get model and endpoint status from the background-refreshed snapshot"""
+    snapshot = status_snapshot()
+    return {
+        'endpoint_status': 'UNKNOWN',
+        **snapshot.values,
+        'last_updated': snapshot.last_updated,
+        'age_seconds': snapshot.age_seconds(),
+        'refresh_interval_seconds': status_monitor.interval if status_monitor is not None else None,
+        'last_refresh_error': status_monitor.last_error if status_monitor is not None else None
+    }
+
+@app.get("/model/drift")
+async def get_model_drift():
+    """Latest drift check: PSI/KS per feature and for predictions, and whether to retrain"""
+    if drift_monitor is None:
+        return {'enabled': False}
+    
+    return {
+        'enabled': True,
+        'last_report': drift_monitor.last_report,
+        'check_interval_seconds': drift_monitor.interval,
+        'last_check_error': drift_monitor.last_error
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: stage latencies, cache, batching, circuit breaker and fallbacks"""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Get prediction cache hit ratio and latency saved"""
+    if prediction_cache is None:
+        return {'enabled': False}
+    
+    return {'enabled': True, **prediction_cache.stats()}
 
 if __name__ == "__main__":
     import uvicorn
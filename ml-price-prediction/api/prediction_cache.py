@@ -0,0 +1,257 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from metrics import CACHE_REQUESTS, CACHE_LATENCY_SAVED, CACHE_EVICTIONS
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+CACHE_BACKEND = os.getenv('PREDICTION_CACHE_BACKEND', 'memory')  # memory, redis, none
+CACHE_TTL_SECONDS = int(os.getenv('PREDICTION_CACHE_TTL', '3600'))
+CACHE_STALE_TTL_SECONDS = int(os.getenv('PREDICTION_CACHE_STALE_TTL', '0'))
+# Fallback (degraded) predictions: 0 = never cache them
+CACHE_DEGRADED_TTL_SECONDS = int(os.getenv('PREDICTION_CACHE_DEGRADED_TTL', '0'))
+CACHE_MAX_ENTRIES = int(os.getenv('PREDICTION_CACHE_MAX_ENTRIES', '50000'))
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+
+class InMemoryCacheBackend:
+    """LRU cache held in process memory, with per-entry expiry"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                CACHE_EVICTIONS.inc()
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Cache stored in Redis (or any client exposing get/set(ex=)/delete)"""
+
+    def __init__(self, client, prefix='funko-prediction:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode()
+        return value
+
+    def set(self, key, value, ttl):
+        # Redis eviction is governed by its own maxmemory-policy
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+class PredictionCache:
+    """Caches prediction responses keyed on the normalized request, model version and date.
+
+    Entries are fresh for ``ttl_seconds``. When ``stale_ttl_seconds`` is set, an expired
+    entry is still served for that long while a background refresh recomputes it.
+    Values the caller reports as degraded (served by a fallback) are kept for
+    ``degraded_ttl_seconds`` only, with no stale window, or not at all when it is 0.
+    """
+
+    def __init__(self, backend, ttl_seconds=CACHE_TTL_SECONDS,
+                 stale_ttl_seconds=CACHE_STALE_TTL_SECONDS, refresh_workers=2,
+                 degraded_ttl_seconds=CACHE_DEGRADED_TTL_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.stale_ttl_seconds = stale_ttl_seconds
+        self.degraded_ttl_seconds = degraded_ttl_seconds
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.degraded = 0
+        self.latency_saved_seconds = 0.0
+        # Counters are bumped from threadpool workers and refresh threads alike
+        self._stats_lock = threading.Lock()
+
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._refresh_executor = ThreadPoolExecutor(
+            max_workers=refresh_workers, thread_name_prefix='prediction-cache-refresh'
+        ) if stale_ttl_seconds > 0 else None
+
+    @staticmethod
+    def date_bucket():
+        """Current UTC day; predictions are recomputed at least daily"""
+        return datetime.now(timezone.utc).date().isoformat()
+
+    def make_key(self, funko_pop_id, condition, marketplace, future_days, model_version):
+        """Build a cache key from the normalized request fields"""
+        normalized = [
+            str(funko_pop_id).strip(),
+            (condition or '').strip().lower(),
+            (marketplace or '').strip().lower(),
+            int(future_days),
+            model_version,
+            self.date_bucket()
+        ]
+        digest = hashlib.sha1(json.dumps(normalized).encode()).hexdigest()
+        return f"predict:{digest}"
+
+    def get_or_compute(self, key, compute, degraded=None):
+        """Return the cached value for key, calling compute() on a miss.
+
+        ``degraded``, if given, is called right after compute() in the same
+        thread and returns True when the value came from a fallback.
+        """
+        entry = self._read(key)
+
+        if entry is not None:
+            age = time.time() - entry['created_at']
+            ttl = entry.get('ttl', self.ttl_seconds)
+
+            if age < ttl:
+                self._record_hit('hit', entry)
+                return entry['value']
+
+            if age < ttl + entry.get('stale_ttl', self.stale_ttl_seconds):
+                self._record_hit('stale', entry)
+                self._schedule_refresh(key, compute, degraded)
+                return entry['value']
+
+        with self._stats_lock:
+            self.misses += 1
+        CACHE_REQUESTS.labels(result='miss').inc()
+        return self._compute_and_store(key, compute, degraded)
+
+    def invalidate(self, key):
+        self.backend.delete(key)
+
+    def stats(self):
+        """Hit ratio and latency saved since startup"""
+        with self._stats_lock:
+            hits, stale_hits, misses = self.hits, self.stale_hits, self.misses
+            latency_saved_seconds, degraded = self.latency_saved_seconds, self.degraded
+        lookups = hits + stale_hits + misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': hits,
+            'stale_hits': stale_hits,
+            'misses': misses,
+            'hit_ratio': round((hits + stale_hits) / lookups, 4) if lookups else 0.0,
+            'latency_saved_seconds': round(latency_saved_seconds, 3),
+            'degraded': degraded,
+            'ttl_seconds': self.ttl_seconds,
+            'stale_ttl_seconds': self.stale_ttl_seconds,
+            'degraded_ttl_seconds': self.degraded_ttl_seconds
+        }
+
+    def _read(self, key):
+        try:
+            raw = self.backend.get(key)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            # A broken cache must never fail a prediction
+            logger.error(f"Prediction cache read failed: {e}")
+            return None
+
+    def _compute_and_store(self, key, compute, degraded=None):
+        started = time.perf_counter()
+        value = compute()
+        elapsed = time.perf_counter() - started
+
+        entry = {'value': value, 'created_at': time.time(), 'compute_seconds': elapsed}
+        ttl, stale_ttl = self.ttl_seconds, self.stale_ttl_seconds
+        if degraded is not None and degraded():
+            # Don't keep serving fallback prices once the model endpoint recovers
+            with self._stats_lock:
+                self.degraded += 1
+            if self.degraded_ttl_seconds <= 0:
+                return value
+            ttl, stale_ttl = self.degraded_ttl_seconds, 0
+            entry.update(ttl=ttl, stale_ttl=stale_ttl)
+        try:
+            self.backend.set(key, json.dumps(entry), ttl + stale_ttl)
+        except Exception as e:
+            logger.error(f"Prediction cache write failed: {e}")
+
+        return value
+
+    def _record_hit(self, result, entry):
+        saved = entry.get('compute_seconds', 0.0)
+        with self._stats_lock:
+            if result == 'hit':
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+            self.latency_saved_seconds += saved
+        CACHE_REQUESTS.labels(result=result).inc()
+        CACHE_LATENCY_SAVED.inc(saved)
+
+    def _schedule_refresh(self, key, compute, degraded=None):
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._compute_and_store(key, compute, degraded)
+            except Exception as e:
+                logger.error(f"Background cache refresh failed for {key}: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        self._refresh_executor.submit(refresh)
+
+
+def create_prediction_cache(backend_name=CACHE_BACKEND):
+    """Build the prediction cache configured by PREDICTION_CACHE_BACKEND"""
+    if backend_name == 'none':
+        return None
+
+    if backend_name == 'redis':
+        import redis
+        backend = RedisCacheBackend(redis.Redis.from_url(REDIS_URL))
+    else:
+        backend = InMemoryCacheBackend()
+
+    logger.info(f"Prediction cache enabled with {type(backend).__name__}")
+    return PredictionCache(backend)
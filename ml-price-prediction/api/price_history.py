@@ -0,0 +1,284 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+HISTORY_CACHE_TTL_SECONDS = int(os.getenv('HISTORY_CACHE_TTL', '300'))
+HISTORY_CACHE_MAX_SERIES = int(os.getenv('HISTORY_CACHE_MAX_SERIES', '10000'))
+HISTORY_MAX_POINTS = int(os.getenv('HISTORY_MAX_POINTS', '200'))
+HISTORY_WEEKLY_AFTER_DAYS = int(os.getenv('HISTORY_WEEKLY_AFTER_DAYS', '180'))
+HISTORY_MIN_PRELOAD_DAYS = 365
+
+BUCKET_SECONDS = {'day': 86400, 'week': 7 * 86400}
+# Columns returned by the price_history_buckets RPC (see sql/price_history_buckets.sql)
+SUM_COLUMNS = ['sale_count', 'sum_price', 'sum_price_sq']
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling; returns the indices to keep"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = 0
+
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket is the third triangle vertex
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        ax, ay = x[selected], y[selected]
+        areas = np.abs((ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay))
+        selected = start + int(np.argmax(areas))
+        kept[i + 1] = selected
+
+    return kept
+
+
+class PriceSeries:
+    """Bucketed history of one Funko Pop with prefix sums for O(1) range statistics"""
+
+    def __init__(self, bucket, buckets, covered_from):
+        self.bucket = bucket
+        self.covered_from = covered_from
+        self.fetched_at = time.monotonic()
+
+        # Series are never mutated after construction; refreshes build a new one
+        # and swap it into the cache, so concurrent readers see consistent arrays
+        self._set(buckets)
+
+    def _set(self, buckets):
+        self.timestamps = np.array([b['ts'] for b in buckets], dtype=np.int64)
+        self.avg = np.array([b['avg_price'] for b in buckets], dtype=np.float64)
+        self.min = np.array([b['min_price'] for b in buckets], dtype=np.float64)
+        self.max = np.array([b['max_price'] for b in buckets], dtype=np.float64)
+        sums = np.array([[b[c] for c in SUM_COLUMNS] for b in buckets], dtype=np.float64).reshape(-1, 3)
+
+        # Prefix sums over buckets: sale count, price sum, price^2 sum, and the
+        # x/y/xy/x^2 sums of (bucket index, bucket average) for the trend line
+        x = np.arange(len(buckets), dtype=np.float64)
+        columns = np.column_stack([sums, x, self.avg, x * self.avg, x * x]) if len(buckets) else np.empty((0, 7))
+        self._prefix = np.vstack([np.zeros((1, 7)), np.cumsum(columns, axis=0)])
+
+    def buckets(self):
+        return [
+            {
+                'ts': int(ts), 'avg_price': a, 'min_price': lo, 'max_price': hi,
+                'sale_count': c, 'sum_price': s, 'sum_price_sq': sq
+            }
+            for ts, a, lo, hi, (c, s, sq) in zip(
+                self.timestamps, self.avg, self.min, self.max,
+                np.diff(self._prefix[:, :3], axis=0)
+            )
+        ]
+
+    def with_tail(self, newer_buckets):
+        """New series with freshly fetched tail buckets; the last cached bucket may have been partial"""
+        if newer_buckets:
+            first_new = newer_buckets[0]['ts']
+            buckets = [b for b in self.buckets() if b['ts'] < first_new] + newer_buckets
+        else:
+            buckets = self.buckets()
+        return PriceSeries(self.bucket, buckets, self.covered_from)
+
+    def with_head(self, older_buckets, covered_from):
+        """New series that also covers a range older than what is cached"""
+        oldest_cached = self.timestamps[0] if len(self.timestamps) else None
+        older = [b for b in older_buckets if oldest_cached is None or b['ts'] < oldest_cached]
+        series = PriceSeries(self.bucket, older + self.buckets(), covered_from)
+        series.fetched_at = self.fetched_at
+        return series
+
+    def sale_counts(self, start_index):
+        return np.diff(self._prefix[start_index:, 0])
+
+    def range_index(self, start_ts):
+        return int(np.searchsorted(self.timestamps, start_ts, side='left'))
+
+    def summary(self, start_index):
+        """Mean, volatility and trend over buckets[start_index:] from the prefix sums"""
+        totals = self._prefix[-1] - self._prefix[start_index]
+        sale_count, price_sum, price_sq_sum, sx, sy, sxy, sxx = totals
+        n = len(self.timestamps) - start_index
+
+        if n == 0 or sale_count == 0:
+            return None
+
+        mean = price_sum / sale_count
+        variance = max(price_sq_sum / sale_count - mean * mean, 0.0)
+        denominator = n * sxx - sx * sx
+        slope = (n * sxy - sx * sy) / denominator if n > 1 and denominator else 0.0
+
+        return {
+            'buckets': n,
+            'sale_count': int(sale_count),
+            'mean': mean,
+            'std': variance ** 0.5,
+            'slope': slope,
+            'first': float(self.avg[start_index]),
+            'last': float(self.avg[-1]),
+            'highest': float(self.max[start_index:].max()),
+            'lowest': float(self.min[start_index:].min())
+        }
+
+
+class PriceHistoryService:
+    """Reads aggregated price history through the price_history_buckets RPC.
+
+    Series are cached per (funko, bucket size). After the TTL only buckets since
+    the last cached one are fetched and merged, so hot items rarely hit the database.
+    With a local PriceStore (features/price_store.py) the same buckets are computed
+    from the memory-mapped sales instead, and the database is not queried at all.
+
+    recent_prices() serves the model features: the last individual sales, the
+    same sequence the training windows are computed over, not bucket averages.
+    """
+
+    def __init__(self, supabase_client, ttl_seconds=HISTORY_CACHE_TTL_SECONDS,
+                 max_series=HISTORY_CACHE_MAX_SERIES, price_store=None):
+        self.supabase = supabase_client
+        self.price_store = price_store
+        self.ttl_seconds = ttl_seconds
+        self.max_series = max_series
+        self._series = OrderedDict()
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def bucket_for(days):
+        return 'week' if days > HISTORY_WEEKLY_AFTER_DAYS else 'day'
+
+    def get_series(self, funko_pop_id, days):
+        """Return (series, start_index) covering the last `days` days"""
+        bucket = self.bucket_for(days)
+        now = datetime.now(timezone.utc)
+        start = now - timedelta(days=days)
+        key = (str(funko_pop_id), bucket)
+
+        with self._lock:
+            series = self._series.get(key)
+            if series is not None:
+                self._series.move_to_end(key)
+
+        if series is None:
+            covered_from = now - timedelta(days=max(days, HISTORY_MIN_PRELOAD_DAYS))
+            series = PriceSeries(bucket, self._fetch(funko_pop_id, covered_from, bucket), covered_from)
+            self._store(key, series)
+        else:
+            refreshed = series
+            if start < refreshed.covered_from:
+                refreshed = refreshed.with_head(self._fetch(funko_pop_id, start, bucket), start)
+            if time.monotonic() - refreshed.fetched_at > self.ttl_seconds:
+                tail_from = (
+                    datetime.fromtimestamp(int(refreshed.timestamps[-1]), timezone.utc)
+                    if len(refreshed.timestamps) else refreshed.covered_from
+                )
+                refreshed = refreshed.with_tail(self._fetch(funko_pop_id, tail_from, bucket))
+            if refreshed is not series:
+                series = refreshed
+                self._store(key, series)
+
+        return series, series.range_index(int(start.timestamp()) - BUCKET_SECONDS[bucket] + 1)
+
+    def get_points(self, funko_pop_id, days, max_points=None):
+        """Aggregated points for the range, downsampled with LTTB beyond max_points"""
+        series, start_index = self.get_series(funko_pop_id, days)
+        timestamps = series.timestamps[start_index:]
+        prices = series.avg[start_index:]
+
+        if max_points and len(timestamps) > max_points:
+            keep = lttb(timestamps.astype(np.float64), prices, max_points)
+        else:
+            keep = np.arange(len(timestamps))
+
+        counts = series.sale_counts(start_index)
+        return [
+            {
+                'date': datetime.fromtimestamp(int(timestamps[i]), timezone.utc).isoformat(),
+                'price': round(float(prices[i]), 2),
+                'min_price': round(float(series.min[start_index + i]), 2),
+                'max_price': round(float(series.max[start_index + i]), 2),
+                'sales': int(counts[i]),
+                'bucket': series.bucket
+            }
+            for i in keep
+        ]
+
+    def get_summary(self, funko_pop_id, days):
+        series, start_index = self.get_series(funko_pop_id, days)
+        return series.summary(start_index)
+
+    def recent_prices(self, funko_pop_ids, limit):
+        """Last `limit` individual sale prices (oldest first) per Funko Pop, keyed by str(id)"""
+        keys = [(str(funko_pop_id), limit) for funko_pop_id in funko_pop_ids]
+        now = time.monotonic()
+        prices = {}
+
+        with self._lock:
+            for key in keys:
+                cached = self._recent.get(key)
+                if cached is not None and now - cached[0] <= self.ttl_seconds:
+                    self._recent.move_to_end(key)
+                    prices[key[0]] = cached[1]
+
+        missing = list(dict.fromkeys(key[0] for key in keys if key[0] not in prices))
+        if missing:
+            fetched = self._fetch_recent(missing, limit)
+            with self._lock:
+                for funko_pop_id in missing:
+                    prices[funko_pop_id] = fetched.get(funko_pop_id, [])
+                    self._recent[(funko_pop_id, limit)] = (now, prices[funko_pop_id])
+                    self._recent.move_to_end((funko_pop_id, limit))
+                while len(self._recent) > self.max_series:
+                    self._recent.popitem(last=False)
+
+        return prices
+
+    def _fetch_recent(self, funko_pop_ids, limit):
+        if self.price_store is not None:
+            return {
+                funko_pop_id: self.price_store.recent(funko_pop_id, limit)['prices'].tolist()
+                for funko_pop_id in funko_pop_ids
+            }
+
+        response = self.supabase.rpc('recent_sale_prices', {
+            'p_funko_pop_ids': funko_pop_ids,
+            'p_limit': limit
+        }).execute()
+        return {str(row['funko_pop_id']): list(row['prices'] or []) for row in response.data or []}
+
+    def _store(self, key, series):
+        with self._lock:
+            self._series[key] = series
+            self._series.move_to_end(key)
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+
+    def _fetch(self, funko_pop_id, start, bucket):
+        if self.price_store is not None:
+            return self.price_store.buckets(funko_pop_id, int(start.timestamp()), bucket)
+
+        response = self.supabase.rpc('price_history_buckets', {
+            'p_funko_pop_id': str(funko_pop_id),
+            'p_start': start.isoformat(),
+            'p_bucket': bucket
+        }).execute()
+
+        buckets = []
+        for row in response.data or []:
+            row = dict(row)
+            row['ts'] = int(datetime.fromisoformat(row['bucket_start'].replace('Z', '+00:00')).timestamp())
+            buckets.append(row)
+        return buckets
@@ -0,0 +1,72 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+STATUS_REFRESH_INTERVAL = float(os.getenv('STATUS_REFRESH_INTERVAL', '30'))
+
+
+class StatusSnapshot:
+    """Model and endpoint status captured at one point in time; never mutated"""
+
+    def __init__(self, values, refreshed_at=None):
+        self.values = values
+        self.refreshed_at = refreshed_at
+        self.last_updated = datetime.now().isoformat() if refreshed_at is not None else None
+
+    def age_seconds(self):
+        if self.refreshed_at is None:
+            return None
+        return round(time.monotonic() - self.refreshed_at, 3)
+
+
+class StatusMonitor:
+    """Keeps a status snapshot fresh from a background thread.
+
+    ``collect()`` does the slow work (describe_endpoint etc.) off the request
+    path; readers only take the current reference, so /model/status and
+    /health never wait on AWS.
+    """
+
+    def __init__(self, collect, interval=STATUS_REFRESH_INTERVAL):
+        self.collect = collect
+        self.interval = interval
+        self.last_error = None
+        self._snapshot = StatusSnapshot({})
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='status-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def refresh(self):
+        started = time.monotonic()
+        values = self.collect()
+        self._snapshot = StatusSnapshot(values, started)
+        return self._snapshot
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                # Keep serving the previous snapshot; its age shows it is stale
+                self.last_error = str(e)
+                logger.error(f"Status refresh failed: {e}")
+            if self._stop.wait(self.interval):
+                return
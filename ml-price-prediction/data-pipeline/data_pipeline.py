@@ -6,6 +6,13 @@ import json
 import os
 from supabase import create_client, Client
 import logging
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'features'))
+from funko_features import FEATURE_NAMES, FUNKO_COLUMNS, build_feature_mappings, engineer_training_matrix
+from similarity_index import SimilarityIndex
+from price_store import PRICE_STORE_DIR, PriceStore, PriceStoreWriter, ingest_price_history
+from sales_cleaning import clean_sales
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -49,6 +56,10 @@ class FunkoDataPipeline:
             if not funko_response.data:
                 raise ValueError("No funko data found")
             
+            # Real sales, read column-wise from the local price store
+            if PRICE_STORE_DIR:
+                return self.load_price_store(), pd.DataFrame(funko_response.data)
+            
             # Since we don't have actual price history yet, let's simulate some
             # In production, this would come from your actual price_history table
             price_data = []
@@ -97,78 +108,50 @@ class FunkoDataPipeline:
             logger.error(f"Error extracting data: {e}")
             raise
     
+    def load_price_store(self):
+        """Ingest new price_history rows into the local price store, then read every sale from it"""
+        added = ingest_price_history(PriceStoreWriter(PRICE_STORE_DIR), self.supabase)
+        store = PriceStore(PRICE_STORE_DIR)
+        price_df = pd.DataFrame(store.to_columns())
+        logger.info(f"Loaded {len(price_df)} sales from the price store ({added} newly ingested)")
+        return price_df
+    
+    def clean_sales(self, price_df):
+        """Drop invalid, duplicate and outlier sales before they reach the rolling features"""
+        logger.info("Cleaning sales...")
+        
+        cleaned_df, report = clean_sales(price_df)
+        
+        logger.info(
+            f"Cleaned sales: {report['input_rows']} -> {report['output_rows']} rows "
+            f"({report['invalid']} invalid, {report['duplicates']} duplicates, {report['outliers']} outliers dropped; "
+            f"{report['unknown_condition']} unknown conditions, {report['unknown_marketplace']} unknown marketplaces kept)"
+        )
+        return cleaned_df
+    
     def engineer_features(self, price_df, funko_df):
         """Create ML features for price prediction"""
         logger.info("Engineering features...")
         
-        # Merge price and funko data
+        # Merge price and funko data, each Funko's sales in date order for the rolling features
         merged_df = pd.merge(price_df, funko_df, left_on='funko_pop_id', right_on='id')
+        merged_df['date_sold'] = pd.to_datetime(merged_df['date_sold'])
+        merged_df = merged_df.sort_values(['funko_pop_id', 'date_sold'], kind='stable').reset_index(drop=True)
         
-        # Feature engineering
-        features_df = pd.DataFrame()
-        
-        # Time-based features
-        merged_df['release_date'] = pd.to_datetime(merged_df['release_date'])
-        merged_df['price_date'] = pd.to_datetime(merged_df['date_sold'])
-        
-        features_df['days_since_release'] = (merged_df['price_date'] - merged_df['release_date']).dt.days
-        features_df['release_month'] = merged_df['release_date'].dt.month
-        features_df['sale_month'] = merged_df['price_date'].dt.month
-        features_df['sale_day_of_week'] = merged_df['price_date'].dt.dayofweek
-        features_df['is_weekend_sale'] = (merged_df['price_date'].dt.dayofweek >= 5).astype(int)
-        
-        # Rarity features
-        features_df['is_chase'] = merged_df['is_chase'].fillna(False).astype(int)
-        features_df['is_exclusive'] = merged_df['is_exclusive'].fillna(False).astype(int)
-        features_df['is_vaulted'] = merged_df['is_vaulted'].fillna(False).astype(int)
-        features_df['funko_number'] = merged_df['funko_number'].fillna(0)
-        
-        # Series and character features (encoding)
-        series_mapping = {series: idx for idx, series in enumerate(merged_df['series'].unique())}
-        character_mapping = {char: idx for idx, char in enumerate(merged_df['character'].unique())}
-        
-        features_df['series_encoded'] = merged_df['series'].map(series_mapping).fillna(0)
-        features_df['character_encoded'] = merged_df['character'].map(character_mapping).fillna(0)
+        # Series and character codes come from the whole catalog and ship with the model
+        mappings = build_feature_mappings(funko_df['series'], funko_df['character'])
         
         # Save mappings for inference
-        self.save_mappings({
-            'series_mapping': series_mapping,
-            'character_mapping': character_mapping
-        })
-        
-        # Condition features
-        condition_map = {'mint': 5, 'near_mint': 4, 'very_fine': 3, 'fine': 2, 'poor': 1}
-        features_df['condition_score'] = merged_df['condition'].map(condition_map).fillna(3)
-        
-        # Marketplace features
-        marketplace_map = {'ebay': 1, 'mercari': 2, 'amazon': 3, 'funko_shop': 4}
-        features_df['marketplace_encoded'] = merged_df['marketplace'].map(marketplace_map).fillna(1)
-        
-        # Historical price features (rolling averages)
-        merged_df_sorted = merged_df.sort_values(['funko_pop_id', 'price_date'])
-        
-        for window in [7, 30, 90]:
-            features_df[f'avg_price_{window}d'] = (
-                merged_df_sorted.groupby('funko_pop_id')['price']
-                .rolling(window=window, min_periods=1)
-                .mean()
-                .values
-            )
+        self.save_mappings(mappings)
         
-        # Price volatility (rolling standard deviation)
-        features_df['price_volatility_30d'] = (
-            merged_df_sorted.groupby('funko_pop_id')['price']
-            .rolling(window=30, min_periods=1)
-            .std()
-            .fillna(0)
-            .values
-        )
+        # Nearest-neighbour prices for Funko Pops that have no sales yet
+        self.update_similarity_index(merged_df, funko_df)
         
-        # Estimated value feature
-        features_df['base_estimated_value'] = merged_df['estimated_value'].fillna(10)
+        # Same vectorized feature code the API serves with (features/funko_features.py)
+        features_df = pd.DataFrame(engineer_training_matrix(merged_df, mappings), columns=FEATURE_NAMES)
         
         # Target variable (this is what we're predicting)
-        features_df['target_price'] = merged_df['price']
+        features_df['target_price'] = merged_df['price'].values
         
         # Remove any rows with NaN values
         features_df = features_df.dropna()
@@ -190,6 +173,32 @@ class FunkoDataPipeline:
             'funko-price-prediction/feature_mappings.json'
         )
     
+    def update_similarity_index(self, merged_df, funko_df):
+        """Update the published cold-start similarity index with the latest sales and upload it"""
+        index_key = 'funko-price-prediction/similarity_index.npz'
+        index_path = '/tmp/similarity_index.npz'
+        
+        # Start from the previous run's index so only Funko Pops in this run are rewritten
+        try:
+            self.s3_client.download_file(self.bucket_name, index_key, index_path)
+            index = SimilarityIndex.load(index_path)
+        except Exception as e:
+            logger.info(f"Building a new similarity index ({e})")
+            index = SimilarityIndex()
+        
+        # merged_df is sorted by funko_pop_id and date_sold, so each list is oldest first
+        price_sequences = merged_df.groupby('funko_pop_id', sort=False)['price'].apply(list)
+        funkos = funko_df.set_index('id').loc[price_sequences.index]
+        added, updated = index.update(
+            list(price_sequences.index),
+            {name: funkos[name].tolist() for name in FUNKO_COLUMNS},
+            price_sequences.tolist()
+        )
+        logger.info(f"Similarity index: {added} added, {updated} updated, {len(index)} total")
+        
+        index.save(index_path)
+        self.s3_client.upload_file(index_path, self.bucket_name, index_key)
+    
     def prepare_sagemaker_data(self, features_df):
         """Prepare data in SageMaker format (CSV with target in first column)"""
         logger.info("Preparing data for SageMaker...")
@@ -267,16 +276,20 @@ def main():
         logger.info("Step 1: Extracting data...")
         price_df, funko_df = pipeline.extract_training_data()
         
+        # Clean sales
+        logger.info("Step 2: Cleaning sales...")
+        price_df = pipeline.clean_sales(price_df)
+        
         # Engineer features
-        logger.info("Step 2: Engineering features...")
+        logger.info("Step 3: Engineering features...")
         features_df = pipeline.engineer_features(price_df, funko_df)
         
         # Prepare for SageMaker
-        logger.info("Step 3: Preparing SageMaker data...")
+        logger.info("Step 4: Preparing SageMaker data...")
         train_df, val_df, test_df = pipeline.prepare_sagemaker_data(features_df)
         
         # Upload to S3
-        logger.info("Step 4: Uploading to S3...")
+        logger.info("Step 5: Uploading to S3...")
         s3_paths = pipeline.upload_to_s3(train_df, val_df, test_df)
         
         logger.info("✅ Data pipeline completed successfully!")
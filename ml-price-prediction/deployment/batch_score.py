@@ -0,0 +1,446 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'features'))
+
+import funko_features
+from model_registry import create_artifact_source, load_artifacts, price_intervals
+from price_history import PriceHistoryService
+from price_store import create_price_store
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Configuration
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', '2000'))
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', str(os.cpu_count() or 1)))
+UPSERT_BATCH_SIZE = 500
+FUNKO_SELECT = (
+    'id, name, series, character, funko_number, release_date, '
+    'is_chase, is_exclusive, is_vaulted, estimated_value'
+)
+CHECKPOINT_NAME = 'checkpoint.json'
+
+# Booster held by each scoring process, loaded once by the pool initializer
+_worker_model = None
+
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+    # One thread per process; the pool provides the parallelism
+    _worker_model.set_param({'nthread': 1})
+
+
+def _score_matrix(feature_matrix):
+    import xgboost as xgb
+    return _worker_model.predict(xgb.DMatrix(feature_matrix))
+
+
+class CatalogReader:
+    """Streams funko_pops in id order, with each chunk's recent sales"""
+
+    def __init__(self, supabase_client, chunk_size=BATCH_CHUNK_SIZE):
+        self.supabase = supabase_client
+        self.chunk_size = chunk_size
+        # Same history source as the API; every Funko Pop is read once, so nothing is cached
+        self.price_history = PriceHistoryService(supabase_client, max_series=0, price_store=create_price_store())
+
+    def iter_chunks(self, after_id=None):
+        """Keyset pagination, so a resumed run continues right after the last committed id"""
+        while True:
+            query = self.supabase.table('funko_pops').select(FUNKO_SELECT).order('id').limit(self.chunk_size)
+            if after_id is not None:
+                query = query.gt('id', after_id)
+            rows = query.execute().data or []
+            if not rows:
+                return
+
+            yield rows, self.fetch_histories([row['id'] for row in rows])
+            after_id = rows[-1]['id']
+            if len(rows) < self.chunk_size:
+                return
+
+    def fetch_histories(self, funko_pop_ids):
+        """Last individual sale prices (oldest first) for many Funko Pops, as the API featurizes them"""
+        return self.price_history.recent_prices(funko_pop_ids, max(funko_features.PRICE_WINDOWS))
+
+
+class ParquetSink:
+    """One Parquet part per chunk in a local directory or under an s3:// prefix"""
+
+    def __init__(self, output):
+        self.output = output.rstrip('/')
+        self.local_dir = self.output
+        if self.output.startswith('s3://'):
+            self.local_dir = os.path.join('/tmp', 'funko-batch-score')
+        os.makedirs(self.local_dir, exist_ok=True)
+
+    def write(self, part, frame):
+        name = f'part-{part:05d}.parquet'
+        local_path = os.path.join(self.local_dir, name)
+        frame.to_parquet(f'{local_path}.tmp', index=False)
+        os.replace(f'{local_path}.tmp', local_path)
+
+        if self.output.startswith('s3://'):
+            from aws_clients import get_s3_client
+            bucket, _, prefix = self.output[len('s3://'):].partition('/')
+            get_s3_client().upload_file(local_path, bucket, f'{prefix}/{name}' if prefix else name)
+            os.remove(local_path)
+
+
+class SupabaseSink:
+    """Bulk upserts into the predictions table (see sql/funko_price_predictions.sql)"""
+
+    def __init__(self, supabase_client, table):
+        self.supabase = supabase_client
+        self.table = table
+
+    def write(self, part, frame):
+        # Missing interval bounds (point models) go in as NULL
+        records = frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+        for start in range(0, len(records), UPSERT_BATCH_SIZE):
+            self.supabase.table(self.table).upsert(
+                records[start:start + UPSERT_BATCH_SIZE],
+                on_conflict='funko_pop_id,condition,marketplace,future_days'
+            ).execute()
+
+
+class MultiSink:
+    """Writes each chunk to every configured sink"""
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    def write(self, part, frame):
+        for sink in self.sinks:
+            sink.write(part, frame)
+
+
+class BatchScoringJob:
+    """Scores the whole catalog: featurize each chunk, score it in a process pool, write it.
+
+    Chunks are written in catalog order and a checkpoint (last id, rows, parts)
+    is saved after each write, so a rerun with the same run id resumes where
+    the previous one stopped.
+    """
+
+    def __init__(self, reader, artifacts, sink, state_dir, run_id,
+                 conditions=('mint',), marketplace='ebay', future_days=30, workers=BATCH_WORKERS):
+        self.reader = reader
+        self.artifacts = artifacts
+        self.sink = sink
+        self.state_dir = state_dir
+        self.run_id = run_id
+        self.conditions = list(conditions)
+        self.marketplace = marketplace
+        self.future_days = future_days
+        self.workers = workers
+        os.makedirs(state_dir, exist_ok=True)
+
+    @property
+    def checkpoint_path(self):
+        return os.path.join(self.state_dir, f'{self.run_id}-{CHECKPOINT_NAME}')
+
+    def load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return {'last_id': None, 'rows': 0, 'parts': 0}
+
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint['model_version'] != self.artifacts.model_version:
+            raise ValueError(
+                f"Checkpoint for run {self.run_id} was scored with model {checkpoint['model_version']}, "
+                f"not {self.artifacts.model_version}; use a new --run-id"
+            )
+        logger.info(f"Resuming run {self.run_id} after {checkpoint['last_id']} ({checkpoint['rows']} rows done)")
+        return checkpoint
+
+    def save_checkpoint(self, checkpoint):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({**checkpoint, 'model_version': self.artifacts.model_version}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def featurize(self, funko_rows, histories):
+        """Feature matrix with one row per (funko, condition), plus the matching keys"""
+        static_matrix = funko_features.engineer_static_matrix(
+            funko_features.rows_to_columns(funko_rows),
+            [histories.get(str(row['id']), []) for row in funko_rows],
+            self.artifacts.feature_mappings,
+            self.artifacts.similarity_index
+        )
+        complete = ~np.isnan(static_matrix).any(axis=1)
+        ids = np.array([str(row['id']) for row in funko_rows])[complete]
+        static_matrix = static_matrix[complete]
+
+        n_conditions = len(self.conditions)
+        feature_matrix = funko_features.engineer_request_matrix(
+            np.repeat(static_matrix, n_conditions, axis=0),
+            funko_features.today_epoch_days() + self.future_days,
+            self.conditions * len(ids),
+            [self.marketplace],
+            self.artifacts.feature_names
+        )
+        keys = pd.DataFrame({
+            'funko_pop_id': np.repeat(ids, n_conditions),
+            'condition': self.conditions * len(ids)
+        })
+        return feature_matrix, keys, int((~complete).sum())
+
+    def build_frame(self, keys, predictions, scored_at):
+        """Output rows from (n, 3) price, lower and upper predictions (see price_intervals)"""
+        frame = keys.copy()
+        frame['marketplace'] = self.marketplace
+        frame['future_days'] = self.future_days
+        frame['predicted_price'] = np.round(predictions[:, 0], 2)
+        frame['price_lower'] = np.round(predictions[:, 1], 2)
+        frame['price_upper'] = np.round(predictions[:, 2], 2)
+        frame['model_version'] = self.artifacts.model_version
+        frame['run_id'] = self.run_id
+        frame['scored_at'] = scored_at
+        return frame
+
+    def run(self):
+        checkpoint = self.load_checkpoint()
+        if checkpoint.get('mode') == 'batch_transform':
+            raise ValueError(f"Run {self.run_id} was started with Batch Transform; resume it the same way")
+        started = time.perf_counter()
+        rows_before = checkpoint['rows']
+        skipped = 0
+        scored_at = datetime.now(timezone.utc).isoformat()
+        pending = []
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(self.artifacts.embedded_model,)
+        ) as pool:
+            for funko_rows, histories in self.reader.iter_chunks(checkpoint['last_id']):
+                feature_matrix, keys, incomplete = self.featurize(funko_rows, histories)
+                skipped += incomplete
+                pending.append((pool.submit(_score_matrix, feature_matrix), keys, funko_rows[-1]['id']))
+
+                # Keep the pool busy while fetching the next chunk, but bound memory
+                while len(pending) > self.workers:
+                    checkpoint = self._commit(pending.pop(0), checkpoint, scored_at, started, rows_before)
+
+            while pending:
+                checkpoint = self._commit(pending.pop(0), checkpoint, scored_at, started, rows_before)
+
+        elapsed = time.perf_counter() - started
+        summary = {
+            'run_id': self.run_id,
+            'model_version': self.artifacts.model_version,
+            'rows': checkpoint['rows'],
+            'rows_this_run': checkpoint['rows'] - rows_before,
+            'parts': checkpoint['parts'],
+            'skipped_funkos': skipped,
+            'seconds': round(elapsed, 1),
+            'rows_per_second': round((checkpoint['rows'] - rows_before) / elapsed, 1) if elapsed > 0 else None
+        }
+        logger.info(f"✅ Batch scoring completed: {summary}")
+        return summary
+
+    def _commit(self, item, checkpoint, scored_at, started, rows_before):
+        """Write one scored chunk, then move the checkpoint past it"""
+        future, keys, last_id = item
+        predictions = price_intervals(future.result(), self.artifacts.quantile_alphas)
+        frame = self.build_frame(keys, predictions, scored_at)
+        self.sink.write(checkpoint['parts'], frame)
+
+        checkpoint = {
+            'last_id': last_id,
+            'rows': checkpoint['rows'] + len(frame),
+            'parts': checkpoint['parts'] + 1
+        }
+        self.save_checkpoint(checkpoint)
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Part {checkpoint['parts'] - 1}: {len(frame)} rows, {checkpoint['rows']} total, "
+            f"{(checkpoint['rows'] - rows_before) / elapsed:,.0f} rows/s"
+        )
+        return checkpoint
+
+
+class BatchTransformScorer:
+    """Scores feature CSVs with a SageMaker Batch Transform job instead of the local pool.
+
+    Resumable like the local job, through the same run checkpoint: every uploaded
+    input part, the transform job name and every written output part are
+    recorded, so a rerun with the same run id skips the uploaded parts, attaches
+    to a running or finished transform job, and writes only the remaining parts.
+    """
+
+    def __init__(self, model_name, s3_prefix, instance_type='ml.m5.xlarge', instance_count=1):
+        self.model_name = model_name
+        self.s3_prefix = s3_prefix.rstrip('/')
+        self.instance_type = instance_type
+        self.instance_count = instance_count
+
+    @staticmethod
+    def keys_path(job, part):
+        return os.path.join(job.state_dir, f'{job.run_id}-keys-{part:05d}.csv')
+
+    def run(self, job):
+        """Featurize the catalog to S3, transform it, then join predictions back to their keys"""
+        from aws_clients import get_s3_client
+
+        checkpoint = job.load_checkpoint()
+        if checkpoint['parts'] and checkpoint.get('mode') != 'batch_transform':
+            raise ValueError(f"Run {job.run_id} was started with local scoring; resume it the same way")
+        checkpoint = {
+            'mode': 'batch_transform', 'input_complete': False, 'transform_job': None,
+            'transformed': False, 'written': 0, **checkpoint
+        }
+
+        s3 = get_s3_client()
+        bucket, _, prefix = self.s3_prefix[len('s3://'):].partition('/')
+        input_prefix = f'{prefix}/{job.run_id}/input'
+        output_prefix = f'{prefix}/{job.run_id}/output'
+        started = time.perf_counter()
+        rows_before = checkpoint['rows']
+
+        if not checkpoint['input_complete']:
+            for funko_rows, histories in job.reader.iter_chunks(checkpoint['last_id']):
+                part = checkpoint['parts']
+                feature_matrix, keys, _ = job.featurize(funko_rows, histories)
+                body = pd.DataFrame(feature_matrix).to_csv(index=False, header=False)
+                s3.put_object(Bucket=bucket, Key=f'{input_prefix}/part-{part:05d}.csv', Body=body)
+                keys.to_csv(self.keys_path(job, part), index=False)
+                checkpoint = {**checkpoint, 'last_id': funko_rows[-1]['id'], 'parts': part + 1}
+                job.save_checkpoint(checkpoint)
+            checkpoint = {**checkpoint, 'input_complete': True}
+            job.save_checkpoint(checkpoint)
+
+        if not checkpoint['transformed']:
+            checkpoint = self._transform(job, checkpoint, f's3://{bucket}/{input_prefix}', f's3://{bucket}/{output_prefix}')
+
+        scored_at = datetime.now(timezone.utc).isoformat()
+        for part in range(checkpoint['written'], checkpoint['parts']):
+            keys = pd.read_csv(self.keys_path(job, part), dtype=str)
+            body = s3.get_object(Bucket=bucket, Key=f'{output_prefix}/part-{part:05d}.csv.out')['Body'].read()
+            # One line per row: "price", or "price,lower,upper" from a multi-quantile model
+            rows_out = [[float(value) for value in line.split(',')] for line in body.decode().split()]
+            predictions = np.array(rows_out, dtype=np.float64).reshape(len(rows_out), -1)
+            if predictions.shape[1] == 1:
+                predictions = price_intervals(predictions[:, 0], None)
+            job.sink.write(part, job.build_frame(keys, predictions, scored_at))
+            checkpoint = {**checkpoint, 'written': part + 1, 'rows': checkpoint['rows'] + len(keys)}
+            job.save_checkpoint(checkpoint)
+
+        rows = checkpoint['rows'] - rows_before
+        elapsed = time.perf_counter() - started
+        logger.info(f"✅ Batch Transform scoring completed: {checkpoint['rows']} rows, {rows / elapsed:,.0f} rows/s")
+        return {
+            'run_id': job.run_id,
+            'rows': checkpoint['rows'],
+            'rows_this_run': rows,
+            'parts': checkpoint['parts'],
+            'seconds': round(elapsed, 1),
+            'rows_per_second': round(rows / elapsed, 1) if elapsed > 0 else None
+        }
+
+    def _transform(self, job, checkpoint, data, output_path):
+        """Wait for the run's transform job, starting one unless a previous attempt is running or done"""
+        from sagemaker.transformer import Transformer
+
+        transformer = None
+        if checkpoint['transform_job']:
+            transformer = Transformer.attach(checkpoint['transform_job'])
+            status = transformer.sagemaker_session.describe_transform_job(checkpoint['transform_job'])['TransformJobStatus']
+            logger.info(f"Transform job {checkpoint['transform_job']} is {status}")
+            if status not in ('InProgress', 'Completed'):
+                transformer = None
+
+        if transformer is None:
+            transformer = Transformer(
+                model_name=self.model_name,
+                instance_count=self.instance_count,
+                instance_type=self.instance_type,
+                strategy='MultiRecord',
+                assemble_with='Line',
+                accept='text/csv',
+                output_path=output_path
+            )
+            job_name = f"funko-batch-{re.sub('[^a-zA-Z0-9-]', '-', job.run_id)[:40]}-{int(time.time())}"
+            transformer.transform(data=data, content_type='text/csv', split_type='Line', job_name=job_name, wait=False)
+            checkpoint = {**checkpoint, 'transform_job': job_name}
+            job.save_checkpoint(checkpoint)
+
+        transformer.wait()
+        checkpoint = {**checkpoint, 'transformed': True}
+        job.save_checkpoint(checkpoint)
+        return checkpoint
+
+
+def main():
+    """Score every Funko Pop in the catalog"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--artifacts", type=str, default=os.getenv('MODEL_ARTIFACT_URI'),
+                        help="s3:// prefix or directory holding manifest.json")
+    parser.add_argument("--output", type=str, default=None, help="Parquet directory or s3:// prefix")
+    parser.add_argument("--upsert-table", type=str, default=None)
+    parser.add_argument("--run-id", type=str, default=datetime.now(timezone.utc).strftime('%Y-%m-%d'))
+    parser.add_argument("--state-dir", type=str, default='/tmp/funko-batch-score-state')
+    parser.add_argument("--conditions", type=str, nargs='+', default=['mint'])
+    parser.add_argument("--marketplace", type=str, default='ebay')
+    parser.add_argument("--future-days", type=int, default=30)
+    parser.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--batch-transform-model", type=str, default=None,
+                        help="SageMaker model name; scores with Batch Transform instead of locally")
+    parser.add_argument("--batch-transform-prefix", type=str, default=None)
+    args = parser.parse_args()
+
+    if not args.artifacts:
+        raise ValueError("Set MODEL_ARTIFACT_URI or pass --artifacts")
+    if not args.output and not args.upsert_table:
+        raise ValueError("Pass --output and/or --upsert-table")
+
+    from supabase import create_client
+    supabase = create_client(
+        os.getenv('SUPABASE_URL'),
+        os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
+    )
+
+    artifacts = load_artifacts(create_artifact_source(args.artifacts))
+    if artifacts.embedded_model is None and not args.batch_transform_model:
+        raise ValueError("The manifest has no model to score with locally")
+
+    sinks = []
+    if args.output:
+        sinks.append(ParquetSink(args.output))
+    if args.upsert_table:
+        sinks.append(SupabaseSink(supabase, args.upsert_table))
+
+    job = BatchScoringJob(
+        CatalogReader(supabase, args.chunk_size), artifacts, MultiSink(sinks),
+        args.state_dir, args.run_id, args.conditions, args.marketplace, args.future_days, args.workers
+    )
+
+    if args.batch_transform_model:
+        if not args.batch_transform_prefix:
+            raise ValueError("Batch Transform needs --batch-transform-prefix")
+        summary = BatchTransformScorer(args.batch_transform_model, args.batch_transform_prefix).run(job)
+    else:
+        summary = job.run()
+
+    print(json.dumps(summary, indent=2))
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,19 @@ from sagemaker.inputs import TrainingInput
 import time
 import json
 import logging
+import os
 from datetime import datetime
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Configuration
+# reg:quantileerror needs xgboost 2.0+, so training and serving use the 3.0-5 container
+# (XGBoost 3.0.5). XGBOOST_IMAGE_URI pins a custom image with xgboost 2.x or later instead.
+XGBOOST_FRAMEWORK_VERSION = os.getenv('XGBOOST_FRAMEWORK_VERSION', '3.0-5')
+XGBOOST_IMAGE_URI = os.getenv('XGBOOST_IMAGE_URI')
+
 class FunkoPriceModelDeployer:
     def __init__(self, region='us-west-2'):
         self.session = sagemaker.Session()
@@ -42,14 +49,16 @@ class FunkoPriceModelDeployer:
                 'colsample_bytree': 0.8,
                 'num_round': 1000,
                 'early_stopping_rounds': 50,
-                'objective': 'reg:squarederror'
+                'objective': 'reg:quantileerror',
+                'quantile_alphas': '0.1,0.5,0.9'
             }
         
         # Create XGBoost estimator
         xgb_estimator = Estimator(
-            image_uri=sagemaker.image_uris.retrieve('xgboost', self.region, '1.5-1'),
+            image_uri=XGBOOST_IMAGE_URI or sagemaker.image_uris.retrieve('xgboost', self.region, XGBOOST_FRAMEWORK_VERSION),
             entry_point='train.py',
             source_dir='training',
+            dependencies=['features'],
             role=self.role,
             instance_count=1,
             instance_type='ml.m5.large',
@@ -107,11 +116,45 @@ class FunkoPriceModelDeployer:
             role=self.role,
             entry_point='train.py',
             source_dir='training',
-            framework_version='1.5-1'
+            dependencies=['features'],
+            framework_version=XGBOOST_FRAMEWORK_VERSION,
+            image_uri=XGBOOST_IMAGE_URI
         )
         
         return model
     
+    def publish_manifest(self, estimator, model_version=None):
+        """Publish the manifest the prediction API polls to hot-reload new models"""
+        model_version = model_version or estimator.latest_training_job.name
+        logger.info(f"Publishing model manifest for version: {model_version}")
+        
+        manifest = {
+            'model_version': model_version,
+            'model': estimator.model_data,
+            'feature_names': 'feature_names.json',
+            'feature_mappings': 'feature_mappings.json',
+            'similarity_index': 'similarity_index.npz',
+            'endpoint_name': self.endpoint_name,
+            'published_at': datetime.now().isoformat()
+        }
+        
+        try:
+            s3_client = boto3.client('s3', region_name=self.region)
+            # Written last, after the artifacts it references already exist
+            s3_client.put_object(
+                Bucket=self.bucket,
+                Key='funko-price-prediction/manifest.json',
+                Body=json.dumps(manifest, indent=2),
+                ContentType='application/json'
+            )
+            
+            logger.info(f"✅ Manifest published to s3://{self.bucket}/funko-price-prediction/manifest.json")
+            return manifest
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to publish manifest: {e}")
+            raise
+    
     def test_endpoint(self, predictor, test_data=None):
         """Test the deployed endpoint"""
         logger.info("Testing deployed endpoint...")
@@ -277,8 +320,12 @@ def main():
         logger.info("Step 4: Setting up auto-scaling...")
         deployer.setup_auto_scaling()
         
+        # Let running prediction APIs pick up the new version
+        logger.info("Step 5: Publishing model manifest...")
+        deployer.publish_manifest(estimator)
+        
         # Get status
-        logger.info("Step 5: Getting endpoint status...")
+        logger.info("Step 6: Getting endpoint status...")
         status = deployer.get_endpoint_status()
         
         logger.info("✅ Deployment completed successfully!")
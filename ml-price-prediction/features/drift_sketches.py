@@ -0,0 +1,179 @@
+"""Fixed-size sketches of the model's inputs and outputs, for drift detection.
+
+train.py summarizes the training matrix (and the model's predictions on it)
+as a DriftReference; the API feeds the rows it scores into a DriftSketch built
+from that reference and compares the two with PSI and KS.
+
+- Numeric features (and the prediction) are counted into the reference's
+  quantile bins, so PSI and KS are computed over equal-mass training bins
+  and memory is one small row of counts per feature.
+- Categorical encodings (series, character, marketplace) have too many values
+  to bin, so live counts go into a count-min sketch. PSI is computed over the
+  reference's most frequent codes plus one "other" bucket.
+
+Updating a sketch costs the same for every row, whatever the traffic so far.
+"""
+import json
+
+import numpy as np
+
+CATEGORICAL_FEATURES = ['series_encoded', 'character_encoded', 'marketplace_encoded']
+PREDICTION = 'prediction'
+
+DEFAULT_BINS = 20
+DEFAULT_TOP_CODES = 50
+COUNT_MIN_WIDTH = 2048
+COUNT_MIN_DEPTH = 4
+_HASH_PRIME = 2147483647  # 2^31 - 1
+# Floor for empty bins, so PSI stays finite
+PSI_EPSILON = 1e-4
+
+
+def bin_counts(values, edges):
+    """(n, F) values against (F, bins - 1) edges -> (F, bins) counts"""
+    bins = (values[:, :, np.newaxis] >= edges[np.newaxis]).sum(axis=2)
+    columns = np.broadcast_to(np.arange(edges.shape[0]), bins.shape)
+    counts = np.zeros((edges.shape[0], edges.shape[1] + 1), dtype=np.int64)
+    np.add.at(counts, (columns, bins), 1)
+    return counts
+
+
+def psi(expected, actual):
+    """Population stability index between two count (or proportion) vectors, per row"""
+    expected = np.maximum(expected / np.maximum(expected.sum(axis=-1, keepdims=True), 1), PSI_EPSILON)
+    actual = np.maximum(actual / np.maximum(actual.sum(axis=-1, keepdims=True), 1), PSI_EPSILON)
+    return ((actual - expected) * np.log(actual / expected)).sum(axis=-1)
+
+
+def ks(expected, actual):
+    """Largest CDF gap between two binned distributions, per row (KS at the bin edges)"""
+    expected = np.cumsum(expected, axis=-1) / np.maximum(expected.sum(axis=-1, keepdims=True), 1)
+    actual = np.cumsum(actual, axis=-1) / np.maximum(actual.sum(axis=-1, keepdims=True), 1)
+    return np.abs(expected - actual).max(axis=-1)
+
+
+class CountMinSketch:
+    """Approximate counts of integer codes in depth x width counters; never undercounts"""
+
+    def __init__(self, width=COUNT_MIN_WIDTH, depth=COUNT_MIN_DEPTH, seed=0):
+        rng = np.random.default_rng(seed)
+        self.width = width
+        self.a = rng.integers(1, _HASH_PRIME, size=depth, dtype=np.int64)
+        self.b = rng.integers(0, _HASH_PRIME, size=depth, dtype=np.int64)
+        self.counts = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    def _buckets(self, codes):
+        codes = np.mod(np.asarray(codes, dtype=np.int64), _HASH_PRIME)
+        return (self.a[:, np.newaxis] * codes + self.b[:, np.newaxis]) % _HASH_PRIME % self.width
+
+    def update(self, codes):
+        buckets = self._buckets(codes)
+        rows = np.broadcast_to(np.arange(len(self.a))[:, np.newaxis], buckets.shape)
+        np.add.at(self.counts, (rows, buckets), 1)
+        self.total += buckets.shape[1]
+
+    def estimate(self, codes):
+        buckets = self._buckets(codes)
+        return np.take_along_axis(self.counts, buckets, axis=1).min(axis=0)
+
+
+class DriftReference:
+    """Training-time distribution summary saved next to the model as drift_reference.json"""
+
+    def __init__(self, feature_names, numeric_names, edges, counts, categorical):
+        self.feature_names = list(feature_names)
+        self.numeric_names = list(numeric_names)  # numeric features, then PREDICTION
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        # name -> {'codes': [...], 'counts': [...], 'other': int}
+        self.categorical = categorical
+
+    @classmethod
+    def build(cls, feature_matrix, feature_names, predictions, bins=DEFAULT_BINS, top_codes=DEFAULT_TOP_CODES):
+        feature_matrix = np.asarray(feature_matrix, dtype=np.float64)
+        numeric_names = [name for name in feature_names if name not in CATEGORICAL_FEATURES]
+        numeric_columns = [feature_names.index(name) for name in numeric_names]
+        values = np.column_stack([feature_matrix[:, numeric_columns], np.asarray(predictions, dtype=np.float64)])
+
+        # Equal-mass bins: repeated edges (few distinct values) just leave empty bins on both sides
+        edges = np.nanquantile(values, np.arange(1, bins) / bins, axis=0).T
+        counts = bin_counts(values, edges)
+
+        categorical = {}
+        for name in CATEGORICAL_FEATURES:
+            if name not in feature_names:
+                continue
+            codes, code_counts = np.unique(
+                feature_matrix[:, feature_names.index(name)].astype(np.int64), return_counts=True
+            )
+            top = np.argsort(-code_counts, kind='stable')[:top_codes]
+            categorical[name] = {
+                'codes': codes[top].tolist(),
+                'counts': code_counts[top].tolist(),
+                'other': int(code_counts.sum() - code_counts[top].sum())
+            }
+        return cls(feature_names, numeric_names + [PREDICTION], edges, counts, categorical)
+
+    def to_json(self):
+        return json.dumps({
+            'feature_names': self.feature_names,
+            'numeric_names': self.numeric_names,
+            'edges': self.edges.tolist(),
+            'counts': self.counts.tolist(),
+            'categorical': self.categorical
+        })
+
+    @classmethod
+    def from_json(cls, payload):
+        data = json.loads(payload)
+        return cls(data['feature_names'], data['numeric_names'], data['edges'], data['counts'], data['categorical'])
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            f.write(self.to_json())
+
+
+class DriftSketch:
+    """Live counterpart of a DriftReference: bin counts plus one count-min sketch per categorical feature"""
+
+    def __init__(self, reference, feature_names):
+        self.reference = reference
+        self.count = 0
+        self.counts = np.zeros_like(reference.counts)
+        self._numeric_columns = [feature_names.index(name) for name in reference.numeric_names[:-1]]
+        self._categorical_columns = {
+            name: feature_names.index(name) for name in reference.categorical if name in feature_names
+        }
+        self.count_min = {name: CountMinSketch() for name in self._categorical_columns}
+
+    def update(self, feature_matrix, predictions):
+        """Add (n, F) feature rows (in the serving feature order) and their n predictions"""
+        feature_matrix = np.asarray(feature_matrix, dtype=np.float64)
+        values = np.column_stack([
+            feature_matrix[:, self._numeric_columns], np.asarray(predictions, dtype=np.float64)
+        ])
+        self.counts += bin_counts(values, self.reference.edges)
+        for name, column in self._categorical_columns.items():
+            self.count_min[name].update(feature_matrix[:, column].astype(np.int64))
+        self.count += len(feature_matrix)
+
+    def scores(self):
+        """{feature: {'psi', 'ks'}} against the reference; categorical features only get PSI"""
+        reference = self.reference
+        numeric_psi = psi(reference.counts, self.counts)
+        numeric_ks = ks(reference.counts, self.counts)
+        scores = {
+            name: {'psi': float(numeric_psi[i]), 'ks': float(numeric_ks[i])}
+            for i, name in enumerate(reference.numeric_names)
+        }
+        for name, sketch in self.count_min.items():
+            expected = reference.categorical[name]
+            live = sketch.estimate(expected['codes']).astype(np.float64)
+            live = np.minimum(live, sketch.total)  # a hash collision can't exceed the total
+            other = max(sketch.total - live.sum(), 0.0)
+            scores[name] = {'psi': float(psi(
+                np.append(np.asarray(expected['counts'], dtype=np.float64), expected['other']),
+                np.append(live, other)
+            ))}
+        return scores
@@ -0,0 +1,261 @@
+"""Feature engineering shared by the training pipeline and the prediction API.
+
+Every function takes columnar inputs (lists, numpy arrays or DataFrame columns)
+and works on whole batches, so training featurizes the full sales history and
+serving featurizes thousands of rows with the same code. Matrices are float32
+with columns in FEATURE_NAMES order unless another order is passed in.
+"""
+from datetime import datetime
+
+import numpy as np
+
+FEATURE_NAMES = [
+    'days_since_release', 'release_month', 'sale_month',
+    'sale_day_of_week', 'is_weekend_sale', 'is_chase',
+    'is_exclusive', 'is_vaulted', 'funko_number',
+    'series_encoded', 'character_encoded', 'condition_score',
+    'marketplace_encoded', 'avg_price_7d', 'avg_price_30d',
+    'avg_price_90d', 'price_volatility_30d', 'base_estimated_value'
+]
+
+# Features that only depend on the Funko Pop and its price history. Static
+# matrices keep release_ordinal first so the date features can be derived
+# for any sale or prediction date.
+STATIC_FEATURES = [
+    'release_month', 'is_chase', 'is_exclusive', 'is_vaulted',
+    'funko_number', 'series_encoded', 'character_encoded', 'avg_price_7d',
+    'avg_price_30d', 'avg_price_90d', 'price_volatility_30d', 'base_estimated_value'
+]
+STATIC_COLUMNS = ['release_ordinal'] + STATIC_FEATURES
+
+# Funko Pop columns the static features are built from (funko_pops table)
+FUNKO_COLUMNS = [
+    'release_date', 'is_chase', 'is_exclusive', 'is_vaulted',
+    'funko_number', 'series', 'character', 'estimated_value'
+]
+
+CONDITION_MAP = {'mint': 5, 'near_mint': 4, 'very_fine': 3, 'fine': 2, 'poor': 1}
+MARKETPLACE_MAP = {'ebay': 1, 'mercari': 2, 'amazon': 3, 'funko_shop': 4}
+DEFAULT_CONDITION_SCORE = 3
+DEFAULT_MARKETPLACE_CODE = 1
+DEFAULT_ESTIMATED_VALUE = 10.0
+# Volatility assumed for a Funko Pop with no sales yet
+DEFAULT_VOLATILITY = 2.0
+PRICE_WINDOWS = (7, 30, 90)
+VOLATILITY_WINDOW = 30
+# Rolling price features a similarity index can seed for Funko Pops with no sales
+SEEDED_PRICE_FEATURES = ['avg_price_7d', 'avg_price_30d', 'avg_price_90d', 'price_volatility_30d']
+
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+def to_epoch_days(values):
+    """Days since 1970-01-01 for ISO strings, dates, datetimes or datetime64 values; NaN when missing"""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        days = values.astype('datetime64[D]')
+    else:
+        # The leading YYYY-MM-DD is all the features need, so timezones are ignored
+        days = np.array(
+            ['NaT' if value is None or value != value else str(value)[:10] for value in values],
+            dtype='datetime64[D]'
+        )
+    epoch_days = days.astype(np.int64).astype(np.float64)
+    epoch_days[np.isnat(days)] = np.nan
+    return epoch_days
+
+
+def _month(epoch_days):
+    months = np.full(len(epoch_days), np.nan)
+    known = ~np.isnan(epoch_days)
+    dates = epoch_days[known].astype(np.int64).astype('datetime64[D]')
+    months[known] = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    return months
+
+
+def _flag(values):
+    return np.array([1.0 if value and value == value else 0.0 for value in values])
+
+
+def _number(values, default):
+    numbers = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    numbers[np.isnan(numbers)] = default
+    return numbers
+
+
+def rows_to_columns(rows, names=FUNKO_COLUMNS):
+    """Dict of columns from a list of row dicts, e.g. Supabase query results"""
+    return {name: [row.get(name) for row in rows] for name in names}
+
+
+def build_category_mapping(values):
+    """Stable value -> code mapping; codes start at 1 so 0 always means unknown"""
+    known = sorted({str(value) for value in values if value is not None and value == value and value != ''})
+    return {value: code for code, value in enumerate(known, start=1)}
+
+
+def encode_categories(values, mapping):
+    """Codes from a saved mapping; unseen or missing values encode as 0"""
+    return np.array([mapping.get(str(value), 0) if value is not None else 0 for value in values], dtype=np.float64)
+
+
+def build_feature_mappings(series, characters):
+    return {
+        'series_mapping': build_category_mapping(series),
+        'character_mapping': build_category_mapping(characters)
+    }
+
+
+def _window_statistics(kth_previous, prior, base_values):
+    """Window means and volatility given kth_previous(k), the k-th most recent earlier price per row.
+
+    Prices are summed most recent first, one offset at a time, so training and
+    serving perform the same float operations in the same order.
+    """
+    columns = {}
+    total = np.zeros(len(prior))
+    for k in range(1, max(PRICE_WINDOWS) + 1):
+        total += np.where(prior >= k, kth_previous(k), 0.0)
+        if k in PRICE_WINDOWS:
+            count = np.minimum(prior, k)
+            columns[f'avg_price_{k}d'] = np.where(count > 0, total / np.maximum(count, 1), base_values)
+
+    count = np.minimum(prior, VOLATILITY_WINDOW)
+    mean = columns[f'avg_price_{VOLATILITY_WINDOW}d']
+    squares = np.zeros(len(prior))
+    for k in range(1, VOLATILITY_WINDOW + 1):
+        squares += np.where(prior >= k, (kth_previous(k) - mean) ** 2, 0.0)
+    columns['price_volatility_30d'] = np.where(
+        count > 0, np.sqrt(squares / np.maximum(count, 1)), DEFAULT_VOLATILITY
+    )
+    return columns
+
+
+def price_window_features(prices, group_ids, base_values):
+    """Rolling price statistics from the sales *before* each row of the same group.
+
+    Rows must be sorted by group and then by sale date. A row with no earlier
+    sales gets its base estimated value and DEFAULT_VOLATILITY.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    group_ids = np.asarray(group_ids)
+    rows = np.arange(len(prices))
+
+    # Position of each row within its group = number of earlier sales available
+    new_group = np.ones(len(prices), dtype=bool)
+    new_group[1:] = group_ids[1:] != group_ids[:-1]
+    prior = rows - np.maximum.accumulate(np.where(new_group, rows, 0))
+
+    return _window_statistics(
+        lambda k: prices[np.maximum(rows - k, 0)], prior, np.asarray(base_values, dtype=np.float64)
+    )
+
+
+def latest_price_features(price_sequences, base_values):
+    """Price statistics for the next sale after each sequence (oldest price first)"""
+    depth = max(PRICE_WINDOWS)
+    # previous[:, k - 1] is the k-th most recent price, zero past the start of the history
+    previous = np.zeros((len(price_sequences), depth))
+    prior = np.zeros(len(price_sequences), dtype=np.int64)
+    for row, sequence in enumerate(price_sequences):
+        recent = np.asarray(sequence[-depth:], dtype=np.float64)[::-1]
+        previous[row, :len(recent)] = recent
+        prior[row] = len(sequence)
+
+    return _window_statistics(
+        lambda k: previous[:, k - 1], prior, np.asarray(base_values, dtype=np.float64)
+    )
+
+
+def static_feature_columns(funkos, feature_mappings):
+    """Funko-level columns (release_ordinal plus the non-price STATIC_FEATURES).
+
+    ``funkos`` is anything indexable by column name: a DataFrame or a dict of lists
+    with release_date, is_chase, is_exclusive, is_vaulted, funko_number, series,
+    character and estimated_value.
+    """
+    release_days = to_epoch_days(funkos['release_date'])
+    return {
+        'release_ordinal': release_days + EPOCH_ORDINAL,
+        'release_month': _month(release_days),
+        'is_chase': _flag(funkos['is_chase']),
+        'is_exclusive': _flag(funkos['is_exclusive']),
+        'is_vaulted': _flag(funkos['is_vaulted']),
+        'funko_number': _number(funkos['funko_number'], 0.0),
+        'series_encoded': encode_categories(funkos['series'], feature_mappings.get('series_mapping', {})),
+        'character_encoded': encode_categories(funkos['character'], feature_mappings.get('character_mapping', {})),
+        'base_estimated_value': _number(funkos['estimated_value'], DEFAULT_ESTIMATED_VALUE)
+    }
+
+
+def engineer_static_matrix(funkos, price_sequences, feature_mappings, similarity_index=None):
+    """STATIC_COLUMNS matrix for many Funko Pops, each with its price history.
+
+    With a similarity_index (features/similarity_index.py), Funko Pops with no
+    sales take their rolling price features from their nearest neighbours
+    instead of the base estimated value.
+    """
+    columns = static_feature_columns(funkos, feature_mappings)
+    columns.update(latest_price_features(price_sequences, columns['base_estimated_value']))
+
+    cold = [row for row, sequence in enumerate(price_sequences) if len(sequence) == 0]
+    if similarity_index is not None and len(similarity_index) and cold:
+        cold_funkos = {name: [funkos[name][row] for row in cold] for name in FUNKO_COLUMNS}
+        seeded = similarity_index.seed_price_features(cold_funkos)
+        for i, name in enumerate(SEEDED_PRICE_FEATURES):
+            columns[name][cold] = seeded[:, i]
+    return assemble_matrix(columns, STATIC_COLUMNS)
+
+
+def sale_feature_columns(release_ordinals, sale_days, conditions, marketplaces):
+    """Date, condition and marketplace columns for a sale (or prediction) on sale_days"""
+    release_days = np.asarray(release_ordinals, dtype=np.float64) - EPOCH_ORDINAL
+    sale_days = np.asarray(sale_days, dtype=np.float64)
+    n = len(release_days)
+    sale_days = np.broadcast_to(sale_days, (n,))
+    day_of_week = (sale_days + 3) % 7  # 1970-01-01 was a Thursday
+
+    return {
+        'days_since_release': sale_days - release_days,
+        'sale_month': _month(sale_days),
+        'sale_day_of_week': day_of_week,
+        'is_weekend_sale': (day_of_week >= 5).astype(np.float64),
+        'condition_score': np.broadcast_to(np.array(
+            [CONDITION_MAP.get(c, DEFAULT_CONDITION_SCORE) for c in np.atleast_1d(conditions)], dtype=np.float64
+        ), (n,)),
+        'marketplace_encoded': np.broadcast_to(np.array(
+            [MARKETPLACE_MAP.get(m, DEFAULT_MARKETPLACE_CODE) for m in np.atleast_1d(marketplaces)], dtype=np.float64
+        ), (n,))
+    }
+
+
+def engineer_request_matrix(static_matrix, sale_days, conditions, marketplaces, feature_names=FEATURE_NAMES):
+    """Full feature matrix from STATIC_COLUMNS rows plus per-row (or scalar) sale inputs"""
+    static_matrix = np.asarray(static_matrix)
+    columns = {name: static_matrix[:, i] for i, name in enumerate(STATIC_COLUMNS)}
+    columns.update(sale_feature_columns(static_matrix[:, 0], sale_days, conditions, marketplaces))
+    return assemble_matrix(columns, feature_names)
+
+
+def engineer_training_matrix(sales, feature_mappings, feature_names=FEATURE_NAMES):
+    """Feature matrix for historical sales joined with their Funko Pop columns.
+
+    ``sales`` must be sorted by funko_pop_id and then date_sold, and also carry
+    price, condition and marketplace. Each row only sees earlier sales of the
+    same Funko Pop, exactly as serving sees the history before a prediction.
+    """
+    columns = static_feature_columns(sales, feature_mappings)
+    columns.update(price_window_features(sales['price'], sales['funko_pop_id'], columns['base_estimated_value']))
+    columns.update(sale_feature_columns(
+        columns['release_ordinal'], to_epoch_days(sales['date_sold']), sales['condition'], sales['marketplace']
+    ))
+    return assemble_matrix(columns, feature_names)
+
+
+def assemble_matrix(columns, names):
+    """Stack named columns into a float32 matrix in the given order"""
+    return np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in names]).astype(np.float32)
+
+
+def today_epoch_days():
+    return datetime.now().date().toordinal() - EPOCH_ORDINAL
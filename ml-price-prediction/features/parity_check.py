@@ -0,0 +1,145 @@
+"""Synthetic catalog and sales for the training/serving parity tests, plus a throughput benchmark.
+
+tests/test_funko_features.py featurizes every synthetic sale the way the data
+pipeline does and rebuilds each row the way the API does (static row from the
+sales before it, plus the sale date, condition and marketplace), through the
+helpers below. history_path_matrix() rebuilds each Funko Pop's last sale through
+the real serving history path: the earlier sales are written to a temporary
+PriceStore and read back with PriceHistoryService.recent_prices().
+
+Run directly, it reports training and serving featurization throughput:
+
+    python parity_check.py --funkos 500 --sales-per-funko 40
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+from funko_features import (
+    CONDITION_MAP, MARKETPLACE_MAP, PRICE_WINDOWS, build_feature_mappings, engineer_request_matrix,
+    engineer_static_matrix, engineer_training_matrix, to_epoch_days
+)
+from price_history import PriceHistoryService
+from price_store import PriceStore, PriceStoreWriter, condition_codes, marketplace_codes
+
+
+def synthetic_data(n_funkos, sales_per_funko, seed):
+    rng = np.random.default_rng(seed)
+    series_names = [f'Series {i}' for i in range(25)] + [None]
+    characters = [f'Character {i}' for i in range(200)] + ['']
+
+    funkos = []
+    for i in range(n_funkos):
+        funkos.append({
+            'id': f'funko-{i:05d}',
+            'release_date': (date(2015, 1, 1) + timedelta(days=int(rng.integers(0, 3000)))).isoformat(),
+            'is_chase': bool(rng.random() < 0.1),
+            'is_exclusive': None if rng.random() < 0.05 else bool(rng.random() < 0.2),
+            'is_vaulted': bool(rng.random() < 0.15),
+            'funko_number': None if rng.random() < 0.05 else int(rng.integers(1, 1500)),
+            'series': series_names[rng.integers(len(series_names))],
+            'character': characters[rng.integers(len(characters))],
+            'estimated_value': None if rng.random() < 0.1 else float(rng.uniform(5, 200))
+        })
+
+    sales = {name: [] for name in ['funko_pop_id', 'price', 'date_sold', 'condition', 'marketplace']}
+    funko_columns = {name: [] for name in funkos[0] if name != 'id'}
+    for funko in funkos:
+        count = int(rng.integers(0, 2 * sales_per_funko))
+        offsets = np.sort(rng.integers(0, 700, count))
+        for offset in offsets:
+            sales['funko_pop_id'].append(funko['id'])
+            # The price store keeps float32 prices, so use prices it stores exactly
+            sales['price'].append(float(np.float32(round(float(rng.uniform(5, 300)), 2))))
+            sales['date_sold'].append(f"{date(2023, 1, 1) + timedelta(days=int(offset))}T12:00:00Z")
+            sales['condition'].append(rng.choice(list(CONDITION_MAP) + ['unknown']))
+            sales['marketplace'].append(rng.choice(list(MARKETPLACE_MAP) + ['unknown']))
+            for name in funko_columns:
+                funko_columns[name].append(funko[name])
+
+    sales.update(funko_columns)
+    return funkos, sales
+
+
+def serving_matrix(sales, feature_mappings, rows=None):
+    """Rebuild training rows through the serving entry points, all in one batch"""
+    ids = sales['funko_pop_id']
+    first_sale = np.zeros(len(ids), dtype=np.int64)
+    for i in range(1, len(ids)):
+        first_sale[i] = first_sale[i - 1] if ids[i] == ids[i - 1] else i
+
+    rows = range(len(ids)) if rows is None else rows
+    funkos = {name: [values[i] for i in rows] for name, values in sales.items()}
+    price_sequences = [sales['price'][first_sale[i]:i] for i in rows]
+
+    static_matrix = engineer_static_matrix(funkos, price_sequences, feature_mappings)
+    return engineer_request_matrix(
+        static_matrix, to_epoch_days(funkos['date_sold']), funkos['condition'], funkos['marketplace']
+    )
+
+
+def history_path_matrix(sales, feature_mappings, store_dir):
+    """Rebuild each Funko Pop's last sale from the earlier sales, read back through the serving history path"""
+    ids = sales['funko_pop_id']
+    last = np.flatnonzero(np.r_[np.array(ids[1:]) != np.array(ids[:-1]), True]) if ids else np.zeros(0, dtype=np.int64)
+    earlier = np.setdiff1d(np.arange(len(ids)), last)
+    timestamps = np.array([
+        int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()) for value in sales['date_sold']
+    ], dtype=np.int64)
+
+    # Small blocks and two appends, so tail reads cross blocks and merge segments
+    writer = PriceStoreWriter(store_dir, block_rows=16)
+    for part in np.array_split(earlier, 2):
+        writer.append(
+            [ids[i] for i in part], timestamps[part], [sales['price'][i] for i in part],
+            marketplace_codes([sales['marketplace'][i] for i in part]),
+            condition_codes([sales['condition'][i] for i in part])
+        )
+
+    history = PriceHistoryService(None, price_store=PriceStore(store_dir))
+    recent_prices = history.recent_prices([ids[i] for i in last], max(PRICE_WINDOWS))
+    funkos = {name: [values[i] for i in last] for name, values in sales.items()}
+    static_matrix = engineer_static_matrix(
+        funkos, [recent_prices[str(ids[i])] for i in last], feature_mappings
+    )
+    return last, engineer_request_matrix(
+        static_matrix, to_epoch_days(funkos['date_sold']), funkos['condition'], funkos['marketplace']
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--funkos", type=int, default=500)
+    parser.add_argument("--sales-per-funko", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    funkos, sales = synthetic_data(args.funkos, args.sales_per_funko, args.seed)
+    mappings = build_feature_mappings([f['series'] for f in funkos], [f['character'] for f in funkos])
+
+    started = time.perf_counter()
+    training = engineer_training_matrix(sales, mappings)
+    training_seconds = time.perf_counter() - started
+
+    # Serving cost: featurize the next sale of every Funko Pop from its full history
+    histories = {}
+    for funko_id, price in zip(sales['funko_pop_id'], sales['price']):
+        histories.setdefault(funko_id, []).append(price)
+    catalog = {name: [f[name] for f in funkos] for name in funkos[0]}
+    started = time.perf_counter()
+    static_matrix = engineer_static_matrix(catalog, [histories.get(f['id'], []) for f in funkos], mappings)
+    engineer_request_matrix(static_matrix, to_epoch_days([date.today()]), ['mint'], ['ebay'])
+    serving_seconds = time.perf_counter() - started
+
+    print(f"training featurization: {len(training) / training_seconds:,.0f} rows/s")
+    print(f"serving featurization:  {len(funkos) / serving_seconds:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
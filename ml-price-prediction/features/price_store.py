@@ -0,0 +1,592 @@
+"""Local columnar store of individual sales (the price_history table), shared by the API and the pipeline.
+
+Layout of a store directory:
+
+    manifest.json              committed row/block/segment counts, generation, ingest watermark
+    gen-000001/delta.u4        seconds since the previous sale of the same Funko Pop (uint32)
+    gen-000001/price.f4        sale price (float32)
+    gen-000001/marketplace.i1  MARKETPLACE_MAP code, 0 when unknown (int8)
+    gen-000001/condition.i1    CONDITION_MAP code, 0 when unknown (int8)
+    gen-000001/anchors.i8      absolute timestamp of every BLOCK_ROWS-th row of a segment (int64)
+    gen-000001/segments.i8     one (funko, start, rows, first_block, first_ts, last_ts) row per segment
+    gen-000001/funkos.txt      Funko Pop ids, one per line; line number is the funko code
+
+Every append writes each Funko Pop's new sales as one time-sorted segment at
+the end of the column files, then commits by replacing manifest.json.
+Readers memory-map the files up to the committed counts, so every API worker
+and the pipeline share one page cache and never see a partial append. A range
+read binary-searches a segment's anchors, then decodes only the blocks that
+overlap the range. compact() rewrites the store as one segment per Funko Pop
+into a new generation.
+
+One writer at a time (an flock on .lock); any number of readers.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from funko_features import CONDITION_MAP, MARKETPLACE_MAP
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PRICE_STORE_DIR = os.getenv('PRICE_STORE_DIR')
+PRICE_STORE_RELOAD_SECONDS = int(os.getenv('PRICE_STORE_RELOAD_SECONDS', '30'))
+
+BLOCK_ROWS = 256
+COLUMNS = {
+    'delta': np.uint32,
+    'price': np.float32,
+    'marketplace': np.int8,
+    'condition': np.int8,
+}
+COLUMN_FILES = {'delta': 'delta.u4', 'price': 'price.f4', 'marketplace': 'marketplace.i1', 'condition': 'condition.i1'}
+ANCHORS_FILE = 'anchors.i8'
+SEGMENTS_FILE = 'segments.i8'
+FUNKOS_FILE = 'funkos.txt'
+SEGMENT_FIELDS = ['funko', 'start', 'rows', 'first_block', 'first_ts', 'last_ts']
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.lock'
+
+DAY_SECONDS = 86400
+WEEK_SECONDS = 7 * DAY_SECONDS
+# date_trunc('week') starts on Monday; 1970-01-05 was the first Monday after the epoch
+WEEK_OFFSET_SECONDS = 4 * DAY_SECONDS
+
+# Scraper sources that are named differently from the marketplace feature values
+SOURCE_ALIASES = {'funko-store': 'funko_shop', 'funko_store': 'funko_shop'}
+MARKETPLACE_NAMES = {code: name for name, code in MARKETPLACE_MAP.items()}
+CONDITION_NAMES = {code: name for name, code in CONDITION_MAP.items()}
+
+
+def marketplace_codes(values):
+    return np.array(
+        [MARKETPLACE_MAP.get(SOURCE_ALIASES.get(value, value), 0) for value in values], dtype=np.int8
+    )
+
+
+def condition_codes(values):
+    return np.array([CONDITION_MAP.get(value, 0) for value in values], dtype=np.int8)
+
+
+def bucket_starts(timestamps, bucket):
+    """Start of the UTC day or (Monday) week containing each timestamp, like date_trunc"""
+    if bucket == 'day':
+        return timestamps // DAY_SECONDS * DAY_SECONDS
+    return (timestamps - WEEK_OFFSET_SECONDS) // WEEK_SECONDS * WEEK_SECONDS + WEEK_OFFSET_SECONDS
+
+
+def _read_manifest(store_dir):
+    try:
+        with open(os.path.join(store_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _map(path, dtype, count, width=None):
+    """Read-only memory map of the first count rows of a raw column file"""
+    shape = (count,) if width is None else (count, width)
+    if count == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+
+class _StoreView:
+    """One committed state of the store: mapped columns plus the per-funko segment index. Never mutated."""
+
+    def __init__(self, store_dir, manifest, previous=None):
+        self.manifest = manifest
+        self.block_rows = manifest['block_rows']
+        self.generation_dir = os.path.join(store_dir, manifest['generation_dir'])
+        rows, blocks, segments = manifest['rows'], manifest['blocks'], manifest['segments']
+        self.columns = {
+            name: _map(os.path.join(self.generation_dir, COLUMN_FILES[name]), dtype, rows)
+            for name, dtype in COLUMNS.items()
+        }
+        self.anchors = _map(os.path.join(self.generation_dir, ANCHORS_FILE), np.int64, blocks)
+        self.segments = _map(os.path.join(self.generation_dir, SEGMENTS_FILE), np.int64, segments, len(SEGMENT_FIELDS))
+
+        # After an append to the same generation only the new funkos and segments need indexing
+        same_generation = previous is not None and previous.manifest['generation'] == manifest['generation']
+        self.funko_ids = list(previous.funko_ids) if same_generation else []
+        self.segments_of = {key: list(value) for key, value in previous.segments_of.items()} if same_generation else {}
+        first_segment = previous.manifest['segments'] if same_generation else 0
+
+        if manifest['funkos'] > len(self.funko_ids):
+            with open(os.path.join(self.generation_dir, FUNKOS_FILE)) as f:
+                lines = f.read().splitlines()
+            self.funko_ids.extend(lines[len(self.funko_ids):manifest['funkos']])
+        for segment, funko in enumerate(self.segments[first_segment:, 0].tolist(), start=first_segment):
+            self.segments_of.setdefault(self.funko_ids[funko], []).append(segment)
+
+    def read_segment(self, segment, start_ts, end_ts):
+        """Rows of one segment with start_ts <= timestamp < end_ts (None for unbounded)"""
+        _, start, rows, first_block, first_ts, last_ts = self.segments[segment].tolist()
+        if (start_ts is not None and last_ts < start_ts) or (end_ts is not None and first_ts >= end_ts):
+            return None
+
+        block_rows = self.block_rows
+        anchors = self.anchors[first_block:first_block + (rows + block_rows - 1) // block_rows]
+        # Last block starting before start_ts (ties may spill back from the next block), then every
+        # block starting before end_ts
+        lo_block = max(int(np.searchsorted(anchors, start_ts, side='left')) - 1, 0) if start_ts is not None else 0
+        hi_block = int(np.searchsorted(anchors, end_ts, side='left')) if end_ts is not None else len(anchors)
+        lo, hi = start + lo_block * block_rows, min(start + hi_block * block_rows, start + rows)
+
+        # Deltas run continuously through a segment, so one anchor decodes the whole span
+        deltas = np.cumsum(self.columns['delta'][lo:hi], dtype=np.int64)
+        timestamps = anchors[lo_block] + deltas - deltas[0]
+        keep = slice(
+            int(np.searchsorted(timestamps, start_ts, side='left')) if start_ts is not None else 0,
+            int(np.searchsorted(timestamps, end_ts, side='left')) if end_ts is not None else len(timestamps)
+        )
+        return {
+            'timestamps': timestamps[keep],
+            'prices': np.asarray(self.columns['price'][lo:hi][keep]),
+            'marketplace': np.asarray(self.columns['marketplace'][lo:hi][keep]),
+            'condition': np.asarray(self.columns['condition'][lo:hi][keep]),
+        }
+
+    def read_tail(self, segment, limit):
+        """The last ``limit`` rows of one segment, i.e. its most recent sales"""
+        _, start, rows, first_block, _, _ = self.segments[segment].tolist()
+        lo_block = max(rows - limit, 0) // self.block_rows
+        lo, hi = start + lo_block * self.block_rows, start + rows
+
+        deltas = np.cumsum(self.columns['delta'][lo:hi], dtype=np.int64)
+        timestamps = self.anchors[first_block + lo_block] + deltas - deltas[0]
+        keep = slice(max(len(timestamps) - limit, 0), None)
+        return {
+            'timestamps': timestamps[keep],
+            'prices': np.asarray(self.columns['price'][lo:hi][keep]),
+            'marketplace': np.asarray(self.columns['marketplace'][lo:hi][keep]),
+            'condition': np.asarray(self.columns['condition'][lo:hi][keep]),
+        }
+
+    def decode_all(self):
+        """Every row, with its funko code and absolute timestamp (for compaction and full scans)"""
+        segments = np.asarray(self.segments)
+        rows = len(self.columns['delta'])
+        funko_codes = np.repeat(segments[:, 0], segments[:, 2])
+        # Absolute timestamp = the row's block anchor plus the deltas since that block started
+        block_rows = self.block_rows
+        block_counts = (segments[:, 2] + block_rows - 1) // block_rows
+        block_starts = np.repeat(segments[:, 1], block_counts) + block_rows * (
+            np.arange(block_counts.sum()) - np.repeat(np.cumsum(block_counts) - block_counts, block_counts)
+        )
+        row_blocks = np.repeat(np.arange(len(block_starts)), np.diff(np.append(block_starts, rows)))
+        # Blocks are laid out segment by segment, in row order, so block_starts is sorted
+        cumulative = np.cumsum(self.columns['delta'], dtype=np.int64)
+        timestamps = np.asarray(self.anchors)[row_blocks] + cumulative - cumulative[block_starts][row_blocks]
+        return funko_codes, timestamps, {name: np.asarray(column) for name, column in self.columns.items()}
+
+
+class PriceStore:
+    """Read side: range reads and day/week buckets per Funko Pop.
+
+    The manifest is re-checked at most every ``reload_interval`` seconds, so
+    appends and compactions are picked up without restarting.
+    """
+
+    def __init__(self, store_dir, reload_interval=PRICE_STORE_RELOAD_SECONDS):
+        self.store_dir = store_dir
+        self.reload_interval = reload_interval
+        self._view = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._maybe_reload(force=True)
+
+    def __len__(self):
+        view = self._view
+        return view.manifest['rows'] if view is not None else 0
+
+    @property
+    def watermark(self):
+        view = self._view
+        return view.manifest.get('watermark') if view is not None else None
+
+    def read(self, funko_pop_id, start_ts=None, end_ts=None):
+        """Sales of one Funko Pop with start_ts <= timestamp < end_ts, oldest first.
+
+        Returns {'timestamps' (int64 epoch seconds), 'prices' (float32),
+        'marketplace', 'condition' (int8 codes)}.
+        """
+        self._maybe_reload()
+        view = self._view
+        parts = []
+        if view is not None:
+            for segment in view.segments_of.get(str(funko_pop_id), ()):
+                part = view.read_segment(segment, start_ts, end_ts)
+                if part is not None and len(part['timestamps']):
+                    parts.append(part)
+        return self._merge(parts)
+
+    def recent(self, funko_pop_id, limit):
+        """The last ``limit`` sales of one Funko Pop, oldest first, laid out like read()"""
+        self._maybe_reload()
+        view = self._view
+        parts = []
+        if view is not None and limit > 0:
+            # Segments can overlap in time, so take each one's tail and cut the merged result
+            parts = [view.read_tail(segment, limit) for segment in view.segments_of.get(str(funko_pop_id), ())]
+        merged = self._merge([part for part in parts if len(part['timestamps'])])
+        return {name: values[max(len(values) - limit, 0):] for name, values in merged.items()}
+
+    @staticmethod
+    def _merge(parts):
+        if not parts:
+            return {
+                'timestamps': np.empty(0, dtype=np.int64), 'prices': np.empty(0, dtype=np.float32),
+                'marketplace': np.empty(0, dtype=np.int8), 'condition': np.empty(0, dtype=np.int8)
+            }
+        if len(parts) == 1:
+            return parts[0]
+
+        # Later appends can hold older sales (late scrapes), so merge segments by time
+        merged = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        order = np.argsort(merged['timestamps'], kind='stable')
+        return {name: values[order] for name, values in merged.items()}
+
+    def buckets(self, funko_pop_id, start_ts, bucket='day'):
+        """Day or week aggregates since start_ts, shaped like the price_history_buckets RPC rows"""
+        sales = self.read(funko_pop_id, start_ts)
+        if len(sales['timestamps']) == 0:
+            return []
+
+        starts = bucket_starts(sales['timestamps'], bucket)
+        bucket_ts, first = np.unique(starts, return_index=True)
+        prices = sales['prices'].astype(np.float64)
+        counts = np.diff(np.append(first, len(prices)))
+        sums = np.add.reduceat(prices, first)
+        return [
+            {
+                'ts': int(ts), 'sale_count': int(count), 'avg_price': total / count,
+                'min_price': float(low), 'max_price': float(high),
+                'sum_price': float(total), 'sum_price_sq': float(squares)
+            }
+            for ts, count, total, squares, low, high in zip(
+                bucket_ts.tolist(), counts.tolist(), sums.tolist(),
+                np.add.reduceat(prices * prices, first).tolist(),
+                np.minimum.reduceat(prices, first), np.maximum.reduceat(prices, first)
+            )
+        ]
+
+    def to_columns(self):
+        """Every sale as columns (funko_pop_id, price, date_sold, condition, marketplace), ordered by funko and time"""
+        self._maybe_reload()
+        view = self._view
+        if view is None or view.manifest['rows'] == 0:
+            return {name: [] for name in ['funko_pop_id', 'price', 'date_sold', 'condition', 'marketplace']}
+
+        funko_codes, timestamps, columns = view.decode_all()
+        order = np.lexsort((timestamps, funko_codes))
+        funko_ids = np.array(view.funko_ids, dtype=object)
+        return {
+            'funko_pop_id': funko_ids[funko_codes[order]],
+            'price': columns['price'][order].astype(np.float64),
+            'date_sold': timestamps[order].astype('datetime64[s]'),
+            'condition': np.array([CONDITION_NAMES.get(code) for code in range(6)], dtype=object)[
+                columns['condition'][order]],
+            'marketplace': np.array([MARKETPLACE_NAMES.get(code) for code in range(5)], dtype=object)[
+                columns['marketplace'][order]],
+        }
+
+    def _maybe_reload(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+
+        with self._lock:
+            if not force and now < self._next_check:
+                return
+            self._next_check = now + self.reload_interval
+
+            try:
+                manifest = _read_manifest(self.store_dir)
+                if manifest is None:
+                    return
+                current = self._view
+                if current is not None and manifest['commit'] == current.manifest['commit']:
+                    return
+                # Swap one reference; in-flight reads keep the view they started with
+                self._view = _StoreView(self.store_dir, manifest, current)
+            except Exception as e:
+                logger.error(f"Failed to load price store: {e}")
+                return
+            logger.info(
+                f"Loaded price store generation {manifest['generation']} "
+                f"({manifest['rows']} sales, {manifest['funkos']} funkos, {manifest['segments']} segments)"
+            )
+
+
+class PriceStoreWriter:
+    """Append-only ingestion and compaction for a PriceStore directory"""
+
+    def __init__(self, store_dir, block_rows=BLOCK_ROWS):
+        self.store_dir = store_dir
+        self.block_rows = block_rows
+        os.makedirs(store_dir, exist_ok=True)
+
+    def append(self, funko_pop_ids, timestamps, prices, marketplaces, conditions, watermark=None):
+        """Append sales (any order) as one new segment per Funko Pop; returns the rows written.
+
+        ``timestamps`` are epoch seconds; ``marketplaces`` and ``conditions`` are int8
+        codes (see marketplace_codes / condition_codes). ``watermark`` is stored in the
+        manifest for incremental ingestion.
+        """
+        with self._locked():
+            manifest = _read_manifest(self.store_dir) or self._empty_manifest(1, self.block_rows)
+            rows = self._write(manifest, funko_pop_ids, timestamps, prices, marketplaces, conditions)
+            if rows or watermark is not None:
+                self._commit(manifest, watermark)
+            return rows
+
+    def compact(self):
+        """Rewrite the store as one segment per Funko Pop into a new generation"""
+        with self._locked():
+            manifest = _read_manifest(self.store_dir)
+            if manifest is None:
+                return None
+
+            view = _StoreView(self.store_dir, manifest)
+            funko_codes, timestamps, columns = view.decode_all()
+            compacted = self._empty_manifest(manifest['generation'] + 1, self.block_rows)
+            compacted['watermark'] = manifest.get('watermark')
+            compacted['commit'] = manifest['commit']
+            self._write(
+                compacted, np.array(view.funko_ids, dtype=object)[funko_codes], timestamps,
+                columns['price'], columns['marketplace'], columns['condition']
+            )
+            self._commit(compacted, None)
+
+            # Keep the previous generation for readers that have not reloaded yet
+            keep = {manifest['generation_dir'], compacted['generation_dir']}
+            for name in os.listdir(self.store_dir):
+                if name.startswith('gen-') and name not in keep:
+                    for file_name in os.listdir(os.path.join(self.store_dir, name)):
+                        os.remove(os.path.join(self.store_dir, name, file_name))
+                    os.rmdir(os.path.join(self.store_dir, name))
+            logger.info(f"Compacted price store: {manifest['segments']} -> {compacted['segments']} segments")
+            return compacted
+
+    def _locked(self):
+        return _FileLock(os.path.join(self.store_dir, LOCK_NAME))
+
+    @staticmethod
+    def _empty_manifest(generation, block_rows):
+        return {
+            'generation': generation, 'generation_dir': f'gen-{generation:06d}', 'commit': 0,
+            'block_rows': block_rows, 'rows': 0, 'blocks': 0, 'segments': 0, 'funkos': 0, 'watermark': None
+        }
+
+    def _write(self, manifest, funko_pop_ids, timestamps, prices, marketplaces, conditions):
+        """Append the sales to the generation's files and advance the counts in ``manifest`` (not yet committed)"""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if len(timestamps) == 0:
+            return 0
+        generation_dir = os.path.join(self.store_dir, manifest['generation_dir'])
+        os.makedirs(generation_dir, exist_ok=True)
+        self._truncate_uncommitted(generation_dir, manifest)
+
+        # Funko codes: existing ones from funkos.txt, new ones appended
+        funkos_path = os.path.join(generation_dir, FUNKOS_FILE)
+        known = []
+        if manifest['funkos']:
+            with open(funkos_path) as f:
+                known = f.read().splitlines()[:manifest['funkos']]
+        code_of = {funko_pop_id: code for code, funko_pop_id in enumerate(known)}
+        ids = [str(funko_pop_id) for funko_pop_id in funko_pop_ids]
+        new_ids = list(dict.fromkeys(funko_pop_id for funko_pop_id in ids if funko_pop_id not in code_of))
+        for funko_pop_id in new_ids:
+            code_of[funko_pop_id] = len(code_of)
+        codes = np.array([code_of[funko_pop_id] for funko_pop_id in ids], dtype=np.int64)
+
+        # Sort by (funko, time): each run of one funko becomes a segment
+        order = np.lexsort((timestamps, codes))
+        codes, timestamps = codes[order], timestamps[order]
+        group_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        group_rows = np.diff(np.append(group_starts, len(codes)))
+        position = np.arange(len(codes)) - np.repeat(group_starts, group_rows)
+
+        deltas = np.diff(timestamps, prepend=timestamps[0])
+        deltas[group_starts] = 0
+        # An append continues the store's block size; compaction may pick a new one
+        block_rows = manifest['block_rows']
+        is_anchor = position % block_rows == 0
+        group_blocks = (group_rows + block_rows - 1) // block_rows
+
+        segments = np.column_stack([
+            codes[group_starts],
+            manifest['rows'] + group_starts,
+            group_rows,
+            manifest['blocks'] + np.cumsum(group_blocks) - group_blocks,
+            timestamps[group_starts],
+            timestamps[group_starts + group_rows - 1],
+        ]).astype(np.int64)
+
+        payloads = {
+            COLUMN_FILES['delta']: deltas.astype(np.uint32),
+            COLUMN_FILES['price']: np.asarray(prices, dtype=np.float32)[order],
+            COLUMN_FILES['marketplace']: np.asarray(marketplaces, dtype=np.int8)[order],
+            COLUMN_FILES['condition']: np.asarray(conditions, dtype=np.int8)[order],
+            ANCHORS_FILE: timestamps[is_anchor],
+            SEGMENTS_FILE: segments,
+        }
+        for name, values in payloads.items():
+            with open(os.path.join(generation_dir, name), 'ab') as f:
+                f.write(np.ascontiguousarray(values).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        if new_ids:
+            with open(funkos_path, 'a') as f:
+                f.write(''.join(f'{funko_pop_id}\n' for funko_pop_id in new_ids))
+                f.flush()
+                os.fsync(f.fileno())
+
+        manifest['rows'] += len(codes)
+        manifest['blocks'] += int(is_anchor.sum())
+        manifest['segments'] += len(group_starts)
+        manifest['funkos'] += len(new_ids)
+        return len(codes)
+
+    def _truncate_uncommitted(self, generation_dir, manifest):
+        """Drop bytes a crashed writer appended after the last commit"""
+        sizes = {
+            **{COLUMN_FILES[name]: manifest['rows'] * np.dtype(dtype).itemsize for name, dtype in COLUMNS.items()},
+            ANCHORS_FILE: manifest['blocks'] * 8,
+            SEGMENTS_FILE: manifest['segments'] * 8 * len(SEGMENT_FIELDS),
+        }
+        for name, size in sizes.items():
+            path = os.path.join(generation_dir, name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+        funkos_path = os.path.join(generation_dir, FUNKOS_FILE)
+        if os.path.exists(funkos_path):
+            with open(funkos_path) as f:
+                lines = f.read().splitlines()
+            if len(lines) > manifest['funkos']:
+                with open(funkos_path, 'w') as f:
+                    f.write(''.join(f'{line}\n' for line in lines[:manifest['funkos']]))
+
+    def _commit(self, manifest, watermark):
+        manifest['commit'] += 1
+        if watermark is not None:
+            manifest['watermark'] = watermark
+        manifest['updated_at'] = datetime.now(timezone.utc).isoformat()
+        path = os.path.join(self.store_dir, MANIFEST_NAME)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(manifest, f)
+        # Readers only trust counts from the manifest, so swapping it is the commit
+        os.replace(f'{path}.tmp', path)
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'w')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+def _parse_timestamps(values):
+    return np.array(
+        [int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()) for value in values], dtype=np.int64
+    )
+
+
+def _after(cursor):
+    """PostgREST filter for rows after a (created_at, id) keyset cursor"""
+    created_at, row_id = cursor['created_at'], cursor['id']
+    return f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt.{row_id})'
+
+
+def ingest_price_history(writer, supabase_client, page_size=10000):
+    """Append price_history rows inserted after the store's watermark; returns the rows added.
+
+    Pages through the table by (created_at, id), the order rows were inserted in,
+    and commits after each page with that page's last key as the watermark. Late
+    scrapes with an older date_scraped are still picked up, rows sharing a
+    created_at are split across pages by id, and an interrupted ingest resumes
+    right after the last committed row.
+    """
+    watermark = (_read_manifest(writer.store_dir) or {}).get('watermark')
+    if isinstance(watermark, str):
+        # Stores ingested by date_scraped: resume at that time. Sales cleaning drops
+        # the few rows read twice
+        watermark = {'created_at': watermark, 'id': '00000000-0000-0000-0000-000000000000'}
+    total = 0
+    while True:
+        query = supabase_client.table('price_history').select(
+            'id, funko_pop_id, price, source, condition, date_scraped, created_at'
+        )
+        if watermark:
+            query = query.or_(_after(watermark))
+        page = query.order('created_at').order('id').limit(page_size).execute().data or []
+        if not page:
+            break
+
+        watermark = {'created_at': page[-1]['created_at'], 'id': page[-1]['id']}
+        rows = [row for row in page if row.get('price') is not None and row.get('funko_pop_id')]
+        total += writer.append(
+            [row['funko_pop_id'] for row in rows],
+            _parse_timestamps([row['date_scraped'] for row in rows]),
+            [float(row['price']) for row in rows],
+            marketplace_codes([row.get('source') for row in rows]),
+            condition_codes([row.get('condition') for row in rows]),
+            watermark=watermark
+        )
+        logger.info(f"Ingested {total} sales up to {watermark['created_at']}")
+        if len(page) < page_size:
+            break
+    return total
+
+
+def create_price_store(store_dir=PRICE_STORE_DIR):
+    """Open the price store configured by PRICE_STORE_DIR, if any"""
+    if not store_dir or _read_manifest(store_dir) is None:
+        return None
+    return PriceStore(store_dir)
+
+
+def main():
+    """Ingest new price_history rows from Supabase, or compact the store"""
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=['ingest', 'compact'])
+    parser.add_argument("--store-dir", type=str, default=PRICE_STORE_DIR)
+    parser.add_argument("--page-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    if not args.store_dir:
+        raise ValueError("Set PRICE_STORE_DIR or pass --store-dir")
+
+    writer = PriceStoreWriter(args.store_dir)
+    if args.command == 'ingest':
+        from supabase import create_client
+
+        supabase_client = create_client(
+            os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
+        )
+        logger.info(f"✅ Ingested {ingest_price_history(writer, supabase_client, args.page_size)} sales")
+    else:
+        writer.compact()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,115 @@
+"""Vectorized cleaning of scraped sales before feature engineering.
+
+Marketplace scrapes see the same listing more than once, mis-scaled prices
+(wrong currency, cents read as dollars) and missing conditions. clean_sales()
+runs on the whole sales frame at once:
+
+- rows without a Funko Pop, a parseable date or a positive price are dropped
+- condition and marketplace labels are normalized ("Near Mint" -> near_mint);
+  labels that are still unknown become None and get the default condition
+  score in funko_features, so they are counted rather than dropped
+- duplicates are dropped by a 64-bit hash of (funko, marketplace, price in
+  cents, date_sold bucket), keeping the first sale
+- outliers are dropped per Funko Pop by a robust z-score of log price against
+  that Funko's median and MAD. Funko Pops are factorized once, and one sort
+  by (funko, log price) gives every group's median and MAD without a Python
+  loop over groups
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from funko_features import CONDITION_MAP, MARKETPLACE_MAP
+
+# Configuration
+SALES_DEDUP_BUCKET_SECONDS = int(os.getenv('SALES_DEDUP_BUCKET_SECONDS', '3600'))
+SALES_OUTLIER_MAX_Z = float(os.getenv('SALES_OUTLIER_MAX_Z', '3.5'))
+SALES_OUTLIER_MIN_SALES = int(os.getenv('SALES_OUTLIER_MIN_SALES', '5'))  # fewer sales: no outlier test
+
+# MAD floor in log-price units (~5%), so Funko Pops that always sell at one price keep small moves
+MIN_LOG_SPREAD = 0.05
+# Scales the MAD to a standard deviation for normal data (Iglewicz and Hoaglin)
+MAD_SCALE = 0.6745
+
+
+def normalize_labels(values, known):
+    """Lower-case snake_case labels; anything not in known becomes None"""
+    # Scrapes repeat a handful of spellings, so only the distinct ones go through the string ops
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    labels = pd.Series(uniques, dtype=object).str.strip().str.lower().str.replace(r'[\s-]+', '_', regex=True)
+    labels = np.append(labels.where(labels.isin(list(known)), None).to_numpy(dtype=object), None)
+    return pd.Series(labels[codes], dtype=object)  # code -1 (missing) picks the trailing None
+
+
+def group_medians(codes, values, n_groups):
+    """Median of values per group code, from one (code, value) sort"""
+    if len(values) == 0:
+        return np.full(n_groups, np.nan)
+    order = np.lexsort((values, codes))
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ordered = values[order]
+    low = ordered[np.minimum(starts + (counts - 1) // 2, len(ordered) - 1)]
+    high = ordered[np.minimum(starts + counts // 2, len(ordered) - 1)]
+    return np.where(counts > 0, (low + high) / 2, np.nan)
+
+
+def sale_keys(funko_codes, marketplaces, cents, buckets):
+    """64-bit hash per sale of (funko, marketplace, price in cents, time bucket)"""
+    return pd.util.hash_pandas_object(pd.DataFrame({
+        'funko': funko_codes, 'marketplace': marketplaces, 'cents': cents, 'bucket': buckets
+    }), index=False).values
+
+
+def clean_sales(sales, bucket_seconds=SALES_DEDUP_BUCKET_SECONDS, max_z=SALES_OUTLIER_MAX_Z,
+                min_sales=SALES_OUTLIER_MIN_SALES):
+    """Clean a sales frame (funko_pop_id, price, date_sold, condition, marketplace).
+
+    Returns the cleaned frame, in input order with a fresh index, and a report
+    of how many rows each step dropped.
+    """
+    report = {'input_rows': len(sales)}
+
+    dates = pd.to_datetime(sales['date_sold'], errors='coerce')
+    if getattr(dates.dt, 'tz', None) is not None:
+        dates = dates.dt.tz_convert(None)
+    prices = pd.to_numeric(sales['price'], errors='coerce').to_numpy(dtype=np.float64)
+
+    valid = sales['funko_pop_id'].notna().to_numpy() & dates.notna().to_numpy() & np.isfinite(prices) & (prices > 0)
+    report['invalid'] = int((~valid).sum())
+    sales = sales.loc[valid].assign(
+        date_sold=dates[valid].values,
+        price=prices[valid],
+        condition=normalize_labels(sales['condition'][valid].values, CONDITION_MAP).values,
+        marketplace=normalize_labels(sales['marketplace'][valid].values, MARKETPLACE_MAP).values
+    )
+    report['unknown_condition'] = int(sales['condition'].isna().sum())
+    report['unknown_marketplace'] = int(sales['marketplace'].isna().sum())
+
+    funko_codes, funko_ids = pd.factorize(sales['funko_pop_id'])
+    prices = sales['price'].to_numpy()
+    seconds = sales['date_sold'].to_numpy().astype('datetime64[s]').astype(np.int64)
+
+    keys = sale_keys(
+        funko_codes, sales['marketplace'].fillna('').to_numpy(), np.round(prices * 100).astype(np.int64),
+        seconds // bucket_seconds
+    )
+    keep = ~pd.Series(keys).duplicated().to_numpy()
+    report['duplicates'] = int((~keep).sum())
+
+    # Outlier statistics come from the deduplicated sales only, so re-scrapes don't weight them
+    log_prices = np.log(prices)
+    n_groups = len(funko_ids)
+    medians = group_medians(funko_codes[keep], log_prices[keep], n_groups)
+    deviations = np.abs(log_prices - medians[funko_codes])
+    mads = np.maximum(group_medians(funko_codes[keep], deviations[keep], n_groups), MIN_LOG_SPREAD)
+    robust_z = MAD_SCALE * deviations / mads[funko_codes]
+    enough_sales = np.bincount(funko_codes[keep], minlength=n_groups)[funko_codes] >= min_sales
+    outlier = keep & enough_sales & (robust_z > max_z)
+    report['outliers'] = int(outlier.sum())
+
+    cleaned = sales.loc[keep & ~outlier].reset_index(drop=True)
+    report['output_rows'] = len(cleaned)
+    report['dropped_rows'] = report['input_rows'] - report['output_rows']
+    return cleaned, report
@@ -0,0 +1,198 @@
+"""Nearest-neighbour index over Funko Pop attributes for cold-start pricing.
+
+A Funko Pop with no sales has no rolling price features of its own. The index
+holds every Funko Pop that does have history as a row of attribute arrays
+(series and character codes plus scaled number, flags and release date) next
+to its latest rolling price features. A brute-force scan over those arrays
+finds the k most similar Funko Pops in well under a millisecond for catalogs of
+tens of thousands, and their prices seed the cold-start features.
+
+The pipeline updates the index in place each run (changed rows are overwritten,
+new ones appended) and publishes it with the model artifacts.
+"""
+import io
+
+import numpy as np
+
+from funko_features import (
+    DEFAULT_ESTIMATED_VALUE, FUNKO_COLUMNS, SEEDED_PRICE_FEATURES, _flag, _number,
+    latest_price_features, to_epoch_days
+)
+
+DEFAULT_NEIGHBOURS = 5
+
+# Distance is a weighted L1 over attributes, each term capped at its weight.
+# Exact matches on series and character matter most.
+SERIES_WEIGHT = 4.0
+CHARACTER_WEIGHT = 3.0
+NUMERIC_ATTRIBUTES = ['funko_number', 'is_chase', 'is_exclusive', 'is_vaulted', 'release_years']
+NUMERIC_SCALES = np.array([100.0, 1.0, 1.0, 1.0, 5.0], dtype=np.float32)
+NUMERIC_WEIGHTS = np.array([1.0, 2.0, 1.0, 1.0, 2.0], dtype=np.float32)
+
+
+def _numeric_attributes(funkos):
+    """(n, len(NUMERIC_ATTRIBUTES)) float32 matrix, pre-divided by NUMERIC_SCALES; NaN for unknown dates"""
+    release_years = to_epoch_days(funkos['release_date']) / 365.25
+    numbers = _number(funkos['funko_number'], np.nan)
+    return (np.column_stack([
+        numbers, _flag(funkos['is_chase']), _flag(funkos['is_exclusive']),
+        _flag(funkos['is_vaulted']), release_years
+    ]) / NUMERIC_SCALES).astype(np.float32)
+
+
+class SimilarityIndex:
+    """Array-backed k-NN index from Funko Pop attributes to rolling price features"""
+
+    def __init__(self, capacity=1024):
+        self.ids = []
+        self._rows = {}
+        self._vocabularies = {'series': {}, 'character': {}}
+        self._series = np.zeros(capacity, dtype=np.int32)
+        self._character = np.zeros(capacity, dtype=np.int32)
+        # One contiguous array per attribute, so a query scans each with cheap vector ops
+        self._numeric = np.zeros((len(NUMERIC_ATTRIBUTES), capacity), dtype=np.float32)
+        self._prices = np.zeros((capacity, len(SEEDED_PRICE_FEATURES)), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _codes(self, name, values, add):
+        vocabulary = self._vocabularies[name]
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            if value is None or value != value or value == '':
+                codes[i] = -1  # unknown never matches, not even another unknown
+                continue
+            code = vocabulary.get(str(value))
+            if code is None and add:
+                code = vocabulary[str(value)] = len(vocabulary)
+            codes[i] = -1 if code is None else code
+        return codes
+
+    def _grow(self, size):
+        capacity = len(self._series)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        for name in ('_series', '_character', '_prices'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        numeric = np.zeros((len(NUMERIC_ATTRIBUTES), capacity), dtype=np.float32)
+        numeric[:, :self._numeric.shape[1]] = self._numeric
+        self._numeric = numeric
+
+    def update(self, funko_pop_ids, funkos, price_sequences):
+        """Insert or overwrite the Funko Pops that have sales; returns (added, updated) counts.
+
+        ``funkos`` holds FUNKO_COLUMNS lists aligned with the ids and
+        ``price_sequences`` each Funko Pop's prices, oldest first.
+        """
+        selected = [i for i, sequence in enumerate(price_sequences) if len(sequence)]
+        if not selected:
+            return 0, 0
+        funko_pop_ids = [funko_pop_ids[i] for i in selected]
+        funkos = {name: [funkos[name][i] for i in selected] for name in FUNKO_COLUMNS}
+        price_columns = latest_price_features(
+            [price_sequences[i] for i in selected],
+            _number(funkos['estimated_value'], DEFAULT_ESTIMATED_VALUE)
+        )
+
+        rows = np.empty(len(funko_pop_ids), dtype=np.int64)
+        added = 0
+        for i, funko_pop_id in enumerate(funko_pop_ids):
+            funko_pop_id = str(funko_pop_id)
+            row = self._rows.get(funko_pop_id)
+            if row is None:
+                row = self._rows[funko_pop_id] = len(self.ids)
+                self.ids.append(funko_pop_id)
+                added += 1
+            rows[i] = row
+
+        self._grow(len(self.ids))
+        self._series[rows] = self._codes('series', funkos['series'], add=True)
+        self._character[rows] = self._codes('character', funkos['character'], add=True)
+        self._numeric[:, rows] = _numeric_attributes(funkos).T
+        self._prices[rows] = np.column_stack([price_columns[name] for name in SEEDED_PRICE_FEATURES])
+        return added, len(rows) - added
+
+    def distances(self, series_code, character_code, numeric):
+        """Distance from one query (codes plus a scaled numeric row) to every indexed row"""
+        n = len(self.ids)
+        distance = SERIES_WEIGHT * (self._series[:n] != series_code).astype(np.float32)
+        distance += CHARACTER_WEIGHT * (self._character[:n] != character_code)
+        term = np.empty(n, dtype=np.float32)
+        for column, value in enumerate(numeric):
+            if np.isnan(value):
+                continue  # unknown on the query side: the attribute is ignored
+            # |row - query| capped at 1; fmin turns unknown row values into the cap
+            np.subtract(self._numeric[column, :n], value, out=term)
+            np.abs(term, out=term)
+            np.fmin(term, 1.0, out=term)
+            term *= NUMERIC_WEIGHTS[column]
+            distance += term
+        return distance
+
+    def _nearest(self, series_code, character_code, numeric, k):
+        distance = self.distances(series_code, character_code, numeric)
+        k = min(k, len(distance))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows = np.argpartition(distance, k - 1)[:k]
+        rows = rows[np.argsort(distance[rows], kind='stable')]
+        return rows, distance[rows]
+
+    def seed_price_features(self, funkos, k=DEFAULT_NEIGHBOURS):
+        """(n, len(SEEDED_PRICE_FEATURES)) neighbour-weighted price features; NaN rows when the index is empty"""
+        series = self._codes('series', funkos['series'], add=False)
+        characters = self._codes('character', funkos['character'], add=False)
+        numeric = _numeric_attributes(funkos)
+
+        seeded = np.full((len(series), len(SEEDED_PRICE_FEATURES)), np.nan)
+        if not self.ids:
+            return seeded
+        for i in range(len(series)):
+            rows, distance = self._nearest(series[i], characters[i], numeric[i], k)
+            weights = 1.0 / (1.0 + distance.astype(np.float64))
+            seeded[i] = weights @ self._prices[rows] / weights.sum()
+        return seeded
+
+    def to_bytes(self):
+        n = len(self.ids)
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            ids=np.array(self.ids, dtype=str),
+            series=self._series[:n], character=self._character[:n],
+            numeric=self._numeric[:, :n], prices=self._prices[:n],
+            series_vocabulary=np.array(list(self._vocabularies['series']), dtype=str),
+            character_vocabulary=np.array(list(self._vocabularies['character']), dtype=str)
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, payload):
+        arrays = np.load(io.BytesIO(payload), allow_pickle=False)
+        index = cls(capacity=max(len(arrays['ids']), 1))
+        index.ids = arrays['ids'].tolist()
+        index._rows = {funko_pop_id: row for row, funko_pop_id in enumerate(index.ids)}
+        for name in ('series', 'character'):
+            index._vocabularies[name] = {
+                value: code for code, value in enumerate(arrays[f'{name}_vocabulary'].tolist())
+            }
+        n = len(index.ids)
+        index._series[:n] = arrays['series']
+        index._character[:n] = arrays['character']
+        index._numeric[:, :n] = arrays['numeric']
+        index._prices[:n] = arrays['prices']
+        return index
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
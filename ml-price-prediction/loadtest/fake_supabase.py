@@ -0,0 +1,216 @@
+"""In-memory Supabase stand-in with a synthetic catalog and price history.
+
+Covers the calls the API and batch scorer make: funko_pops queries (select, eq,
+in_, gt, order, range, limit), the price_history_buckets RPC and the
+recent_sale_prices RPC. Data is generated deterministically from the seed, so
+runs are comparable.
+"""
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+SERIES = ['Marvel', 'Star Wars', 'Disney', 'Harry Potter', 'DC Comics', 'Anime', 'Games', 'Movies', 'Television']
+RARITIES = ['common', 'uncommon', 'rare', 'ultra_rare']
+SECONDS_PER_DAY = 86400
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """Chainable query over a list of row dicts"""
+
+    def __init__(self, rows, latency_seconds=0.0):
+        self._rows = rows
+        self._latency_seconds = latency_seconds
+        self._columns = None
+        self._filters = []
+        self._order = None
+        self._range = None
+        self._limit = None
+
+    def select(self, columns='*'):
+        if columns.strip() != '*':
+            self._columns = [column.strip() for column in columns.split(',')]
+        return self
+
+    def eq(self, column, value):
+        self._filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def in_(self, column, values):
+        values = {str(value) for value in values}
+        self._filters.append(lambda row: str(row.get(column)) in values)
+        return self
+
+    def gt(self, column, value):
+        self._filters.append(lambda row: row.get(column) > value)
+        return self
+
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end + 1)
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def execute(self):
+        if self._latency_seconds:
+            time.sleep(self._latency_seconds)
+
+        rows = [row for row in self._rows if all(check(row) for check in self._filters)]
+        if self._order is not None:
+            column, desc = self._order
+            rows.sort(key=lambda row: row.get(column), reverse=desc)
+        if self._range is not None:
+            rows = rows[self._range[0]:self._range[1]]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        if self._columns is not None:
+            rows = [{column: row.get(column) for column in self._columns} for row in rows]
+        else:
+            rows = [dict(row) for row in rows]
+        return FakeResponse(rows)
+
+
+class FakeRpc:
+    def __init__(self, call, latency_seconds=0.0):
+        self._call = call
+        self._latency_seconds = latency_seconds
+
+    def execute(self):
+        if self._latency_seconds:
+            time.sleep(self._latency_seconds)
+        return FakeResponse(self._call())
+
+
+class FakeSupabase:
+    """Synthetic catalog of ``catalog_size`` Funko Pops with ``history_days`` of daily sales.
+
+    ``latency_ms`` is added to every query and RPC to approximate the network
+    round trip to the real database.
+    """
+
+    def __init__(self, catalog_size=2000, history_days=365, seed=7, latency_ms=0.0):
+        self.history_days = history_days
+        self.seed = seed
+        self.latency_seconds = latency_ms / 1000
+        self.today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.funko_pops = self._build_catalog(catalog_size)
+        self._index = {row['id']: i for i, row in enumerate(self.funko_pops)}
+        self._histories = {}
+        self._lock = threading.Lock()
+
+    @property
+    def funko_ids(self):
+        return [row['id'] for row in self.funko_pops]
+
+    def _build_catalog(self, catalog_size):
+        rng = np.random.default_rng(self.seed)
+        rows = []
+        for i in range(catalog_size):
+            series = SERIES[rng.integers(len(SERIES))]
+            rows.append({
+                'id': str(uuid.UUID(int=(self.seed << 64) + i + 1)),
+                'name': f'{series} Pop {i}',
+                'series': series,
+                'character': f'Character {rng.integers(catalog_size // 3 + 1)}',
+                'funko_number': int(rng.integers(1, 1500)),
+                'release_date': (self.today - timedelta(days=int(rng.integers(30, 3000)))).date().isoformat(),
+                'is_chase': bool(rng.random() < 0.05),
+                'is_exclusive': bool(rng.random() < 0.2),
+                'is_vaulted': bool(rng.random() < 0.15),
+                'estimated_value': round(float(rng.lognormal(3.0, 0.7)), 2),
+                'rarity': RARITIES[rng.integers(len(RARITIES))]
+            })
+        # Keyset pagination relies on id order
+        rows.sort(key=lambda row: row['id'])
+        return rows
+
+    def table(self, name):
+        if name != 'funko_pops':
+            raise ValueError(f"FakeSupabase has no table {name}")
+        return FakeQuery(self.funko_pops, self.latency_seconds)
+
+    def rpc(self, name, params):
+        if name == 'price_history_buckets':
+            call = lambda: self._buckets(params['p_funko_pop_id'], params['p_start'], params.get('p_bucket', 'day'))
+        elif name == 'recent_sale_prices':
+            call = lambda: [
+                {'funko_pop_id': funko_pop_id, 'prices': self._recent_prices(funko_pop_id, params.get('p_limit', 90))}
+                for funko_pop_id in params['p_funko_pop_ids']
+            ]
+        else:
+            raise ValueError(f"FakeSupabase has no function {name}")
+        return FakeRpc(call, self.latency_seconds)
+
+    def daily_history(self, funko_pop_id):
+        """(day offsets from today, sale counts, sums, sums of squares) for one Funko Pop"""
+        with self._lock:
+            history = self._histories.get(funko_pop_id)
+        if history is not None:
+            return history
+
+        index = self._index.get(str(funko_pop_id))
+        if index is None:
+            history = (np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0), np.zeros(0))
+        else:
+            rng = np.random.default_rng((self.seed, index))
+            base = self.funko_pops[index]['estimated_value']
+            days = np.arange(-self.history_days, 0)
+            counts = rng.poisson(rng.uniform(0.05, 1.5), len(days))
+            trend = base * np.exp(np.cumsum(rng.normal(0, 0.01, len(days))))
+            sold = counts > 0
+            prices = trend[sold] * rng.lognormal(0, 0.08, int(sold.sum()))
+            history = (
+                days[sold], counts[sold].astype(np.float64),
+                prices * counts[sold], prices ** 2 * counts[sold]
+            )
+
+        with self._lock:
+            self._histories[funko_pop_id] = history
+        return history
+
+    def _recent_prices(self, funko_pop_id, limit):
+        # Every sale on a synthetic day sold at that day's price
+        _, counts, sums, _ = self.daily_history(str(funko_pop_id))
+        prices = np.repeat(sums / np.maximum(counts, 1), counts.astype(np.int64))
+        return prices[max(len(prices) - limit, 0):].tolist()
+
+    def _buckets(self, funko_pop_id, start, bucket):
+        days, counts, sums, squares = self.daily_history(str(funko_pop_id))
+        start = datetime.fromisoformat(str(start).replace('Z', '+00:00'))
+        kept = days >= np.floor((start - self.today).total_seconds() / SECONDS_PER_DAY)
+        days, counts, sums, squares = days[kept], counts[kept], sums[kept], squares[kept]
+
+        if bucket == 'week':
+            # date_trunc('week') starts buckets on Monday
+            weekday = np.array([(self.today + timedelta(days=int(day))).weekday() for day in days], dtype=np.int64)
+            days = days - weekday
+        keys, inverse = np.unique(days, return_inverse=True)
+
+        rows = []
+        for i, day in enumerate(keys):
+            members = inverse == i
+            count = counts[members].sum()
+            total = sums[members].sum()
+            rows.append({
+                'bucket_start': (self.today + timedelta(days=int(day))).isoformat(),
+                'sale_count': int(count),
+                'avg_price': float(total / count),
+                'min_price': float((sums[members] / counts[members]).min()),
+                'max_price': float((sums[members] / counts[members]).max()),
+                'sum_price': float(total),
+                'sum_price_sq': float(squares[members].sum())
+            })
+        return rows
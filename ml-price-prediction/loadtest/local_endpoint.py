@@ -0,0 +1,101 @@
+"""Local stand-in for the SageMaker endpoint, serving train.py's inference handlers.
+
+Implements the container contract (GET /ping, POST /invocations) and the
+runtime path boto3 calls (POST /endpoints/<name>/invocations), so the API can
+be pointed at it with SAGEMAKER_RUNTIME_ENDPOINT_URL:
+
+    python local_endpoint.py --model-dir /path/with/model.joblib --port 8080
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'training'))
+import train
+
+logger = logging.getLogger(__name__)
+
+INVOCATIONS_PATH = re.compile(r'^(/endpoints/[^/]+)?/invocations$')
+
+
+class InvocationHandler(BaseHTTPRequestHandler):
+    """Runs input_fn -> predict_fn -> output_fn for each invocation, like the SageMaker container"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, as the runtime client expects
+    model = None
+
+    def do_GET(self):
+        if self.path == '/ping':
+            self._respond(200, b'', 'text/plain')
+        else:
+            self._respond(404, b'Not found', 'text/plain')
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not INVOCATIONS_PATH.match(self.path.split('?')[0]):
+            self._respond(404, b'Not found', 'text/plain')
+            return
+
+        content_type = self.headers.get('Content-Type', 'application/json').split(';')[0].strip()
+        accept = self.headers.get('Accept', '').split(';')[0].strip()
+        if accept in ('', '*/*'):
+            accept = content_type
+
+        try:
+            data = train.input_fn(body.decode(), content_type)
+            prediction = train.predict_fn(data, self.model)
+            payload = train.output_fn(prediction, accept)
+        except ValueError as e:
+            self._respond(400, str(e).encode(), 'text/plain')
+            return
+        except Exception as e:
+            logger.error(f"Invocation failed: {e}")
+            self._respond(500, str(e).encode(), 'text/plain')
+            return
+
+        self._respond(200, payload.encode(), accept)
+
+    def _respond(self, status, payload, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def create_server(model_dir, host='127.0.0.1', port=8080):
+    """HTTP server with the model from model_dir loaded through train.model_fn"""
+    InvocationHandler.model = train.model_fn(model_dir)
+    return ThreadingHTTPServer((host, port), InvocationHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-dir", type=str, required=True)
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--log-level", type=str, default="WARNING")
+    args = parser.parse_args()
+
+    # train.py logs every request at INFO, which would dominate a load test
+    logging.getLogger().setLevel(args.log_level.upper())
+    train.logger.setLevel(args.log_level.upper())
+
+    server = create_server(args.model_dir, args.host, args.port)
+    print(f"Serving {args.model_dir} on http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
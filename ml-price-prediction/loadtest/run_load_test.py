@@ -0,0 +1,351 @@
+"""Load test for the prediction API running entirely on this machine.
+
+Trains a small model on FakeSupabase data (unless --artifacts-dir is given),
+starts local_endpoint.py and serve_api.py, drives the API with a weighted mix
+of endpoints from --concurrency client threads, and reports throughput and
+p50/p95/p99 latency per endpoint. Each run is saved under --results-dir with
+the git commit so runs can be compared:
+
+    python run_load_test.py --duration 30 --concurrency 16 --compare latest
+"""
+import argparse
+import glob
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+import numpy as np
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(LOADTEST_DIR, '..', 'features'))
+from funko_features import (
+    CONDITION_MAP, FEATURE_NAMES, MARKETPLACE_MAP, build_feature_mappings, engineer_training_matrix, rows_to_columns
+)
+from drift_sketches import DriftReference
+from fake_supabase import FakeSupabase
+from similarity_index import SimilarityIndex
+
+DEFAULT_MIX = 'predict=60,history=15,curve=10,valuate=5,stream=5,status=5'
+MODEL_VERSION = 'loadtest'
+QUANTILE_ALPHAS = [0.1, 0.5, 0.9]
+
+
+def build_artifacts(directory, supabase, rounds=100, seed=7):
+    """Train a small booster on the fake price history and publish it like the pipeline does"""
+    import joblib
+    import xgboost as xgb
+
+    rng = np.random.default_rng(seed)
+    sales = {name: [] for name in ['funko_pop_id', 'price', 'date_sold', 'condition', 'marketplace']}
+    funko_columns = {name: [] for name in supabase.funko_pops[0] if name != 'id'}
+    for funko in supabase.funko_pops:
+        days, counts, sums, _ = supabase.daily_history(funko['id'])
+        for day, price in zip(days, sums / np.maximum(counts, 1)):
+            sales['funko_pop_id'].append(funko['id'])
+            sales['price'].append(float(price))
+            sales['date_sold'].append((supabase.today + timedelta(days=int(day))).isoformat())
+            sales['condition'].append(rng.choice(list(CONDITION_MAP)))
+            sales['marketplace'].append(rng.choice(list(MARKETPLACE_MAP)))
+            for name in funko_columns:
+                funko_columns[name].append(funko[name])
+    sales.update(funko_columns)
+
+    mappings = build_feature_mappings(funko_columns['series'], funko_columns['character'])
+    features = engineer_training_matrix(sales, mappings)
+    # Same multi-quantile objective train.py uses, so intervals are served end to end
+    model = xgb.train(
+        {'max_depth': 6, 'eta': 0.2, 'objective': 'reg:quantileerror', 'quantile_alpha': QUANTILE_ALPHAS,
+         'seed': seed},
+        xgb.DMatrix(features, label=np.asarray(sales['price'])), num_boost_round=rounds
+    )
+    model.set_attr(quantile_alphas=json.dumps(QUANTILE_ALPHAS))
+
+    histories = {}
+    for funko_pop_id, price in zip(sales['funko_pop_id'], sales['price']):
+        histories.setdefault(funko_pop_id, []).append(price)
+    similarity_index = SimilarityIndex()
+    similarity_index.update(
+        supabase.funko_ids, rows_to_columns(supabase.funko_pops), [histories.get(i, []) for i in supabase.funko_ids]
+    )
+
+    os.makedirs(directory, exist_ok=True)
+    joblib.dump(model, os.path.join(directory, 'model.joblib'))
+    similarity_index.save(os.path.join(directory, 'similarity_index.npz'))
+    DriftReference.build(features, FEATURE_NAMES, np.median(model.predict(xgb.DMatrix(features)), axis=1)).save(os.path.join(directory, 'drift_reference.json'))
+    for name, payload in [
+        ('feature_names.json', FEATURE_NAMES),
+        ('feature_mappings.json', mappings),
+        ('manifest.json', {
+            'model_version': MODEL_VERSION,
+            'model': 'model.joblib',
+            'feature_names': 'feature_names.json',
+            'feature_mappings': 'feature_mappings.json',
+            'similarity_index': 'similarity_index.npz',
+            'drift_reference': 'drift_reference.json'
+        })
+    ]:
+        with open(os.path.join(directory, name), 'w') as f:
+            json.dump(payload, f)
+    return directory
+
+
+def wait_for(url, process, timeout):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with code {process.returncode} before {url} was ready")
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.1)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+class RequestMix:
+    """Weighted endpoint choice over a catalog with skewed (Zipf-like) popularity"""
+
+    def __init__(self, weights, funko_ids, seed=7, skew=1.1):
+        self.endpoints = list(weights)
+        self.weights = [weights[name] for name in self.endpoints]
+        self.funko_ids = list(funko_ids)
+        ranks = np.arange(1, len(self.funko_ids) + 1)
+        popularity = 1 / ranks ** skew
+        self.popularity = np.cumsum(popularity / popularity.sum())
+        random.Random(seed).shuffle(self.funko_ids)
+
+    def funko_id(self, rng):
+        return self.funko_ids[min(int(np.searchsorted(self.popularity, rng.random())), len(self.funko_ids) - 1)]
+
+    def next_request(self, rng):
+        """(endpoint, method, path, body)"""
+        endpoint = rng.choices(self.endpoints, self.weights)[0]
+        condition = rng.choice(list(CONDITION_MAP))
+        marketplace = rng.choice(list(MARKETPLACE_MAP))
+
+        if endpoint == 'predict':
+            return endpoint, 'POST', '/predict', {
+                'funko_pop_id': self.funko_id(rng), 'condition': condition,
+                'marketplace': marketplace, 'future_days': rng.choice([0, 7, 30, 90])
+            }
+        if endpoint == 'history':
+            return endpoint, 'GET', f"/history/{self.funko_id(rng)}?days={rng.choice([30, 90, 365])}", None
+        if endpoint == 'curve':
+            return endpoint, 'POST', '/predict/curve', {
+                'funko_pop_id': self.funko_id(rng), 'condition': condition, 'marketplace': marketplace
+            }
+        if endpoint == 'valuate':
+            return endpoint, 'POST', '/valuate/collection', {
+                'items': [
+                    {'funko_pop_id': self.funko_id(rng), 'condition': rng.choice(list(CONDITION_MAP)),
+                     'quantity': rng.randint(1, 3)}
+                    for _ in range(rng.randint(10, 100))
+                ],
+                'marketplace': marketplace
+            }
+        if endpoint == 'stream':
+            return endpoint, 'POST', '/predict/batch/stream', {
+                'funko_pop_ids': [self.funko_id(rng) for _ in range(100)],
+                'condition': condition, 'marketplace': marketplace
+            }
+        if endpoint == 'status':
+            return endpoint, 'GET', '/model/status', None
+        raise ValueError(f"Unknown endpoint {endpoint}")
+
+
+def run_client(host, port, mix, deadline, seed, samples):
+    """One keep-alive connection issuing requests back to back until the deadline"""
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    while time.perf_counter() < deadline:
+        endpoint, method, path, body = mix.next_request(rng)
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (http.client.HTTPException, OSError):
+            ok = False
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+        samples.append((endpoint, time.perf_counter() - started, ok))
+    connection.close()
+
+
+def summarize(samples, seconds):
+    """Per-endpoint request count, error count, throughput and latency percentiles in ms"""
+    report = {}
+    for endpoint in sorted({sample[0] for sample in samples}) + ['all']:
+        selected = [sample for sample in samples if endpoint == 'all' or sample[0] == endpoint]
+        latencies = np.array([sample[1] for sample in selected]) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        report[endpoint] = {
+            'requests': len(selected),
+            'errors': sum(1 for sample in selected if not sample[2]),
+            'throughput_rps': round(len(selected) / seconds, 2),
+            'mean_ms': round(float(latencies.mean()), 2),
+            'p50_ms': round(float(p50), 2),
+            'p95_ms': round(float(p95), 2),
+            'p99_ms': round(float(p99), 2)
+        }
+    return report
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=LOADTEST_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--', '..'], cwd=LOADTEST_DIR, capture_output=True, text=True
+        ).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_report(report, baseline=None):
+    header = f"{'endpoint':<10}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    for endpoint, stats in report.items():
+        line = (
+            f"{endpoint:<10}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput_rps']:>10.1f}"
+            f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+        )
+        previous = (baseline or {}).get(endpoint)
+        if previous:
+            changes = [
+                f"{name.split('_')[0]} {100 * (stats[name] - previous[name]) / previous[name]:+.0f}%"
+                for name in ('throughput_rps', 'p50_ms', 'p99_ms') if previous[name]
+            ]
+            line += '   vs baseline: ' + ', '.join(changes)
+        print(line)
+
+
+def load_baseline(compare, results_dir):
+    if not compare:
+        return None
+    if compare == 'latest':
+        runs = sorted(glob.glob(os.path.join(results_dir, '*.json')))
+        if not runs:
+            return None
+        compare = runs[-1]
+    with open(compare) as f:
+        baseline = json.load(f)
+    print(f"Comparing against {compare} (commit {baseline.get('commit')})")
+    return baseline['endpoints']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", type=str, default=DEFAULT_MIX, help="endpoint=weight pairs")
+    parser.add_argument("--catalog-size", type=int, default=2000)
+    parser.add_argument("--supabase-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--artifacts-dir", type=str, default=None, help="model.joblib plus manifest; trained if omitted")
+    parser.add_argument("--api-port", type=int, default=8700)
+    parser.add_argument("--endpoint-port", type=int, default=8701)
+    parser.add_argument("--results-dir", type=str, default=os.path.join(LOADTEST_DIR, 'results'))
+    parser.add_argument("--compare", type=str, default=None, help="results file to compare with, or 'latest'")
+    parser.add_argument("--label", type=str, default=None)
+    args = parser.parse_args()
+
+    weights = {name: float(weight) for name, weight in (pair.split('=') for pair in args.mix.split(','))}
+    supabase = FakeSupabase(args.catalog_size, seed=args.seed)
+    artifacts_dir = args.artifacts_dir or build_artifacts(tempfile.mkdtemp(prefix='loadtest-model-'), supabase)
+
+    env = dict(os.environ)
+    env.update({
+        'SAGEMAKER_RUNTIME_ENDPOINT_URL': f'http://127.0.0.1:{args.endpoint_port}',
+        'MODEL_ARTIFACT_URI': artifacts_dir,
+        'STATUS_REFRESH_INTERVAL': '3600'
+    })
+    # The runtime client signs requests even for a local endpoint
+    env.setdefault('AWS_ACCESS_KEY_ID', 'loadtest')
+    env.setdefault('AWS_SECRET_ACCESS_KEY', 'loadtest')
+
+    # Server logs go to files so per-request logging does not flood the report
+    log_dir = tempfile.mkdtemp(prefix='loadtest-logs-')
+    endpoint_log = open(os.path.join(log_dir, 'endpoint.log'), 'w')
+    api_log = open(os.path.join(log_dir, 'api.log'), 'w')
+    processes = []
+    try:
+        processes.append(subprocess.Popen(
+            [sys.executable, 'local_endpoint.py', '--model-dir', artifacts_dir, '--port', str(args.endpoint_port)],
+            cwd=LOADTEST_DIR, env=env, stdout=endpoint_log, stderr=subprocess.STDOUT
+        ))
+        wait_for(f'http://127.0.0.1:{args.endpoint_port}/ping', processes[-1], 60)
+
+        processes.append(subprocess.Popen(
+            [sys.executable, 'serve_api.py', '--port', str(args.api_port), '--catalog-size', str(args.catalog_size),
+             '--seed', str(args.seed), '--supabase-latency-ms', str(args.supabase_latency_ms)],
+            cwd=LOADTEST_DIR, env=env, stdout=api_log, stderr=subprocess.STDOUT
+        ))
+        ready_seconds = wait_for(f'http://127.0.0.1:{args.api_port}/health', processes[-1], 120)
+
+        mix = RequestMix(weights, supabase.funko_ids, args.seed)
+        for phase, seconds in [('warmup', args.warmup), ('measure', args.duration)]:
+            samples = []
+            deadline = time.perf_counter() + seconds
+            clients = [
+                threading.Thread(
+                    target=run_client,
+                    args=('127.0.0.1', args.api_port, mix, deadline, args.seed * 1000 + i, samples)
+                )
+                for i in range(args.concurrency)
+            ]
+            started = time.perf_counter()
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            elapsed = time.perf_counter() - started
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+        endpoint_log.close()
+        api_log.close()
+
+    report = summarize(samples, elapsed)
+    result = {
+        'commit': git_commit(),
+        'label': args.label,
+        'timestamp': datetime.now().isoformat(),
+        'config': {
+            'duration': args.duration, 'concurrency': args.concurrency, 'mix': weights,
+            'catalog_size': args.catalog_size, 'supabase_latency_ms': args.supabase_latency_ms,
+            'seed': args.seed, 'cpu_count': os.cpu_count()
+        },
+        'api_ready_seconds': round(ready_seconds, 3),
+        'endpoints': report
+    }
+
+    baseline = load_baseline(args.compare, args.results_dir)
+    print_report(report, baseline)
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    path = os.path.join(args.results_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{result['commit']}.json")
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved results to {path} (server logs in {log_dir})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Run prediction_api against FakeSupabase, e.g. behind the load test.
+
+Point SAGEMAKER_RUNTIME_ENDPOINT_URL at local_endpoint.py (and MODEL_ARTIFACT_URI
+at the matching artifacts directory) before starting:
+
+    python serve_api.py --port 8000 --catalog-size 2000
+"""
+import argparse
+import os
+import sys
+
+import uvicorn
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(LOADTEST_DIR, '..', 'api'))
+import prediction_api
+from fake_supabase import FakeSupabase
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--catalog-size", type=int, default=2000)
+    parser.add_argument("--history-days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--supabase-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    prediction_api.create_supabase_client = lambda: FakeSupabase(
+        args.catalog_size, args.history_days, args.seed, args.supabase_latency_ms
+    )
+    uvicorn.run(prediction_api.app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()
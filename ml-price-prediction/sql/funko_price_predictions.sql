@@ -0,0 +1,33 @@
+-- ========================================
+-- NIGHTLY BATCH PREDICTIONS
+-- ========================================
+-- Written by deployment/batch_score.py --upsert-table funko_price_predictions.
+-- One row per Funko Pop and scoring scenario; each nightly run overwrites it.
+
+CREATE TABLE IF NOT EXISTS public.funko_price_predictions (
+    funko_pop_id uuid NOT NULL REFERENCES public.funko_pops (id) ON DELETE CASCADE,
+    condition text NOT NULL,
+    marketplace text NOT NULL,
+    future_days integer NOT NULL,
+    predicted_price double precision NOT NULL,
+    -- Interval bounds from a multi-quantile model; NULL for point models
+    price_lower double precision,
+    price_upper double precision,
+    model_version text NOT NULL,
+    run_id text NOT NULL,
+    scored_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (funko_pop_id, condition, marketplace, future_days)
+);
+
+CREATE INDEX IF NOT EXISTS funko_price_predictions_run_idx
+    ON public.funko_price_predictions (run_id);
+
+ALTER TABLE public.funko_price_predictions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Predictions are readable by everyone"
+    ON public.funko_price_predictions FOR SELECT
+    USING (true);
+
+-- Existing tables (created before interval bounds were scored)
+ALTER TABLE public.funko_price_predictions ADD COLUMN IF NOT EXISTS price_lower double precision;
+ALTER TABLE public.funko_price_predictions ADD COLUMN IF NOT EXISTS price_upper double precision;
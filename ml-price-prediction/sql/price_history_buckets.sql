@@ -0,0 +1,87 @@
+-- ========================================
+-- PRICE HISTORY AGGREGATION FOR THE PREDICTION API
+-- ========================================
+-- Buckets price_history server-side so the API only receives one row per day
+-- or week instead of every scraped listing. Run once in the Supabase SQL editor.
+
+-- Covering index for per-funko range scans
+CREATE INDEX IF NOT EXISTS price_history_funko_date_idx
+    ON public.price_history (funko_pop_id, date_scraped)
+    INCLUDE (price);
+
+-- Keyset order of features/price_store.py ingestion (insertion time, then id)
+CREATE INDEX IF NOT EXISTS price_history_created_id_idx
+    ON public.price_history (created_at, id);
+
+-- Daily or weekly buckets for one Funko Pop since p_start.
+-- sum_price and sum_price_sq let the API compute mean and volatility over any
+-- range of buckets from running sums without re-reading individual sales.
+CREATE OR REPLACE FUNCTION public.price_history_buckets(
+    p_funko_pop_id uuid,
+    p_start timestamptz,
+    p_bucket text DEFAULT 'day'
+)
+RETURNS TABLE (
+    bucket_start timestamptz,
+    sale_count bigint,
+    avg_price double precision,
+    min_price double precision,
+    max_price double precision,
+    sum_price double precision,
+    sum_price_sq double precision
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        date_trunc(p_bucket, ph.date_scraped) AS bucket_start,
+        count(*) AS sale_count,
+        avg(ph.price)::double precision AS avg_price,
+        min(ph.price)::double precision AS min_price,
+        max(ph.price)::double precision AS max_price,
+        sum(ph.price)::double precision AS sum_price,
+        sum(ph.price * ph.price)::double precision AS sum_price_sq
+    FROM public.price_history ph
+    WHERE ph.funko_pop_id = p_funko_pop_id
+      AND ph.date_scraped >= p_start
+      AND p_bucket IN ('day', 'week')
+    GROUP BY 1
+    ORDER BY 1;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.price_history_buckets(uuid, timestamptz, text) TO anon, authenticated;
+
+-- Last p_limit individual sale prices per Funko Pop, oldest first. The model's
+-- rolling price features are windows over individual sales, so the API and
+-- deployment/batch_score.py featurize from these rather than from buckets.
+-- One row per Funko Pop keeps large batches under the PostgREST row limit.
+DROP FUNCTION IF EXISTS public.price_history_buckets_many(uuid[], timestamptz, text);
+
+CREATE OR REPLACE FUNCTION public.recent_sale_prices(
+    p_funko_pop_ids uuid[],
+    p_limit integer DEFAULT 90
+)
+RETURNS TABLE (
+    funko_pop_id uuid,
+    prices double precision[]
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        ids.id AS funko_pop_id,
+        ARRAY(
+            SELECT recent.price
+            FROM (
+                SELECT ph.price::double precision AS price, ph.date_scraped, ph.id
+                FROM public.price_history ph
+                WHERE ph.funko_pop_id = ids.id
+                ORDER BY ph.date_scraped DESC, ph.id DESC
+                LIMIT p_limit
+            ) recent
+            ORDER BY recent.date_scraped, recent.id
+        ) AS prices
+    FROM unnest(p_funko_pop_ids) AS ids(id);
+$$;
+
+GRANT EXECUTE ON FUNCTION public.recent_sale_prices(uuid[], integer) TO anon, authenticated;
@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# Same flat layout the services use: shared modules are imported from features/ and api/
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'features'))
@@ -0,0 +1,71 @@
+"""Training/serving parity of the shared feature code (features/funko_features.py)"""
+import numpy as np
+import pytest
+
+from funko_features import FEATURE_NAMES, build_category_mapping, build_feature_mappings, engineer_training_matrix
+from parity_check import history_path_matrix, serving_matrix, synthetic_data
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    # Up to 2 * 60 sales per Funko Pop, so some histories are longer than the 90-sale window
+    funkos, sales = synthetic_data(60, 60, seed=7)
+    mappings = build_feature_mappings([f['series'] for f in funkos], [f['character'] for f in funkos])
+    return funkos, sales, mappings
+
+
+@pytest.fixture(scope='module')
+def training(catalog):
+    _, sales, mappings = catalog
+    return engineer_training_matrix(sales, mappings)
+
+
+@pytest.fixture(scope='module')
+def serving(catalog):
+    _, sales, mappings = catalog
+    return serving_matrix(sales, mappings)
+
+
+def test_matrices_are_float32(training, serving):
+    assert training.dtype == np.float32
+    assert serving.dtype == np.float32
+
+
+def test_canonical_column_count(training):
+    assert training.shape[1] == len(FEATURE_NAMES)
+
+
+def test_training_rows_match_serving_rows(training, serving):
+    mismatched = np.flatnonzero(~(training == serving).all(axis=1))
+    assert len(mismatched) == 0, (
+        f"{len(mismatched)} of {len(training)} rows differ, first at row {mismatched[0]}: "
+        f"{[n for n, a, b in zip(FEATURE_NAMES, training[mismatched[0]], serving[mismatched[0]]) if a != b]}"
+    )
+
+
+def test_training_rows_match_price_store_history_rows(catalog, training, tmp_path):
+    _, sales, mappings = catalog
+    last, history_rows = history_path_matrix(sales, mappings, str(tmp_path))
+    assert len(last) > 0
+    np.testing.assert_array_equal(training[last], history_rows)
+
+
+def test_single_row_matches_batch(catalog, serving):
+    _, sales, mappings = catalog
+    sample = np.random.default_rng(7).choice(len(serving), size=min(50, len(serving)), replace=False)
+    single = np.vstack([serving_matrix(sales, mappings, [i]) for i in sample])
+    np.testing.assert_array_equal(single, serving[sample])
+
+
+def test_category_codes_independent_of_row_order(catalog):
+    funkos, _, mappings = catalog
+    shuffled = list(reversed([f['series'] for f in funkos]))
+    assert build_category_mapping(shuffled) == mappings['series_mapping']
+
+
+def test_unknown_categories_encode_as_zero(catalog, training):
+    _, sales, mappings = catalog
+    assert 0 not in mappings['series_mapping'].values()
+    unknown = [series is None for series in sales['series']]
+    assert any(unknown)
+    assert not np.any(training[unknown, FEATURE_NAMES.index('series_encoded')])
@@ -0,0 +1,165 @@
+"""PredictionCache LRU, TTL, stale-while-revalidate and counters against a fake clock"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import prediction_cache
+from prediction_cache import InMemoryCacheBackend, PredictionCache
+
+
+class FakeClock:
+    """Stands in for the time module; every clock reads the same manually advanced value"""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    def time(self):
+        return self.now
+
+    monotonic = perf_counter = time
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(prediction_cache, 'time', fake)
+    return fake
+
+
+class Compute:
+    """Counts calls and returns a new value each time; each call costs ``cost`` fake seconds"""
+
+    def __init__(self, clock, cost=0.5):
+        self.clock = clock
+        self.cost = cost
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        self.clock.advance(self.cost)
+        return {'price': self.calls}
+
+
+def wait_for_refreshes(cache):
+    cache._refresh_executor.shutdown(wait=True)
+
+
+def test_backend_evicts_least_recently_used(clock):
+    backend = InMemoryCacheBackend(max_entries=2)
+    backend.set('a', 1, 60)
+    backend.set('b', 2, 60)
+    assert backend.get('a') == 1  # a is now the most recently used
+
+    backend.set('c', 3, 60)
+    assert len(backend) == 2
+    assert backend.get('b') is None
+    assert backend.get('a') == 1
+    assert backend.get('c') == 3
+
+    # Overwriting refreshes recency too
+    backend.set('a', 10, 60)
+    backend.set('d', 4, 60)
+    assert backend.get('c') is None
+    assert backend.get('a') == 10
+
+
+def test_backend_expires_entries(clock):
+    backend = InMemoryCacheBackend()
+    backend.set('a', 1, 10)
+    clock.advance(9.9)
+    assert backend.get('a') == 1
+    clock.advance(0.2)
+    assert backend.get('a') is None
+    assert len(backend) == 0
+
+
+def test_fresh_hits_until_ttl(clock):
+    cache = PredictionCache(InMemoryCacheBackend(), ttl_seconds=60, stale_ttl_seconds=0)
+    compute = Compute(clock)
+
+    assert cache.get_or_compute('k', compute) == {'price': 1}
+    clock.advance(59)
+    assert cache.get_or_compute('k', compute) == {'price': 1}
+    assert compute.calls == 1
+
+    # Past the TTL with no stale window the entry is recomputed inline
+    clock.advance(2)
+    assert cache.get_or_compute('k', compute) == {'price': 2}
+    assert compute.calls == 2
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['stale_hits'], stats['misses']) == (1, 0, 2)
+    assert stats['hit_ratio'] == pytest.approx(1 / 3, abs=1e-4)
+    assert stats['latency_saved_seconds'] == pytest.approx(0.5)
+
+
+def test_stale_while_revalidate(clock):
+    cache = PredictionCache(InMemoryCacheBackend(), ttl_seconds=60, stale_ttl_seconds=30)
+    compute = Compute(clock)
+    cache.get_or_compute('k', compute)
+
+    # Expired but inside the stale window: the old value is served and refreshed in the background
+    clock.advance(70)
+    release = threading.Event()
+
+    def slow_compute():
+        release.wait(5)
+        return compute()
+
+    assert cache.get_or_compute('k', slow_compute) == {'price': 1}
+    # A second stale read while the refresh is running doesn't schedule another one
+    assert cache.get_or_compute('k', slow_compute) == {'price': 1}
+    release.set()
+    wait_for_refreshes(cache)
+    assert compute.calls == 2
+
+    # The refreshed entry is fresh again
+    assert cache.get_or_compute('k', compute) == {'price': 2}
+    assert compute.calls == 2
+
+    # Past TTL plus the stale window it is a plain miss
+    clock.advance(100)
+    assert cache.get_or_compute('k', compute) == {'price': 3}
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['stale_hits'], stats['misses']) == (1, 2, 2)
+
+
+def test_degraded_values_use_their_own_ttl(clock):
+    compute = Compute(clock)
+
+    uncached = PredictionCache(InMemoryCacheBackend(), ttl_seconds=60, degraded_ttl_seconds=0)
+    uncached.get_or_compute('k', compute, degraded=lambda: True)
+    uncached.get_or_compute('k', compute, degraded=lambda: True)
+    assert compute.calls == 2
+    assert uncached.stats()['degraded'] == 2
+
+    # Short-lived and never served stale, even with a stale window configured
+    short = PredictionCache(
+        InMemoryCacheBackend(), ttl_seconds=60, stale_ttl_seconds=30, degraded_ttl_seconds=5
+    )
+    short.get_or_compute('k', compute, degraded=lambda: True)
+    clock.advance(4)
+    assert short.get_or_compute('k', compute) == {'price': 3}
+    clock.advance(2)
+    assert short.get_or_compute('k', compute) == {'price': 4}
+    assert short.stats()['stale_hits'] == 0
+
+
+def test_counters_are_exact_under_concurrency(clock):
+    cache = PredictionCache(InMemoryCacheBackend(), ttl_seconds=60, stale_ttl_seconds=0)
+    cache.get_or_compute('k', Compute(clock, cost=0.001))
+
+    threads, lookups = 8, 2000
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in range(threads):
+            pool.submit(lambda: [cache.get_or_compute('k', None) for _ in range(lookups)])
+
+    stats = cache.stats()
+    assert stats['hits'] == threads * lookups
+    assert stats['misses'] == 1
+    assert stats['latency_saved_seconds'] == pytest.approx(threads * lookups * 0.001, abs=1e-3)
@@ -0,0 +1,290 @@
+"""PriceStore reads, compaction, crash recovery and incremental ingest against a pandas reference"""
+import json
+import os
+import re
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from funko_features import CONDITION_MAP, MARKETPLACE_MAP
+from price_store import PriceStore, PriceStoreWriter, ingest_price_history
+
+FUNKOS = ['funko-a', 'funko-b', 'funko-c']
+# Small blocks so every segment spans several anchors
+BLOCK_ROWS = 4
+BASE_TS = 1_700_000_000
+
+
+def random_sales(rng, n, late=False):
+    """n sales in random order; hour-aligned times give ties, late ones predate everything else"""
+    hours = rng.integers(-400, -200, n) if late else rng.integers(0, 24 * 40, n)
+    return pd.DataFrame({
+        'funko': rng.choice(FUNKOS, n),
+        'ts': BASE_TS + hours * 3600,
+        'price': np.round(rng.uniform(5, 300, n), 2).astype(np.float32),
+        'marketplace': rng.integers(0, len(MARKETPLACE_MAP) + 1, n).astype(np.int8),
+        'condition': rng.integers(0, len(CONDITION_MAP) + 1, n).astype(np.int8),
+    })
+
+
+def append(writer, sales, watermark=None):
+    return writer.append(
+        sales['funko'].tolist(), sales['ts'].to_numpy(), sales['price'].to_numpy(),
+        sales['marketplace'].to_numpy(), sales['condition'].to_numpy(), watermark=watermark
+    )
+
+
+def expected(reference, funko, start_ts=None, end_ts=None):
+    """One Funko's sales in time order; ties keep append order, like the store"""
+    rows = reference[reference['funko'] == funko].sort_values('ts', kind='stable')
+    if start_ts is not None:
+        rows = rows[rows['ts'] >= start_ts]
+    if end_ts is not None:
+        rows = rows[rows['ts'] < end_ts]
+    return rows
+
+
+def assert_read_matches(sales, rows):
+    np.testing.assert_array_equal(sales['timestamps'], rows['ts'].to_numpy())
+    np.testing.assert_array_equal(sales['prices'], rows['price'].to_numpy())
+    np.testing.assert_array_equal(sales['marketplace'], rows['marketplace'].to_numpy())
+    np.testing.assert_array_equal(sales['condition'], rows['condition'].to_numpy())
+
+
+def assert_store_matches(store, reference, rng):
+    for funko in FUNKOS:
+        assert_read_matches(store.read(funko), expected(reference, funko))
+        timestamps = reference['ts'].to_numpy()
+        # Range edges on existing timestamps hit ties at block boundaries
+        for start_ts, end_ts in [*rng.choice(timestamps, (20, 2)), (None, BASE_TS), (BASE_TS, None)]:
+            if start_ts is not None and end_ts is not None and start_ts > end_ts:
+                start_ts, end_ts = end_ts, start_ts
+            assert_read_matches(store.read(funko, start_ts, end_ts), expected(reference, funko, start_ts, end_ts))
+        for limit in (1, 3, BLOCK_ROWS, BLOCK_ROWS + 1, 25, 10_000):
+            assert_read_matches(store.recent(funko, limit), expected(reference, funko).iloc[-limit:])
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(11)
+
+
+@pytest.fixture
+def store_dir(tmp_path):
+    return str(tmp_path / 'store')
+
+
+@pytest.fixture
+def loaded(rng, store_dir):
+    """A store built from several out-of-order appends, including late sales, and its reference frame"""
+    writer = PriceStoreWriter(store_dir, block_rows=BLOCK_ROWS)
+    batches = [random_sales(rng, 40), random_sales(rng, 25), random_sales(rng, 15, late=True), random_sales(rng, 30)]
+    for batch in batches:
+        append(writer, batch)
+    return writer, pd.concat(batches, ignore_index=True)
+
+
+def test_read_and_recent_match_reference(rng, store_dir, loaded):
+    _, reference = loaded
+    assert_store_matches(PriceStore(store_dir), reference, rng)
+
+
+def test_unknown_funko_reads_empty(store_dir, loaded):
+    store = PriceStore(store_dir)
+    assert len(store.read('missing')['timestamps']) == 0
+    assert len(store.recent('missing', 5)['prices']) == 0
+    assert store.buckets('missing', 0) == []
+
+
+@pytest.mark.parametrize('bucket', ['day', 'week'])
+def test_buckets_match_reference(store_dir, loaded, bucket):
+    _, reference = loaded
+    store = PriceStore(store_dir)
+    start_ts = BASE_TS + 5 * 86400
+    for funko in FUNKOS:
+        rows = expected(reference, funko, start_ts)
+        dates = pd.to_datetime(rows['ts'], unit='s')
+        # date_trunc: UTC midnight, or the Monday of the week
+        starts = dates.dt.floor('D') if bucket == 'day' else dates.dt.to_period('W-SUN').dt.start_time
+        groups = rows['price'].astype(np.float64).groupby(starts.to_numpy())
+        frame = pd.DataFrame({
+            'ts': (groups.sum().index.astype('datetime64[s]').astype(np.int64)),
+            'sale_count': groups.count().to_numpy(),
+            'avg_price': groups.mean().to_numpy(),
+            'min_price': groups.min().to_numpy(),
+            'max_price': groups.max().to_numpy(),
+            'sum_price': groups.sum().to_numpy(),
+            'sum_price_sq': groups.apply(lambda prices: (prices * prices).sum()).to_numpy(),
+        })
+        actual = pd.DataFrame(store.buckets(funko, start_ts, bucket))
+        pd.testing.assert_frame_equal(actual[frame.columns], frame, check_dtype=False, rtol=1e-9)
+
+
+def test_to_columns_matches_reference(store_dir, loaded):
+    _, reference = loaded
+    columns = PriceStore(store_dir).to_columns()
+    # Grouped by funko code, i.e. in the order Funko Pops were first appended
+    codes = pd.Categorical(reference['funko'], categories=list(dict.fromkeys(reference['funko']))).codes
+    rows = reference.assign(code=codes).sort_values(['code', 'ts'], kind='stable')
+
+    assert list(columns['funko_pop_id']) == rows['funko'].tolist()
+    np.testing.assert_array_equal(columns['date_sold'], rows['ts'].to_numpy().astype('datetime64[s]'))
+    np.testing.assert_array_equal(columns['price'], rows['price'].to_numpy().astype(np.float64))
+    condition_names = {code: name for name, code in CONDITION_MAP.items()}
+    marketplace_names = {code: name for name, code in MARKETPLACE_MAP.items()}
+    assert list(columns['condition']) == [condition_names.get(code) for code in rows['condition']]
+    assert list(columns['marketplace']) == [marketplace_names.get(code) for code in rows['marketplace']]
+
+
+def test_compact_between_reads(rng, store_dir, loaded):
+    writer, reference = loaded
+    store = PriceStore(store_dir, reload_interval=0)
+    assert_store_matches(store, reference, rng)
+    old_view = store._view
+    old_segment = old_view.segments_of[FUNKOS[0]][0]
+    before = {name: values.copy() for name, values in old_view.read_segment(old_segment, None, None).items()}
+
+    compacted = writer.compact()
+    assert compacted['segments'] == len(FUNKOS)
+    assert_store_matches(store, reference, rng)
+    # Reads that started before the compaction keep working on the previous generation
+    after = old_view.read_segment(old_segment, None, None)
+    for name, values in before.items():
+        np.testing.assert_array_equal(after[name], values)
+
+    # Appends after a compaction continue the new generation, late sales included
+    more = pd.concat([random_sales(rng, 20), random_sales(rng, 10, late=True)], ignore_index=True)
+    append(writer, more)
+    assert_store_matches(store, pd.concat([reference, more], ignore_index=True), rng)
+
+
+def test_crash_between_write_and_commit(rng, store_dir, loaded, monkeypatch):
+    writer, reference = loaded
+    generation_dir = os.path.join(store_dir, json.load(open(os.path.join(store_dir, 'manifest.json')))['generation_dir'])
+    sizes = {name: os.path.getsize(os.path.join(generation_dir, name)) for name in os.listdir(generation_dir)}
+
+    def crash(manifest, watermark):
+        raise RuntimeError('writer killed before commit')
+
+    monkeypatch.setattr(writer, '_commit', crash)
+    with pytest.raises(RuntimeError):
+        append(writer, pd.concat([random_sales(rng, 30), pd.DataFrame({
+            'funko': ['funko-new'], 'ts': [BASE_TS], 'price': np.float32([1.0]),
+            'marketplace': np.int8([1]), 'condition': np.int8([1])
+        })], ignore_index=True))
+    monkeypatch.undo()
+
+    # Readers only see committed rows, even with the uncommitted bytes still on disk
+    store = PriceStore(store_dir)
+    assert len(store) == len(reference)
+    assert_store_matches(store, reference, rng)
+    assert len(store.read('funko-new')['timestamps']) == 0
+
+    # The next append cuts the uncommitted bytes back before writing
+    more = random_sales(rng, 12, late=True)
+    append(writer, more)
+    assert_store_matches(PriceStore(store_dir), pd.concat([reference, more], ignore_index=True), rng)
+    with open(os.path.join(generation_dir, 'funkos.txt')) as f:
+        assert f.read().splitlines() == sorted(set(reference['funko']), key=reference['funko'].tolist().index)
+    assert os.path.getsize(os.path.join(generation_dir, 'price.f4')) == (len(reference) + len(more)) * 4
+    assert os.path.getsize(os.path.join(generation_dir, 'price.f4')) > sizes['price.f4']
+
+
+class FakePriceHistory:
+    """price_history table: select/or_/order/limit over rows kept in (created_at, id) order"""
+
+    def __init__(self):
+        self.rows = []
+
+    def add(self, created_at, date_scraped, funko_pop_id='funko-a', price=10.0):
+        row_id = str(uuid.UUID(int=len(self.rows) + 1))
+        self.rows.append({
+            'id': row_id, 'funko_pop_id': funko_pop_id, 'price': price, 'source': 'ebay',
+            'condition': 'mint', 'date_scraped': date_scraped, 'created_at': created_at
+        })
+        return row_id
+
+    def table(self, name):
+        assert name == 'price_history'
+        return FakeQuery(self.rows)
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+        self.after = None
+        self.count = None
+
+    def select(self, columns):
+        return self
+
+    def or_(self, expression):
+        match = re.fullmatch(r'created_at\.gt\."(.+)",and\(created_at\.eq\."(.+)",id\.gt\.(.+)\)', expression)
+        assert match and match.group(1) == match.group(2)
+        self.after = (match.group(1), match.group(3))
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def execute(self):
+        rows = sorted(self.rows, key=lambda row: (row['created_at'], row['id']))
+        if self.after is not None:
+            rows = [row for row in rows if (row['created_at'], row['id']) > self.after]
+        return type('Response', (), {'data': rows[:self.count]})
+
+
+def test_ingest_pages_across_created_at_ties_and_late_rows(store_dir):
+    table = FakePriceHistory()
+    # More rows share one created_at than fit in a page
+    for i in range(7):
+        table.add('2026-01-01T00:00:00+00:00', '2026-01-01T00:00:00+00:00', price=10.0 + i)
+    last_id = table.add('2026-01-02T00:00:00+00:00', '2026-01-02T00:00:00+00:00')
+    writer = PriceStoreWriter(store_dir, block_rows=BLOCK_ROWS)
+
+    assert ingest_price_history(writer, table, page_size=3) == 8
+    assert PriceStore(store_dir).watermark == {'created_at': '2026-01-02T00:00:00+00:00', 'id': last_id}
+
+    # Scraped long ago but inserted now: picked up by insertion order
+    table.add('2026-01-03T00:00:00+00:00', '2025-06-01T00:00:00+00:00', price=99.0)
+    assert ingest_price_history(writer, table, page_size=3) == 1
+    assert ingest_price_history(writer, table, page_size=3) == 0
+
+    sales = PriceStore(store_dir).read('funko-a')
+    assert sorted(sales['prices'].tolist()) == sorted(row['price'] for row in table.rows)
+    assert sales['prices'][0] == 99.0  # the late sale sorts by when it sold
+
+
+def test_ingest_resumes_from_legacy_string_watermark(store_dir):
+    table = FakePriceHistory()
+    table.add('2026-01-01T00:00:00+00:00', '2026-01-01T00:00:00+00:00')
+    table.add('2026-01-02T00:00:00+00:00', '2026-01-02T00:00:00+00:00')
+    table.add('2026-01-03T00:00:00+00:00', '2026-01-03T00:00:00+00:00')
+    writer = PriceStoreWriter(store_dir, block_rows=BLOCK_ROWS)
+    # A store ingested by date_scraped before the keyset cursor
+    append(writer, pd.DataFrame({
+        'funko': ['funko-a'], 'ts': [BASE_TS], 'price': np.float32([1.0]),
+        'marketplace': np.int8([1]), 'condition': np.int8([5])
+    }), watermark='2026-01-02T00:00:00+00:00')
+
+    assert ingest_price_history(writer, table, page_size=2) == 2
+    assert PriceStore(store_dir).watermark['created_at'] == '2026-01-03T00:00:00+00:00'
+    assert ingest_price_history(writer, table, page_size=2) == 0
+
+
+def test_ingest_cursor_skips_filtered_rows(store_dir, monkeypatch):
+    table = FakePriceHistory()
+    table.add('2026-01-01T00:00:00+00:00', '2026-01-01T00:00:00+00:00')
+    table.rows.append({**table.rows[0], 'id': str(uuid.UUID(int=99)), 'price': None})
+    writer = PriceStoreWriter(store_dir, block_rows=BLOCK_ROWS)
+
+    assert ingest_price_history(writer, table, page_size=10) == 1
+    # The row without a price still moves the cursor, so it is not re-read forever
+    assert PriceStore(store_dir).watermark['id'] == str(uuid.UUID(int=99))
+    assert ingest_price_history(writer, table, page_size=10) == 0
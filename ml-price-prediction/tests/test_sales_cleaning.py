@@ -0,0 +1,116 @@
+"""clean_sales deduplication and per-Funko outlier filtering"""
+import pandas as pd
+import pytest
+
+from sales_cleaning import SALES_OUTLIER_MIN_SALES, clean_sales
+
+
+def make_sales(rows):
+    """Sales frame from (funko_pop_id, price, date_sold) tuples, as scraped on one run"""
+    return pd.DataFrame({
+        'funko_pop_id': [funko for funko, _, _ in rows],
+        'price': [price for _, price, _ in rows],
+        'date_sold': [date for _, _, date in rows],
+        'condition': 'Near Mint',
+        'marketplace': 'ebay',
+        'created_at': pd.Timestamp('2024-06-01 12:00:00'),
+    })
+
+
+def daily_sales(funko, prices, start='2024-01-01'):
+    """One sale a day, far enough apart that none of them are duplicates"""
+    dates = pd.date_range(start, periods=len(prices), freq='D')
+    return [(funko, price, date) for price, date in zip(prices, dates)]
+
+
+def test_exact_duplicates_keep_the_first_sale():
+    rows = daily_sales('funko-a', [20.0, 22.0, 24.0])
+    sales = make_sales(rows + rows[:2])
+
+    cleaned, report = clean_sales(sales)
+
+    assert report['duplicates'] == 2
+    assert report['output_rows'] == 3
+    assert cleaned['price'].tolist() == [20.0, 22.0, 24.0]
+    assert cleaned['condition'].tolist() == ['near_mint'] * 3
+
+
+def test_rescrapes_differing_only_in_created_at_are_duplicates():
+    sales = make_sales(daily_sales('funko-a', [20.0, 22.0]))
+    rescrape = sales.assign(created_at=pd.Timestamp('2024-06-02 08:30:00'))
+    # Another listing at the same price and hour on a different marketplace is a separate sale
+    other_marketplace = sales.iloc[:1].assign(marketplace='Mercari')
+
+    cleaned, report = clean_sales(pd.concat([sales, rescrape, other_marketplace], ignore_index=True))
+
+    assert report['duplicates'] == 2
+    assert cleaned['created_at'].tolist() == [pd.Timestamp('2024-06-01 12:00:00')] * 3
+    assert cleaned['marketplace'].tolist() == ['ebay', 'ebay', 'mercari']
+
+
+def test_sales_in_the_same_bucket_are_duplicates():
+    date = pd.Timestamp('2024-01-01 10:05:00')
+    sales = make_sales([
+        ('funko-a', 20.0, date),
+        ('funko-a', 20.0, date + pd.Timedelta(minutes=30)),  # same hour bucket
+        ('funko-a', 20.0, date + pd.Timedelta(hours=1)),
+        ('funko-b', 20.0, date),
+    ])
+
+    cleaned, report = clean_sales(sales, bucket_seconds=3600)
+
+    assert report['duplicates'] == 1
+    assert cleaned['funko_pop_id'].tolist() == ['funko-a', 'funko-a', 'funko-b']
+
+
+@pytest.mark.parametrize('n_sales, dropped', [
+    (SALES_OUTLIER_MIN_SALES - 1, 0),
+    (SALES_OUTLIER_MIN_SALES, 1),
+])
+def test_outlier_test_needs_min_sales(n_sales, dropped):
+    # One mis-scaled sale (cents read as dollars) among otherwise steady prices
+    prices = [20.0 + i for i in range(n_sales - 1)] + [2000.0]
+    cleaned, report = clean_sales(make_sales(daily_sales('funko-a', prices)))
+
+    assert report['outliers'] == dropped
+    assert len(cleaned) == n_sales - dropped
+    if dropped:
+        assert 2000.0 not in cleaned['price'].tolist()
+
+
+def test_duplicates_count_towards_min_sales_once():
+    prices = [20.0 + i for i in range(SALES_OUTLIER_MIN_SALES - 2)] + [2000.0]
+    rows = daily_sales('funko-a', prices)
+    # Re-scrapes would reach min_sales, but only distinct sales should
+    cleaned, report = clean_sales(make_sales(rows + rows))
+
+    assert report['duplicates'] == len(rows)
+    assert report['outliers'] == 0
+    assert 2000.0 in cleaned['price'].tolist()
+
+
+def test_zero_mad_group_keeps_its_sales():
+    n = SALES_OUTLIER_MIN_SALES + 3
+    rows = daily_sales('funko-a', [25.0] * n)
+
+    cleaned, report = clean_sales(make_sales(rows))
+    assert report['outliers'] == 0
+    assert len(cleaned) == n
+
+    # With a MAD of zero, only the MIN_LOG_SPREAD floor keeps a small move from being infinitely far out
+    small_move = daily_sales('funko-a', [26.0], start='2024-03-01')
+    mis_scaled = daily_sales('funko-a', [2500.0], start='2024-03-02')
+    cleaned, report = clean_sales(make_sales(rows + small_move + mis_scaled))
+
+    assert report['outliers'] == 1
+    assert cleaned['price'].tolist() == [25.0] * n + [26.0]
+
+
+def test_outliers_are_judged_per_funko():
+    cheap = daily_sales('funko-a', [10.0, 11.0, 12.0, 10.5, 11.5, 10.8])
+    grail = daily_sales('funko-b', [900.0, 950.0, 1000.0, 920.0, 980.0, 940.0])
+
+    cleaned, report = clean_sales(make_sales(cheap + grail))
+
+    assert report['outliers'] == 0
+    assert len(cleaned) == len(cheap) + len(grail)
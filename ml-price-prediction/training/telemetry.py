@@ -0,0 +1,77 @@
+import logging
+import resource
+import sys
+import time
+
+import numpy as np
+import xgboost as xgb
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class TrainingTelemetry(xgb.callback.TrainingCallback):
+    """Records wall time, peak memory and the latest eval metrics for every boosting round.
+
+    ``iterations`` holds one dict per round and ``summary()`` the totals, both
+    written to metrics.json. Progress is logged every ``log_every`` rounds
+    (0 disables it).
+    """
+
+    def __init__(self, log_every=50):
+        super().__init__()
+        self.log_every = log_every
+        self.iterations = []
+        self._started = None
+        self._iteration_started = None
+
+    def before_training(self, model):
+        self._started = time.perf_counter()
+        return model
+
+    def before_iteration(self, model, epoch, evals_log):
+        self._iteration_started = time.perf_counter()
+        return False
+
+    def after_iteration(self, model, epoch, evals_log):
+        now = time.perf_counter()
+        record = {
+            'iteration': epoch,
+            'seconds': round(now - self._iteration_started, 6),
+            'elapsed_seconds': round(now - self._started, 3),
+            'peak_rss_mb': round(peak_rss_mb(), 1)
+        }
+        for data, metrics in evals_log.items():
+            for metric, values in metrics.items():
+                # Plain training logs floats; cv logs (mean, std) pairs
+                value = values[-1][0] if isinstance(values[-1], tuple) else values[-1]
+                record[f'{data}-{metric}'] = float(value)
+        self.iterations.append(record)
+
+        if self.log_every and epoch % self.log_every == 0:
+            scores = ', '.join(f'{name}={value:.4f}' for name, value in record.items() if '-' in name)
+            logger.info(
+                f"[{epoch}] {scores} ({record['seconds'] * 1000:.1f} ms/iter, "
+                f"{record['elapsed_seconds']:.1f}s elapsed, peak {record['peak_rss_mb']:.0f} MB)"
+            )
+        return False
+
+    def summary(self):
+        if not self.iterations:
+            return {'iterations': 0}
+        seconds = np.array([record['seconds'] for record in self.iterations])
+        return {
+            'iterations': len(self.iterations),
+            'total_seconds': round(self.iterations[-1]['elapsed_seconds'], 3),
+            'mean_iteration_seconds': round(float(seconds.mean()), 6),
+            'p50_iteration_seconds': round(float(np.percentile(seconds, 50)), 6),
+            'p95_iteration_seconds': round(float(np.percentile(seconds, 95)), 6),
+            'max_iteration_seconds': round(float(seconds.max()), 6),
+            'peak_rss_mb': self.iterations[-1]['peak_rss_mb']
+        }
@@ -1,4 +1,5 @@
 import argparse
+import io
 import pandas as pd
 import xgboost as xgb
 import joblib
@@ -7,11 +8,34 @@ import os
 from sklearn.metrics import mean_absolute_error, r2_score, mean_squared_error
 import numpy as np
 import logging
+import multiprocessing
+import sys
+import time
+
+# Shared feature code: ../features locally, ./features in the SageMaker container (deploy_model dependencies)
+TRAINING_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TRAINING_DIR, '..', 'features'))
+sys.path.insert(0, os.path.join(TRAINING_DIR, 'features'))
+from drift_sketches import DriftReference
+from funko_features import FEATURE_NAMES
+from telemetry import TrainingTelemetry
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def quantile_alphas(model):
+    """Sorted quantile alphas of a multi-quantile booster, or None for a single-output model"""
+    alphas = model.attr('quantile_alphas')
+    return sorted(json.loads(alphas)) if alphas else None
+
+def split_quantiles(predictions, alphas):
+    """(median, lower, upper) from an (n, len(alphas)) multi-quantile prediction"""
+    # Sorting each row removes any quantile crossing between the separately fitted outputs
+    predictions = np.sort(predictions, axis=1)
+    median = int(np.argmin(np.abs(np.asarray(alphas) - 0.5)))
+    return predictions[:, median], predictions[:, 0], predictions[:, -1]
+
 def model_fn(model_dir):
     """Load model for inference"""
     model = joblib.load(os.path.join(model_dir, "model.joblib"))
@@ -23,10 +47,13 @@ def input_fn(request_body, request_content_type):
     
     if request_content_type == "application/json":
         input_data = json.loads(request_body)
+        # The prediction API sends {"instances": [[...], ...]} in feature order
+        if isinstance(input_data, dict) and 'instances' in input_data:
+            return pd.DataFrame(input_data['instances'])
         # Convert to DataFrame with expected feature order
         return pd.DataFrame([input_data])
     elif request_content_type == "text/csv":
-        return pd.read_csv(pd.StringIO(request_body), header=None)
+        return pd.read_csv(io.StringIO(request_body), header=None)
     else:
         raise ValueError(f"Unsupported content type: {request_content_type}")
 
@@ -45,10 +72,33 @@ def predict_fn(input_data, model):
     predictions = model.predict(dtest)
     
     logger.info(f"Generated {len(predictions)} predictions")
+    
+    # One call scores every quantile; return the median plus the interval bounds
+    alphas = quantile_alphas(model)
+    if alphas:
+        median, lower, upper = split_quantiles(predictions, alphas)
+        return {'predictions': median, 'lower': lower, 'upper': upper, 'interval': [alphas[0], alphas[-1]]}
     return predictions
 
 def output_fn(prediction, content_type):
     """Format output"""
+    if isinstance(prediction, dict):
+        # Multi-quantile model: "predictions" stays the point estimate for existing clients
+        if content_type == "application/json":
+            return json.dumps({
+                "predictions": prediction['predictions'].tolist(),
+                "lower": prediction['lower'].tolist(),
+                "upper": prediction['upper'].tolist(),
+                "interval": prediction['interval'],
+                "model_version": "1.0.0"
+            })
+        elif content_type == "text/csv":
+            # One line per row: price,lower,upper
+            return pd.DataFrame({
+                name: prediction[name] for name in ('predictions', 'lower', 'upper')
+            }).to_csv(index=False, header=False)
+        raise ValueError(f"Unsupported content type: {content_type}")
+    
     if content_type == "application/json":
         return json.dumps({
             "predictions": prediction.tolist(),
@@ -59,8 +109,8 @@ def output_fn(prediction, content_type):
     else:
         raise ValueError(f"Unsupported content type: {content_type}")
 
-def calculate_metrics(y_true, y_pred):
-    """Calculate model performance metrics"""
+def calculate_metrics(y_true, y_pred, lower=None, upper=None, nominal_coverage=None):
+    """Calculate model performance metrics, plus interval coverage when bounds are given"""
     mae = mean_absolute_error(y_true, y_pred)
     mse = mean_squared_error(y_true, y_pred)
     rmse = np.sqrt(mse)
@@ -69,13 +119,179 @@ def calculate_metrics(y_true, y_pred):
     # Calculate MAPE (Mean Absolute Percentage Error)
     mape = np.mean(np.abs((y_true - y_pred) / y_true)) * 100
     
-    return {
+    metrics = {
         'mae': mae,
         'mse': mse,
         'rmse': rmse,
         'r2': r2,
         'mape': mape
     }
+    
+    if lower is not None and upper is not None:
+        # A calibrated 10-90% interval should contain ~80% of prices, missing evenly on both sides
+        metrics['coverage'] = float(np.mean((y_true >= lower) & (y_true <= upper)))
+        metrics['below_interval'] = float(np.mean(y_true < lower))
+        metrics['above_interval'] = float(np.mean(y_true > upper))
+        metrics['mean_interval_width'] = float(np.mean(upper - lower))
+        metrics['relative_interval_width'] = float(np.mean((upper - lower) / np.maximum(np.abs(y_pred), 1e-6)))
+        if nominal_coverage is not None:
+            metrics['nominal_coverage'] = nominal_coverage
+            metrics['coverage_error'] = metrics['coverage'] - nominal_coverage
+    
+    return metrics
+
+def measure_latency(model, X, iteration_range, batch_size, repeats):
+    """p50/p99 milliseconds of single-row and batch predict calls, DMatrix build included as in serving"""
+    X = np.asarray(X, dtype=np.float32)
+    rows = np.random.default_rng(0).integers(0, len(X), size=repeats)
+    batch = X[np.arange(batch_size) % len(X)]
+    model.predict(xgb.DMatrix(batch), iteration_range=iteration_range)  # warm up
+    
+    single = []
+    for row in rows:
+        started = time.perf_counter()
+        model.predict(xgb.DMatrix(X[row:row + 1]), iteration_range=iteration_range)
+        single.append(time.perf_counter() - started)
+    batched = []
+    for _ in range(max(repeats // 10, 10)):
+        started = time.perf_counter()
+        model.predict(xgb.DMatrix(batch), iteration_range=iteration_range)
+        batched.append(time.perf_counter() - started)
+    
+    single, batched = np.array(single) * 1000, np.array(batched) * 1000
+    return {
+        'single_p50_ms': float(np.percentile(single, 50)),
+        'single_p99_ms': float(np.percentile(single, 99)),
+        'batch_p50_ms': float(np.percentile(batched, 50)),
+        'batch_p99_ms': float(np.percentile(batched, 99))
+    }
+
+def latency_frontier(models, X_val, y_val, alphas, steps, batch_size, repeats):
+    """Validation MAE and predict latency of every truncation of every depth variant.
+    
+    ``models`` maps max_depth to an early-stopped booster. Each booster is cut
+    with iteration_range at ``steps`` evenly spaced tree counts up to its best
+    iteration. Candidates no other candidate beats on both MAE and single-row
+    p99 latency are marked ``pareto``.
+    """
+    dval = xgb.DMatrix(X_val)
+    candidates = []
+    for max_depth, model in sorted(models.items()):
+        rounds = model.best_iteration + 1
+        for iterations in sorted({max(rounds * step // steps, 1) for step in range(1, steps + 1)}):
+            predictions = model.predict(dval, iteration_range=(0, iterations))
+            median = split_quantiles(predictions, alphas)[0] if alphas else predictions
+            candidates.append({
+                'max_depth': max_depth,
+                'iterations': iterations,
+                'validation_mae': float(mean_absolute_error(y_val, median)),
+                **measure_latency(model, X_val, (0, iterations), batch_size, repeats)
+            })
+    
+    for candidate in candidates:
+        candidate['pareto'] = not any(
+            other['validation_mae'] <= candidate['validation_mae']
+            and other['single_p99_ms'] <= candidate['single_p99_ms']
+            and (other['validation_mae'] < candidate['validation_mae'] or other['single_p99_ms'] < candidate['single_p99_ms'])
+            for other in candidates
+        )
+    return candidates
+
+def load_channel(channel_dir, file_name):
+    """(features, target) from a headerless CSV whose first column is the target"""
+    data = pd.read_csv(os.path.join(channel_dir, file_name), header=None)
+    return data.iloc[:, 1:].values, data.iloc[:, 0].values
+
+def benchmark_config(train_dir, validation_dir, params, num_round):
+    """Train one benchmark configuration; returns its speed, memory and validation accuracy"""
+    X_train, y_train = load_channel(train_dir, "train.csv")
+    X_val, y_val = load_channel(validation_dir, "validation.csv")
+    dtrain = xgb.DMatrix(X_train, label=y_train)
+    dval = xgb.DMatrix(X_val, label=y_val)
+    
+    # A fixed round count (no early stopping) so every configuration does the same work
+    telemetry = TrainingTelemetry(log_every=0)
+    model = xgb.train(
+        params=params,
+        dtrain=dtrain,
+        num_boost_round=num_round,
+        evals=[(dval, 'validation')],
+        verbose_eval=False,
+        callbacks=[telemetry]
+    )
+    
+    val_pred = model.predict(dval)
+    alphas = params.get('quantile_alpha')
+    if alphas:
+        val_pred = split_quantiles(val_pred, alphas)[0]
+    final = telemetry.iterations[-1]
+    return {
+        'tree_method': params['tree_method'],
+        'nthread': params.get('nthread', os.cpu_count()),
+        'max_bin': params['max_bin'],
+        **telemetry.summary(),
+        'validation_mae': float(mean_absolute_error(y_val, val_pred)),
+        **{name: value for name, value in final.items() if name.startswith('validation-')}
+    }
+
+def run_benchmark(args, params):
+    """Train the same data under each tree_method x nthread x max_bin setting.
+    
+    Each configuration runs in a fresh process, so its peak memory is its own.
+    The recommendation is the fastest configuration (per iteration) whose
+    validation MAE is within ``--benchmark-tolerance`` of the current settings.
+    """
+    cpus = os.cpu_count() or 1
+    nthreads = sorted({int(n) for n in args.benchmark_nthreads.split(',')}) if args.benchmark_nthreads else sorted({1, max(cpus // 2, 1), cpus})
+    configs = [
+        {'tree_method': tree_method, 'nthread': nthread, 'max_bin': int(max_bin)}
+        for tree_method in args.benchmark_tree_methods.split(',')
+        for nthread in nthreads
+        for max_bin in args.benchmark_max_bins.split(',')
+    ]
+    # The current settings come first and set the accuracy bar
+    baseline = {'tree_method': params['tree_method'], 'nthread': params.get('nthread', cpus), 'max_bin': params['max_bin']}
+    configs = [baseline] + [config for config in configs if config != baseline]
+    
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for index, config in enumerate(configs):
+        logger.info(f"Benchmarking {config} for {args.benchmark_rounds} rounds...")
+        try:
+            with context.Pool(1) as pool:
+                result = pool.apply(
+                    benchmark_config, (args.train, args.validation, {**params, **config}, args.benchmark_rounds)
+                )
+        except Exception as e:
+            if index == 0:
+                raise
+            logger.error(f"Benchmark configuration {config} failed: {e}")
+            continue
+        logger.info(
+            f"  {result['mean_iteration_seconds'] * 1000:.1f} ms/iter, {result['total_seconds']:.1f}s total, "
+            f"peak {result['peak_rss_mb']:.0f} MB, validation MAE {result['validation_mae']:.4f}"
+        )
+        results.append(result)
+    
+    mae_limit = results[0]['validation_mae'] * (1 + args.benchmark_tolerance)
+    accurate = [result for result in results if result['validation_mae'] <= mae_limit]
+    recommended = min(accurate, key=lambda result: result['mean_iteration_seconds'])
+    speedup = results[0]['mean_iteration_seconds'] / max(recommended['mean_iteration_seconds'], 1e-9)
+    
+    logger.info(
+        f"Recommended: tree_method={recommended['tree_method']} nthread={recommended['nthread']} "
+        f"max_bin={recommended['max_bin']} ({speedup:.2f}x faster per iteration than the current settings, "
+        f"validation MAE {recommended['validation_mae']:.4f} vs {results[0]['validation_mae']:.4f})"
+    )
+    return {
+        'cpu_count': cpus,
+        'rounds': args.benchmark_rounds,
+        'tolerance': args.benchmark_tolerance,
+        'baseline': results[0],
+        'recommended': recommended,
+        'speedup': speedup,
+        'results': results
+    }
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -94,7 +310,28 @@ if __name__ == "__main__":
     parser.add_argument("--colsample-bytree", type=float, default=0.8)
     parser.add_argument("--num-round", type=int, default=1000)
     parser.add_argument("--early-stopping-rounds", type=int, default=50)
-    parser.add_argument("--objective", type=str, default="reg:squarederror")
+    parser.add_argument("--objective", type=str, default="reg:quantileerror")
+    # Quantiles fitted by one booster with reg:quantileerror: interval bounds and the median
+    parser.add_argument("--quantile-alphas", type=str, default="0.1,0.5,0.9")
+    parser.add_argument("--tree-method", type=str, default="auto")
+    parser.add_argument("--nthread", type=int, default=0)  # 0 = all cores
+    parser.add_argument("--max-bin", type=int, default=256)
+    
+    # Latency frontier: the most accurate truncated/shallower model within a p99 budget (0 disables).
+    # Opt-in: it trains one more booster per frontier depth and times every truncation
+    parser.add_argument("--latency-budget-ms", type=float, default=0.0)  # single-row predict p99
+    parser.add_argument("--frontier-depths", type=str, default="3,4")  # extra max_depth variants to train
+    parser.add_argument("--frontier-steps", type=int, default=10)  # truncations per model
+    parser.add_argument("--latency-batch-size", type=int, default=100)
+    parser.add_argument("--latency-repeats", type=int, default=300)
+    
+    # Benchmark mode: time the same data under each setting instead of training a model
+    parser.add_argument("--benchmark", type=str, default="false")
+    parser.add_argument("--benchmark-tree-methods", type=str, default="hist,approx")
+    parser.add_argument("--benchmark-nthreads", type=str, default="")  # default: 1, half and all cores
+    parser.add_argument("--benchmark-max-bins", type=str, default="64,128,256")
+    parser.add_argument("--benchmark-rounds", type=int, default=200)
+    parser.add_argument("--benchmark-tolerance", type=float, default=0.01)  # allowed relative MAE increase
     
     args = parser.parse_args()
     
@@ -104,18 +341,8 @@ if __name__ == "__main__":
     try:
         # Load training data
         logger.info("Loading training data...")
-        train_data = pd.read_csv(os.path.join(args.train, "train.csv"), header=None)
-        val_data = pd.read_csv(os.path.join(args.validation, "validation.csv"), header=None)
-        
-        logger.info(f"Training data shape: {train_data.shape}")
-        logger.info(f"Validation data shape: {val_data.shape}")
-        
-        # Prepare data for XGBoost
-        X_train = train_data.iloc[:, 1:].values  # Features (skip target column)
-        y_train = train_data.iloc[:, 0].values   # Target (first column)
-        
-        X_val = val_data.iloc[:, 1:].values
-        y_val = val_data.iloc[:, 0].values
+        X_train, y_train = load_channel(args.train, "train.csv")
+        X_val, y_val = load_channel(args.validation, "validation.csv")
         
         logger.info(f"Feature dimensions: {X_train.shape[1]}")
         logger.info(f"Training samples: {len(y_train)}")
@@ -139,24 +366,50 @@ if __name__ == "__main__":
             'colsample_bytree': args.colsample_bytree,
             'objective': args.objective,
             'eval_metric': ['mae', 'rmse'],
-            'tree_method': 'auto',
+            'tree_method': args.tree_method,
+            'max_bin': args.max_bin,
             'random_state': 42
         }
+        if args.nthread > 0:
+            params['nthread'] = args.nthread
+        
+        alphas = None
+        if args.objective == 'reg:quantileerror':
+            alphas = sorted(float(alpha) for alpha in args.quantile_alphas.split(','))
+            params['quantile_alpha'] = alphas
+            # Pinball loss averaged over the quantiles drives early stopping
+            params['eval_metric'] = ['quantile']
         
         logger.info(f"XGBoost parameters: {params}")
         
-        # Train model with early stopping
+        if args.benchmark.lower() == 'true':
+            benchmark = run_benchmark(args, params)
+            with open(os.path.join(args.model_dir, "benchmark.json"), 'w') as f:
+                json.dump(benchmark, f, indent=2)
+            logger.info(f"✅ Benchmark written to {os.path.join(args.model_dir, 'benchmark.json')}")
+            sys.exit(0)
+        
+        # Train model with early stopping; telemetry logs progress every 50 rounds
         logger.info("Training XGBoost model...")
+        telemetry = TrainingTelemetry(log_every=50)
         model = xgb.train(
             params=params,
             dtrain=dtrain,
             num_boost_round=args.num_round,
             evals=[(dtrain, 'train'), (dval, 'validation')],
             early_stopping_rounds=args.early_stopping_rounds,
-            verbose_eval=50  # Print every 50 rounds
+            verbose_eval=False,
+            callbacks=[telemetry]
         )
         
-        logger.info("Training completed!")
+        training_summary = telemetry.summary()
+        logger.info(
+            f"Training completed! {training_summary['iterations']} rounds in {training_summary['total_seconds']:.1f}s "
+            f"({training_summary['mean_iteration_seconds'] * 1000:.1f} ms/iter, peak {training_summary['peak_rss_mb']:.0f} MB)"
+        )
+        if alphas:
+            # Inference reads this to split the outputs into median and interval
+            model.set_attr(quantile_alphas=json.dumps(alphas))
         
         # Make predictions for evaluation
         logger.info("Evaluating model performance...")
@@ -164,8 +417,13 @@ if __name__ == "__main__":
         val_pred = model.predict(dval)
         
         # Calculate metrics
-        train_metrics = calculate_metrics(y_train, train_pred)
-        val_metrics = calculate_metrics(y_val, val_pred)
+        if alphas:
+            nominal_coverage = alphas[-1] - alphas[0]
+            train_metrics = calculate_metrics(y_train, *split_quantiles(train_pred, alphas), nominal_coverage)
+            val_metrics = calculate_metrics(y_val, *split_quantiles(val_pred, alphas), nominal_coverage)
+        else:
+            train_metrics = calculate_metrics(y_train, train_pred)
+            val_metrics = calculate_metrics(y_val, val_pred)
         
         # Log metrics
         logger.info("Training Metrics:")
@@ -187,10 +445,82 @@ if __name__ == "__main__":
         logger.info(f"Saving model to {args.model_dir}")
         joblib.dump(model, os.path.join(args.model_dir, "model.joblib"))
         
+        # Latency frontier: a faster model the API can serve under load
+        fast_model_info = None
+        if args.latency_budget_ms > 0:
+            logger.info(f"Measuring the accuracy/latency frontier (p99 budget {args.latency_budget_ms} ms)...")
+            models = {args.max_depth: model}
+            for max_depth in (int(depth) for depth in args.frontier_depths.split(',') if depth):
+                if max_depth in models:
+                    continue
+                models[max_depth] = xgb.train(
+                    params={**params, 'max_depth': max_depth},
+                    dtrain=dtrain,
+                    num_boost_round=args.num_round,
+                    evals=[(dval, 'validation')],
+                    early_stopping_rounds=args.early_stopping_rounds,
+                    verbose_eval=False
+                )
+                if alphas:
+                    # Serving reads the quantiles from the booster, whichever variant is saved
+                    models[max_depth].set_attr(quantile_alphas=json.dumps(alphas))
+            candidates = latency_frontier(
+                models, X_val, y_val, alphas, args.frontier_steps, args.latency_batch_size, args.latency_repeats
+            )
+            for candidate in candidates:
+                if candidate['pareto']:
+                    logger.info(
+                        f"  depth {candidate['max_depth']}, {candidate['iterations']} rounds: "
+                        f"MAE {candidate['validation_mae']:.4f}, p99 {candidate['single_p99_ms']:.2f} ms/row, "
+                        f"{candidate['batch_p99_ms']:.2f} ms/{args.latency_batch_size} rows"
+                    )
+            
+            # A fast model only when the full model is over budget: then the most accurate
+            # frontier point within budget, which is always faster than the full model
+            full = (args.max_depth, model.best_iteration + 1)
+            full_candidate = next(c for c in candidates if (c['max_depth'], c['iterations']) == full)
+            within_budget = [c for c in candidates if c['pareto'] and c['single_p99_ms'] <= args.latency_budget_ms]
+            selected = min(
+                within_budget, key=lambda c: (c['validation_mae'], c['single_p99_ms'])
+            ) if within_budget else None
+            
+            if full_candidate['single_p99_ms'] <= args.latency_budget_ms:
+                logger.info("The full model meets the latency budget; no fast model needed")
+            elif selected is None:
+                logger.warning(f"No candidate meets the {args.latency_budget_ms} ms p99 budget; no fast model saved")
+            else:
+                # Slicing keeps the quantile_alphas attribute, so serving reads the fast model the same way
+                fast_model = models[selected['max_depth']][:selected['iterations']]
+                joblib.dump(fast_model, os.path.join(args.model_dir, "model_fast.joblib"))
+                fast_model_info = {
+                    key: selected[key] for key in ('max_depth', 'iterations', 'validation_mae', 'single_p99_ms', 'batch_p99_ms')
+                }
+                logger.info(f"Saved fast model: {fast_model_info}")
+            
+            with open(os.path.join(args.model_dir, "latency_frontier.json"), 'w') as f:
+                json.dump({
+                    'latency_budget_ms': args.latency_budget_ms,
+                    'batch_size': args.latency_batch_size,
+                    'full_model': {'max_depth': full[0], 'iterations': full[1]},
+                    'fast_model': fast_model_info,
+                    'frontier': [c for c in candidates if c['pareto']],
+                    'candidates': candidates
+                }, f, indent=2)
+        
         # Save feature importance
         with open(os.path.join(args.model_dir, "feature_importance.json"), 'w') as f:
             json.dump(importance, f)
         
+        # Save the training distribution the API's drift monitor compares live traffic with.
+        # Columns follow FEATURE_NAMES (data_pipeline.py writes them in that order)
+        feature_names = FEATURE_NAMES if X_train.shape[1] == len(FEATURE_NAMES) else [
+            f"f{i}" for i in range(X_train.shape[1])
+        ]
+        reference_predictions = split_quantiles(train_pred, alphas)[0] if alphas else train_pred
+        DriftReference.build(X_train, feature_names, reference_predictions).save(
+            os.path.join(args.model_dir, "drift_reference.json")
+        )
+        
         # Save metrics
         metrics_summary = {
             'training_metrics': train_metrics,
@@ -198,7 +528,12 @@ if __name__ == "__main__":
             'hyperparameters': vars(args),
             'feature_count': X_train.shape[1],
             'training_samples': len(y_train),
-            'validation_samples': len(y_val)
+            'validation_samples': len(y_val),
+            'training_telemetry': {
+                **training_summary,
+                'best_iteration': model.best_iteration,
+                'per_iteration': telemetry.iterations
+            }
         }
         
         with open(os.path.join(args.model_dir, "metrics.json"), 'w') as f:
@@ -210,9 +545,12 @@ if __name__ == "__main__":
             'version': '1.0.0',
             'feature_count': X_train.shape[1],
             'objective': args.objective,
+            'quantile_alphas': alphas,
+            'fast_model': fast_model_info,
             'performance': {
                 'validation_mae': val_metrics['mae'],
-                'validation_r2': val_metrics['r2']
+                'validation_r2': val_metrics['r2'],
+                'validation_coverage': val_metrics.get('coverage')
             }
         }
         
@@ -223,6 +561,11 @@ if __name__ == "__main__":
         logger.info(f"Final Validation MAE: {val_metrics['mae']:.2f}")
         logger.info(f"Final Validation R²: {val_metrics['r2']:.3f}")
         logger.info(f"Final Validation MAPE: {val_metrics['mape']:.2f}%")
+        if alphas:
+            logger.info(
+                f"Final Validation interval coverage: {val_metrics['coverage']:.1%} "
+                f"(nominal {val_metrics['nominal_coverage']:.0%})"
+            )
         
     except Exception as e:
         logger.error(f"❌ Training failed: {e}")